@@ -11,24 +11,65 @@
 其余大模型设置、环境数据库设置、日志配置设置同前。所有文件命名都改为【时间戳-DFA-log类型】
 """
 
+import json
 import os
+import threading
+import time
 import yaml
 from datetime import datetime
-from typing import Optional, ClassVar
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import ClassVar, Dict, List, Optional, Tuple
 
 import pandas as pd
-from sqlalchemy import create_engine, inspect
 from smolagents import tool, CodeAgent, LiteLLMModel
 from dotenv import load_dotenv
 
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .stock_resolver import get_stock_resolver
+    from .industry_resolver import get_industry_resolver
+    from .sql_compiler import SqlCompileError, compile_parsed_query, fetch_stats
+    from .streaming_fetch import FetchedData, fetch_sql
+    from .schema_digest import get_schema_digest, split_indicators
+    from .fetch_backend import get_fetch_backend
+    from .wide_table import get_wide_tables
+    from .stock_cache import get_stock_cache
+    from .query_log import get_query_logger
+    from .sql_validator import get_sql_validator
+    from .agent_pool import (
+        AgentPool, configure_llm_keepalive, reset_agent_memory, reset_agent_state
+    )
+    from .parallel_fetch import fetch_tables_parallel, plan_table_queries, should_fetch_parallel
+    from .financial_db import (
+        FINANCIAL_DB_PATH, QUERY_TIME_BUDGET, get_readonly_engine, is_budget_exceeded
+    )
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from stock_resolver import get_stock_resolver
+    from industry_resolver import get_industry_resolver
+    from sql_compiler import SqlCompileError, compile_parsed_query, fetch_stats
+    from streaming_fetch import FetchedData, fetch_sql
+    from schema_digest import get_schema_digest, split_indicators
+    from fetch_backend import get_fetch_backend
+    from wide_table import get_wide_tables
+    from stock_cache import get_stock_cache
+    from query_log import get_query_logger
+    from sql_validator import get_sql_validator
+    from agent_pool import (
+        AgentPool, configure_llm_keepalive, reset_agent_memory, reset_agent_state
+    )
+    from parallel_fetch import fetch_tables_parallel, plan_table_queries, should_fetch_parallel
+    from financial_db import (
+        FINANCIAL_DB_PATH, QUERY_TIME_BUDGET, get_readonly_engine, is_budget_exceeded
+    )
+
 load_dotenv()
 
 class DatabaseConfig:
     """数据库配置类"""
-    # 获取项目根目录
-    ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
-    # 使用绝对路径定位数据库文件
-    DB_PATH = os.path.join(ROOT_DIR, "data/Astock_financial_data.db")
+    # 使用绝对路径定位数据库文件（见 financial_db.FINANCIAL_DB_PATH）
+    DB_PATH = FINANCIAL_DB_PATH
     CONNECTION_STRING = f"sqlite:///{DB_PATH}"
 
 
@@ -48,8 +89,8 @@ def get_timestamp() -> str:
     return datetime.now().strftime(LogConfig.TIMESTAMP_FORMAT)
 
 
-# 创建数据库连接
-engine = create_engine(DatabaseConfig.CONNECTION_STRING)
+# 创建数据库连接：只读、固定大小的连接池，每条查询受时间预算限制
+engine = get_readonly_engine()
 
 
 class DatabaseTools:
@@ -57,80 +98,128 @@ class DatabaseTools:
 
     @staticmethod
     @tool
-    def get_table_info() -> str:
-        """获取数据库中所有表的结构信息
+    def get_table_info(indicators: Optional[str] = None) -> str:
+        """获取数据库中财务数据表的结构信息：列名和类型、行数、关键列的不同取值个数和报告日范围，以及已连接好四张表的宽表
         
-        Returns:
-            str: 格式化的表结构信息字符串
+        Args:
+            indicators: 需要的财务指标，用逗号分隔（如"营业收入,货币资金"）；给出时只返回关键列和与这些指标相关的列，不给出时返回全部列
         """
-        inspector = inspect(engine)
-        table_info = []
-        
-        for table_name in inspector.get_table_names():
-            columns = inspector.get_columns(table_name)
-            table_info.append(f"\n表名: {table_name}")
-            table_info.append("列信息:")
-            for col in columns:
-                table_info.append(f"  - {col['name']}: {col['type']}")
-                
-        return "\n".join(table_info)
+        digest = get_schema_digest()
+        indicator_list = split_indicators(indicators)
+        table_info = digest.format(indicator_list)
+        wide_tables = get_wide_tables()
+        if wide_tables is None:
+            return table_info
+        relevant = {
+            table: [column[0] for column in digest.relevant_columns(table, indicator_list)]
+            for table in digest.tables
+        } if indicator_list else {}
+        return table_info + wide_tables.format(relevant)
 
     @staticmethod
-    @tool 
-    def sql_query(query: str) -> str:
-        """执行SQL查询并将结果输出为Markdown格式
+    def create_sql_query_tool(result_slot: "QueryResultSlot"):
+        """创建绑定到指定结果槽位的 sql_query 工具
+        
+        每次数据获取使用各自的槽位和工具，并发执行的查询之间不会互相覆盖结果。
         
         Args:
-            query: SQL查询语句
+            result_slot: 保存本次查询结果的槽位
             
         Returns:
-            str: 查询执行状态和结果预览
-            
-        Raises:
-            Exception: 当SQL查询执行失败时抛出
+            smolagents工具 sql_query
         """
-        try:
-            # 执行查询
-            df = pd.read_sql_query(query, engine)
-            
-            # 生成输出文件路径
-            # timestamp = get_timestamp()
-            # output_path = os.path.join(
-            #     LogConfig.OUTPUT_DIR,
-            #     f"{timestamp}_DFA_result.csv"
-            # )
-            # os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        @tool
+        def sql_query(query: str) -> str:
+            """执行SQL查询并将结果输出为Markdown格式
             
-            # # 保存为CSV
-            # df.to_csv(output_path, index=False, encoding='utf-8')
-            
-            # 保存结果到类变量
-            DataFetcherAgent._last_result = df
-            
-            col_info = [f'- {col}: {df[col].dtype}' for col in df.columns]
-            col_info_str = chr(10).join(col_info)
-            
-            return (
-                # f"查询结果已保存到: {output_path}\n"
-                f"数据结构预览:\n列名和数据类型:\n"
-                f"{col_info_str}\n\n"
-            )
-            
-        except Exception as e:
-            return f"查询执行失败: {str(e)}"
+            Args:
+                query: SQL查询语句
+            """
+            result_slot.sql = query
+            # 执行前对照表结构检查表名和列名，会报错的问题直接返回修正建议，
+            # 只需提示的问题附在执行结果后面
+            try:
+                validator = get_sql_validator()
+                issues = validator.validate(query) if validator is not None else []
+            except Exception as e:
+                print(f"SQL校验出错，直接执行: {e}")
+                issues = []
+            blocking = [issue for issue in issues if issue.blocking]
+            if blocking:
+                return validator.format_issues(blocking)
+            try:
+                # 分块执行查询，相同的SQL直接使用缓存结果，大结果写入临时文件
+                data = fetch_sql(query, engine)
+                
+                # 保存结果到本次查询的槽位，替换的旧结果随之释放
+                if result_slot.result is not None:
+                    result_slot.result.close()
+                result_slot.result = data
+                
+                col_info = [f'- {col}: {dtype}' for col, dtype in data.dtypes.items()]
+                col_info_str = chr(10).join(col_info)
+                
+                preview = (
+                    f"数据结构预览:\n共{data.row_count}行\n列名和数据类型:\n"
+                    f"{col_info_str}\n\n"
+                )
+                if data.truncated:
+                    preview += data.truncation_info()["message"] + "\n"
+                if issues:
+                    preview += "\n" + validator.format_warnings(issues) + "\n"
+                return preview
+                
+            except Exception as e:
+                if is_budget_exceeded(e):
+                    return (
+                        f"查询执行失败: 超过{QUERY_TIME_BUDGET:g}秒的时间预算被中止，"
+                        f"请增加股票、行业或报告日筛选条件缩小查询范围"
+                    )
+                return f"查询执行失败: {str(e)}"
+        
+        return sql_query
+
+
+class QueryResultSlot:
+    """CodeAgent 的结果槽位，由绑定到该槽位的 sql_query 工具写入
+    
+    槽位随 CodeAgent 一起在池中复用，每次尝试结束时用 take 取走结果并清空。
+    """
+    
+    __slots__ = ("result", "sql")
+    
+    def __init__(self):
+        self.result: Optional[FetchedData] = None
+        # 最近一次执行的SQL，用于日志
+        self.sql: Optional[str] = None
+    
+    def take(self) -> Optional[FetchedData]:
+        """取走结果，槽位不再持有它"""
+        result, self.result = self.result, None
+        return result
+    
+    def clear(self) -> None:
+        """释放未取走的结果并清空槽位"""
+        result = self.take()
+        if result is not None:
+            result.close()
+        self.sql = None
 
 
 class DataFetcherAgent:
     """数据获取代理类，负责处理SQL查询和数据提取"""
     
-    # 类变量用于存储最近的查询结果
-    _last_result: ClassVar[Optional[pd.DataFrame]] = None
-
     DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
     # PROMPT_YAML_PATH = "src/agent/prompt/DatafetcherAgent_prompt.yaml"
     
     # 默认重试次数
     MAX_RETRIES = 3
+    # 线程池模式下同时进行的数据获取数
+    MAX_CONCURRENT_FETCHES = int(os.getenv("DFA_MAX_CONCURRENT_FETCHES", "4"))
+    
+    # 进程内共享的数据获取线程池，首次使用时创建
+    _executor: ClassVar[Optional[ThreadPoolExecutor]] = None
+    _executor_lock: ClassVar[threading.Lock] = threading.Lock()
 
     def __init__(self, model: Optional[LiteLLMModel] = None, max_retries: int = MAX_RETRIES):
         """初始化数据获取代理
@@ -140,12 +229,17 @@ class DataFetcherAgent:
             max_retries: 最大重试次数
         """
         self.model = model or self._create_default_model()
-        self.agent = self.datafetcher_create_agent()
         self.prompt_template = self._load_prompt_template()
         self.max_retries = max_retries
+        # 空闲的 CodeAgent 及其结果槽位，同时进行的数据获取各自租用一个
+        self._code_agents: AgentPool[Tuple[CodeAgent, QueryResultSlot]] = AgentPool(
+            self._create_pooled_agent, max_idle=self.MAX_CONCURRENT_FETCHES,
+            reset=self._reset_pooled_agent,
+        )
         
     def _create_default_model(self) -> LiteLLMModel:
-        """创建默认的LLM模型"""
+        """创建默认的LLM模型，与LLM服务之间的连接在请求之间保持"""
+        configure_llm_keepalive()
         return LiteLLMModel(
             api_key=self.DEEPSEEK_API_KEY,
             model_id="deepseek/deepseek-chat"
@@ -168,10 +262,31 @@ class DataFetcherAgent:
             print(f"加载DataFetcherAgent prompt模板失败: {str(e)}")
             return "请根据提供的查询生成SQL语句并执行。"
     
-    def datafetcher_create_agent(self) -> CodeAgent:
-        """创建并配置CodeAgent"""
+    def _create_pooled_agent(self) -> Tuple[CodeAgent, QueryResultSlot]:
+        """新建一个 CodeAgent 和绑定到它的结果槽位，供 AgentPool 复用"""
+        result_slot = QueryResultSlot()
+        agent = self.datafetcher_create_agent(DatabaseTools.create_sql_query_tool(result_slot))
+        return agent, result_slot
+    
+    @staticmethod
+    def _reset_pooled_agent(item: Tuple[CodeAgent, QueryResultSlot]) -> None:
+        """归还到池中之前清空运行记录、代码执行器中的变量和结果槽位"""
+        agent, result_slot = item
+        reset_agent_memory(agent)
+        reset_agent_state(agent)
+        result_slot.clear()
+    
+    def datafetcher_create_agent(self, sql_query_tool) -> CodeAgent:
+        """创建并配置CodeAgent
+        
+        CodeAgent 会记录执行过程，不能在线程间共享，由 AgentPool 保证同一时间只有
+        一个线程使用，每次使用后清空运行记录和执行器中的变量。
+        
+        Args:
+            sql_query_tool: 绑定到本次查询结果槽位的 sql_query 工具
+        """
         return CodeAgent(
-            tools=[DatabaseTools.sql_query],
+            tools=[sql_query_tool, DatabaseTools.get_table_info],
             model=self.model,
             max_steps=5,
             # 允许导入pandas和numpy
@@ -186,20 +301,186 @@ class DataFetcherAgent:
             progress_callback: 可选的进度回调函数，用于报告进度
             
         Returns:
-            pd.DataFrame: 查询结果数据框
+            pd.DataFrame: 查询结果数据框（超过行数上限时已截断）
             
         Raises:
             Exception: 当所有重试都失败时抛出
         """
-        errors = []
-        retry_count = 0
+        return self.process_query_lazy(query, progress_callback).to_pandas()
+    
+    def process_query_lazy(self, query: str, progress_callback=None) -> FetchedData:
+        """处理查询请求并返回结果句柄，失败时自动重试
         
+        结果超过内存阈值时保存在临时 Parquet 文件中，超过行数上限时截断，
+        截断信息见 FetchedData.truncation_info()。
+        
+        Args:
+            query: 用户的查询指令
+            progress_callback: 可选的进度回调函数，用于报告进度
+            
+        Returns:
+            FetchedData: 查询结果句柄
+            
+        Raises:
+            Exception: 当所有重试都失败时抛出
+        """
         # 报告开始准备数据获取
         if progress_callback:
             progress_callback(38.0, "开始准备数据获取")
         
+        # 查询数据库前校验并规范化股票名称
+        query = self._resolve_entities(query)
+        
+        # 解析结果可以直接编译为SQL时不调用LLM
+        result = self._fetch_compiled(query, progress_callback)
+        if result is not None:
+            return result
+        
+        agent_start = time.perf_counter()
+        try:
+            return self._fetch_with_agent(query, progress_callback)
+        finally:
+            fetch_stats.record_agent(time.perf_counter() - agent_start)
+    
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """获取进程内共享的数据获取线程池"""
+        if cls._executor is None:
+            with cls._executor_lock:
+                if cls._executor is None:
+                    DataFetcherAgent._executor = ThreadPoolExecutor(
+                        max_workers=cls.MAX_CONCURRENT_FETCHES,
+                        thread_name_prefix="dfa-fetch"
+                    )
+        return cls._executor
+    
+    def submit_query(self, query: str, progress_callback=None) -> Future:
+        """在线程池中执行 process_query
+        
+        同一个worker进程可以同时处理多个数据获取请求：每次获取使用各自的
+        结果槽位和 CodeAgent，只共享无状态的LLM模型和只读数据库连接池。
+        
+        Args:
+            query: 用户的查询指令
+            progress_callback: 可选的进度回调函数，在线程池的线程中调用
+            
+        Returns:
+            Future: 结果为查询结果数据框
+        """
+        return self._get_executor().submit(
+            self.process_query, query, progress_callback
+        )
+    
+    def process_queries(self, queries: List[str]) -> List[pd.DataFrame]:
+        """在线程池中并发处理一批查询
+        
+        Args:
+            queries: 查询指令列表
+            
+        Returns:
+            List[pd.DataFrame]: 与输入顺序一致的查询结果
+            
+        Raises:
+            Exception: 任一查询的所有重试都失败时抛出
+        """
+        futures = [self.submit_query(query) for query in queries]
+        return [future.result() for future in futures]
+    
+    def _fetch_compiled(self, query: str, progress_callback=None) -> Optional[FetchedData]:
+        """把解析结果编译为参数化SQL并直接执行
+        
+        Args:
+            query: 经过 _resolve_entities 处理的查询（QueryParserAgent输出的JSON字符串）
+            progress_callback: 可选的进度回调函数
+            
+        Returns:
+            Optional[FetchedData]: 查询结果；无法编译或执行失败时返回None，由 CodeAgent 处理
+        """
+        try:
+            query_result = json.loads(query)
+            parsed = query_result.get("解析结果", query_result)
+        except (TypeError, ValueError, AttributeError):
+            return None
+        if not isinstance(parsed, dict):
+            return None
+        
+        start = time.perf_counter()
+        try:
+            compiled = compile_parsed_query(parsed)
+            # 跨表指标改为查询预先连接好的宽表
+            wide_tables = get_wide_tables()
+            rewritten = wide_tables.rewrite(compiled) if wide_tables is not None else compiled
+            if progress_callback:
+                progress_callback(50.0, "执行编译生成的SQL查询")
+            # 同一批公司的追问优先用按股票分区缓存的数据回答
+            df = get_stock_cache().fetch(compiled)
+            backend = get_fetch_backend()
+            if df is not None:
+                sql_log = f"{compiled.sql}\n参数: {compiled.params}\n（由按股票分区的缓存回答）"
+                data = FetchedData.from_frame(df, ordered=True)
+            elif backend.name == "sqlite" and rewritten is compiled and should_fetch_parallel(compiled):
+                # 没有可用的宽表时，多表指标按表拆分并发查询后再合并
+                sql_log = "\n".join(
+                    f"[{q.table}] {q.sql}\n参数: {q.params}" for q in plan_table_queries(compiled)
+                )
+                data = FetchedData.from_frame(fetch_tables_parallel(compiled), ordered=True)
+            else:
+                sql_log = f"{rewritten.sql}\n参数: {rewritten.params}"
+                data = backend.fetch_lazy(rewritten)
+        except SqlCompileError as e:
+            fetch_stats.record_compile_failure()
+            print(f"解析结果无法直接编译为SQL，改由CodeAgent生成: {e}")
+            return None
+        except Exception as e:
+            fetch_stats.record_compile_failure()
+            self._log_error(
+                query, f"编译生成的SQL执行失败: {e}", path="compiled",
+                duration_ms=round((time.perf_counter() - start) * 1000, 1),
+            )
+            return None
+        elapsed = time.perf_counter() - start
+        fetch_stats.record_compiled(elapsed)
+        
+        self._log_query(
+            query, "编译SQL", path="compiled", sql=sql_log,
+            duration_ms=round(elapsed * 1000, 1), rows=data.row_count,
+        )
+        if progress_callback:
+            progress_callback(60.0, "处理查询结果")
+            progress_callback(66.0, "数据获取完成")
+        return data
+    
+    @staticmethod
+    def _count_agent_steps(agent) -> Optional[int]:
+        """CodeAgent 本次运行执行的步数（兼容 memory.steps 和旧版本的 logs）"""
+        steps = getattr(getattr(agent, "memory", None), "steps", None)
+        if steps is None:
+            steps = getattr(agent, "logs", None)
+        if steps is None:
+            return None
+        return sum(1 for step in steps if type(step).__name__ == "ActionStep")
+    
+    def _fetch_with_agent(self, query: str, progress_callback=None) -> FetchedData:
+        """由 CodeAgent 生成并执行SQL，失败时自动重试
+        
+        Args:
+            query: 用户的查询指令
+            progress_callback: 可选的进度回调函数
+            
+        Returns:
+            FetchedData: 查询结果句柄
+            
+        Raises:
+            Exception: 当所有重试都失败时抛出
+        """
+        errors = []
+        retry_count = 0
+        fetch_start = time.perf_counter()
+        
         # 重试循环
         while retry_count < self.max_retries:
+            attempt_start = time.perf_counter()
+            sql, data = None, None
             try:
                 # 构建提示词
                 prompt = self.datafetcher_generate_prompt(query)
@@ -208,36 +489,52 @@ class DataFetcherAgent:
                 if progress_callback:
                     progress_callback(45.0, "生成SQL查询")
                 
-                # 执行查询
-                result = self.agent.run(prompt)
+                # CodeAgent 连同它的结果槽位从池中租用，归还时清空运行记录和槽位，
+                # 失败的尝试不会留下过期结果
+                with self._code_agents.lease() as (agent, result_slot):
+                    try:
+                        # 执行查询
+                        result = agent.run(prompt)
+                    finally:
+                        sql, data = result_slot.sql, result_slot.take()
+                        steps = self._count_agent_steps(agent)
                 
                 # 记录日志
-                self._log_query(query, result, retry_count)
+                self._log_query(
+                    query, result, retry_count, path="agent", sql=sql,
+                    duration_ms=round((time.perf_counter() - attempt_start) * 1000, 1),
+                    rows=data.row_count if data is not None else None, steps=steps,
+                )
                 
                 # 报告正在处理查询结果
                 if progress_callback:
                     progress_callback(60.0, "处理查询结果")
                 
                 # 检查查询结果
-                if self._last_result is not None:
+                if data is not None:
                     # 成功获取结果
                     # 报告数据获取完成
                     if progress_callback:
                         progress_callback(66.0, "数据获取完成")
-                    return self._last_result
+                    return data
                 else:
                     # 未返回结果，记录错误并重试
                     error_msg = "查询未返回任何结果"
                     errors.append(error_msg)
                     retry_count += 1
-                    self._log_error(query, error_msg, retry_count)
+                    self._log_error(query, error_msg, retry_count, path="agent", sql=sql)
                     
             except Exception as e:
                 # 捕获异常，记录错误并重试
+                if data is not None:
+                    data.close()
                 error_msg = str(e)
                 errors.append(error_msg)
                 retry_count += 1
-                self._log_error(query, error_msg, retry_count)
+                self._log_error(
+                    query, error_msg, retry_count, path="agent", sql=sql,
+                    duration_ms=round((time.perf_counter() - attempt_start) * 1000, 1),
+                )
         
         # 所有重试都失败
         error_msg = f"达到最大重试次数 ({self.max_retries})，所有尝试均失败"
@@ -245,9 +542,89 @@ class DataFetcherAgent:
             final_error = f"{error_msg}。最后一次错误: {errors[-1]}" 
         else:
             final_error = error_msg
-        self._log_error(query, final_error, -1)  # -1表示最终错误
+        self._log_error(  # -1表示最终错误
+            query, final_error, -1, path="agent",
+            duration_ms=round((time.perf_counter() - fetch_start) * 1000, 1),
+        )
         raise Exception(final_error)
             
+    def prepare(self, parsed_info: Dict) -> bool:
+        """在查询解析尚未结束时提前准备数据获取
+        
+        由 QueryParserAgent 的 early_callback 在后台线程中调用：股票名称和
+        财务指标一到达就规范化实体名称并编译为查询，把涉及的 (表, 股票)
+        分区提前读入按股票分区的缓存，与LLM输出的剩余部分并行进行。
+        报告日区间此时可能尚未解析，分区本身包含全部报告期，不受影响；
+        完整的解析结果到达后 _fetch_compiled 直接在缓存中命中。
+
+        Args:
+            parsed_info: 部分解析结果（"解析结果"字段的格式）
+
+        Returns:
+            bool: 是否已提前读取了查询涉及的分区
+        """
+        resolved = json.loads(self._resolve_entities(
+            json.dumps({"解析结果": parsed_info}, ensure_ascii=False)
+        ))
+        try:
+            compiled = compile_parsed_query(resolved["解析结果"])
+        except SqlCompileError:
+            return False
+        return get_stock_cache().prefetch(compiled)
+
+    def _resolve_entities(self, query: str) -> str:
+        """把解析结果中的股票、行业名称替换为数据库中的标准取值
+        
+        数据库按股票名称、申万行业名称精确筛选，"茅台"、"600519"、"机械行业"
+        之类的写法查询不到数据，在生成SQL之前统一替换，并把行业转换为
+        申万一级/申万二级列上的等值筛选条件；无法识别的名称保持原样并记录到日志。
+        
+        Args:
+            query: QueryParserAgent输出的JSON字符串，非JSON时原样返回
+            
+        Returns:
+            str: 股票、行业名称已规范化的查询
+        """
+        try:
+            query_result = json.loads(query)
+        except (TypeError, ValueError):
+            return query
+        if not isinstance(query_result, dict):
+            return query
+        
+        # 兼容 {"解析结果": {...}} 与直接给出字段两种结构
+        parsed = query_result.get("解析结果", query_result)
+        if not isinstance(parsed, dict):
+            return query
+        
+        changed = False
+        if parsed.get("筛选的股票名称"):
+            stock_names, unresolved = get_stock_resolver().canonicalize_names(
+                str(parsed["筛选的股票名称"])
+            )
+            if unresolved:
+                self._log_error(query, f"未在数据库中找到股票: {unresolved}", path="resolve")
+            changed |= stock_names != parsed["筛选的股票名称"]
+            parsed["筛选的股票名称"] = stock_names
+        
+        if parsed.get("行业名称"):
+            industry_resolver = get_industry_resolver()
+            industry_names, unresolved = industry_resolver.canonicalize_names(
+                str(parsed["行业名称"])
+            )
+            if unresolved:
+                self._log_error(query, f"未在申万行业分类中找到: {unresolved}", path="resolve")
+            industry_filters = industry_resolver.industry_filters(industry_names)
+            if industry_filters:
+                parsed["行业筛选条件"] = industry_filters
+                changed = True
+            changed |= industry_names != parsed["行业名称"]
+            parsed["行业名称"] = industry_names
+        
+        if not changed:
+            return query
+        return json.dumps(query_result, ensure_ascii=False)
+
     def datafetcher_generate_prompt(self, query: str) -> str:
         """生成查询提示词
         
@@ -259,53 +636,54 @@ class DataFetcherAgent:
         """
         return self.prompt_template.format(query=query)
             
-    def _log_query(self, query: str, result: str, retry_count: int = 0) -> None:
-        """记录查询日志
+    def _log_query(self, query: str, result: str, retry_count: int = 0, **fields) -> None:
+        """记录查询日志（见 query_log，写入由后台线程完成）
         
         Args:
             query: 原始查询
             result: 查询结果
             retry_count: 重试计数
+            **fields: path、sql、duration_ms、rows 等结构化字段
         """
-        timestamp = get_timestamp()
-        retry_suffix = f"_retry{retry_count}" if retry_count > 0 else ""
-        log_path = os.path.join(
-            LogConfig.LOG_DIR,
-            f"{timestamp}-DFA-query{retry_suffix}.log"
+        get_query_logger().log(
+            "query", query, retry=retry_count, message=str(result), **fields
         )
-        os.makedirs(os.path.dirname(log_path), exist_ok=True)
-        
-        with open(log_path, 'w', encoding='utf-8') as f:
-            f.write(f"时间: {timestamp}\n")
-            f.write(f"查询: {query}\n")
-            f.write(f"重试次数: {retry_count}\n")
-            f.write(f"结果: {result}\n")
             
-    def _log_error(self, query: str, error: str, retry_count: int = 0) -> None:
-        """记录错误日志
+    def _log_error(self, query: str, error: str, retry_count: int = 0, **fields) -> None:
+        """记录错误日志（见 query_log，写入由后台线程完成）
         
         Args:
             query: 导致错误的查询
             error: 错误信息
-            retry_count: 重试计数
+            retry_count: 重试计数，-1表示最终错误
+            **fields: path、sql、duration_ms 等结构化字段
         """
-        timestamp = get_timestamp()
-        retry_suffix = ""
-        if retry_count >= 0:
-            retry_suffix = f"_retry{retry_count}" 
-        else:
-            retry_suffix = "_final"
-        log_path = os.path.join(
-            LogConfig.LOG_DIR,
-            f"{timestamp}-DFA-error{retry_suffix}.log"
+        get_query_logger().log(
+            "error", query, retry=retry_count, message=str(error), **fields
         )
-        os.makedirs(os.path.dirname(log_path), exist_ok=True)
-        
-        with open(log_path, 'w', encoding='utf-8') as f:
-            f.write(f"时间: {timestamp}\n")
-            f.write(f"查询: {query}\n")
-            f.write(f"重试次数: {retry_count}\n")
-            f.write(f"错误: {error}\n") 
+
+
+_data_fetcher: Optional[DataFetcherAgent] = None
+_data_fetcher_lock = threading.Lock()
+
+
+def get_data_fetcher() -> DataFetcherAgent:
+    """获取进程内共享的数据获取代理
+    
+    LLM模型、prompt模板和空闲的 CodeAgent 在任务之间复用；每次数据获取租用各自的
+    CodeAgent 和结果槽位，多个任务可以同时使用同一个实例。
+    
+    Returns:
+        DataFetcherAgent: 使用默认模型配置的数据获取代理
+    """
+    global _data_fetcher
+    if _data_fetcher is not None:
+        return _data_fetcher
+    
+    with _data_fetcher_lock:
+        if _data_fetcher is None:
+            _data_fetcher = DataFetcherAgent()
+        return _data_fetcher
 
 
 if __name__ == "__main__":
@@ -35,9 +35,11 @@ warnings.filterwarnings("ignore", category=UserWarning)
 try:
     # 当作为模块导入时使用相对导入
     from .AgentSkills import AgentSkills
+    from .frame_types import is_compact
 except ImportError:
     # 当直接运行脚本时使用绝对导入
     from AgentSkills import AgentSkills
+    from frame_types import is_compact
 
 class PandasAIAgent:
     """PandasAI 代理类，用于处理数据分析请求"""
@@ -212,8 +214,8 @@ class PandasAIAgent:
         
         df = self.dataframe_initialization(df)
         
-        # 保存 DataFrame 的副本供后续使用
-        self._df = df.copy()
+        # 保存 DataFrame 供后续使用（取数结果已是独立的对象，不再复制）
+        self._df = df
 
         # 创建 Agent
         self.agent = Agent(
@@ -249,6 +251,7 @@ class PandasAIAgent:
         输入是dataframe格式的表格
         1、把【报告日】列的'yyyymmdd'转为日期格式
         2、把【股票代码】列转为字符串类型，也要确保例如000001这种格式不会转为：1
+        取数时已经过 frame_types.compact_frame 转换的DataFrame直接使用记录的schema，不再推断
         
         Args:
             df (pd.DataFrame): 输入的DataFrame
@@ -256,6 +259,9 @@ class PandasAIAgent:
         Returns:
             pd.DataFrame: 处理后的DataFrame
         """
+        if is_compact(df):
+            return df
+        
         try:
             # 检查是否有报告日列
             if '报告日' in df.columns:
@@ -9,15 +9,40 @@
 # 6、生成计算步骤
 # 7、返回结构化数据结论
 
-import json
+import asyncio
 import os
-import yaml  # 添加yaml库导入
+import random
 import re
+import threading
+import time
 from typing import Dict, List, Tuple, Optional
-from litellm import completion
+from litellm import acompletion, completion
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .term_index import FinancialTermIndex, MANUAL_MAPPINGS, get_term_index
+    from .term_matcher import get_term_matcher
+    from .date_range_extractor import extract_date_range
+    from .stock_resolver import StockMatch, get_stock_resolver
+    from .industry_resolver import IndustryMatch, get_industry_resolver
+    from .query_router import judge_query_difficulty_locally
+    from .financial_db import FINANCIAL_TABLES
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from term_index import FinancialTermIndex, MANUAL_MAPPINGS, get_term_index
+    from term_matcher import get_term_matcher
+    from date_range_extractor import extract_date_range
+    from stock_resolver import StockMatch, get_stock_resolver
+    from industry_resolver import IndustryMatch, get_industry_resolver
+    from query_router import judge_query_difficulty_locally
+    from financial_db import FINANCIAL_TABLES
 
 def query_parser_agent(
-    user_query: str, model: str = "deepseek-chat", progress_callback=None
+    user_query: str, 
+    model: str = "deepseek-chat", 
+    progress_callback=None, 
+    early_callback=None
 ) -> Dict:
     """解析用户查询并返回结构化数据和保存结果的路径
     
@@ -25,11 +50,13 @@ def query_parser_agent(
         user_query: 用户输入的自然语言查询字符串
         model: 使用的模型，可选 "deepseek-chat"、"gpt-4" 或 "gpt-4-0613"
         progress_callback: 可选的进度回调函数，用于报告进度
+        early_callback: 可选的回调函数，股票名称和财务指标解析完成时以
+            部分解析结果调用，用于提前准备数据获取
         
     Returns:
         Dict: 包含用户问题和解析结果的字典
     """
-    # 初始化QueryParserAgent和QueryJudgeAgent
+    # 初始化QueryParserAgent
     parser_agent = QueryParserAgent(model=model)
     
     # 报告开始解析
@@ -38,27 +65,140 @@ def query_parser_agent(
     
     # 解析用户查询
     parse_result = parser_agent.parse_query(
-        user_query, progress_callback=progress_callback
+        user_query, 
+        progress_callback=progress_callback, 
+        early_callback=early_callback
     )
     
     # 更新进度
     if progress_callback:
         progress_callback(33.0, "查询解析完成")
     
-    # 判断查询难度
-    # difficulty_level = judge_agent.judge_query_difficulty(user_query)
+    return _attach_route(user_query, parse_result)
+
+
+def _attach_route(user_query: str, parse_result: Dict) -> Dict:
+    """在解析结果上附加本地判断的查询难度和路由
     
-    # 合并结果
-    result = parse_result.copy()
-    # result["难度等级"] = difficulty_level
+    难度1的查询取数后直接返回表格，不经过PandasAI。
     
+    Args:
+        user_query: 用户输入的自然语言查询字符串
+        parse_result: QueryParserAgent.parse_query 的返回值
+        
+    Returns:
+        Dict: 附加了难度等级和路由的结果副本
+    """
+    result = parse_result.copy()
+    if "解析结果" in parse_result:
+        route = judge_query_difficulty_locally(
+            user_query, parse_result["解析结果"]
+        )
+        result["难度等级"] = route.difficulty
+        result["路由"] = route.route
+        print(f"查询难度: {route.difficulty}，路由: {route.route}（{route.reason}）")
     return result
 
+
+async def parse_queries(
+    queries: List[str], 
+    concurrency: int = 8, 
+    model: str = "deepseek-chat",
+    parser_agent: Optional["QueryParserAgent"] = None
+) -> List[Dict]:
+    """并发解析一批查询（如自选股报告中的几十个问题）
+    
+    所有查询共享同一个 QueryParserAgent 和进程内的术语索引，通过 litellm 的
+    异步接口并发调用LLM，同时进行的LLM请求不超过concurrency个；每个查询
+    独立重试，单个查询失败不影响其他查询。
+    
+    Args:
+        queries: 用户查询列表
+        concurrency: 最大并发LLM请求数
+        model: 使用的模型，parser_agent为None时用于创建解析代理
+        parser_agent: 可选的解析代理，默认新建一个
+        
+    Returns:
+        List[Dict]: 与输入顺序一致的解析结果，格式与 query_parser_agent 相同
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency 必须大于等于1")
+    parser_agent = parser_agent or QueryParserAgent(model=model)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def parse_one(user_query: str) -> Dict:
+        parse_result = await parser_agent.parse_query_async(
+            user_query, semaphore=semaphore
+        )
+        return _attach_route(user_query, parse_result)
+    
+    return await asyncio.gather(*(parse_one(query) for query in queries))
+
+class ParseStats:
+    """进程内的查询解析统计，记录本地快速路径的命中情况和节省的LLM耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local_parses = 0
+        self.local_seconds = 0.0
+        self.llm_parses = 0
+        self.llm_seconds = 0.0
+
+    def record_local(self, seconds: float) -> None:
+        """记录一次本地解析"""
+        with self._lock:
+            self.local_parses += 1
+            self.local_seconds += seconds
+
+    def record_llm(self, seconds: float) -> None:
+        """记录一次LLM解析（包含重试）"""
+        with self._lock:
+            self.llm_parses += 1
+            self.llm_seconds += seconds
+
+    def snapshot(self) -> Dict:
+        """返回统计快照
+
+        Returns:
+            Dict: 解析总数、快速路径命中率、LLM平均耗时和估算节省的时间
+        """
+        with self._lock:
+            total = self.local_parses + self.llm_parses
+            avg_llm = self.llm_seconds / self.llm_parses if self.llm_parses else 0.0
+            return {
+                "total_parses": total,
+                "local_parses": self.local_parses,
+                "llm_parses": self.llm_parses,
+                "fast_path_rate": self.local_parses / total if total else 0.0,
+                "avg_llm_seconds": avg_llm,
+                "estimated_saved_seconds": max(
+                    0.0, self.local_parses * avg_llm - self.local_seconds
+                ),
+            }
+
+
+# 进程内共享的解析统计
+parse_stats = ParseStats()
+
+
 class QueryParserAgent:
     """查询解析代理，负责解析用户的自然语言查询并转换为结构化数据"""
 
     # 最大重试次数
     MAX_RETRIES = 3
+    # 异步解析重试前的等待时间：在 [0, min(上限, 基数*2^(n-1))] 中随机选取，
+    # 批量解析时各查询的重试错开，不会同时再次请求LLM
+    RETRY_BACKOFF_BASE = float(os.getenv("QPA_RETRY_BACKOFF_BASE", "0.5"))
+    RETRY_BACKOFF_MAX = float(os.getenv("QPA_RETRY_BACKOFF_MAX", "8"))
+
+    # 是否启用本地快速路径，以及启用所需的最低术语匹配置信度
+    FAST_PATH_ENABLED = True
+    FAST_PATH_MIN_CONFIDENCE = 0.9
+    
+    # 是否以流式方式调用LLM，边接收边逐行解析
+    STREAMING_ENABLED = os.getenv("QPA_STREAMING", "true").lower() != "false"
+    # 这些字段到达后即可提前交给下游开始准备数据获取
+    EARLY_HANDOFF_FIELDS = ("筛选的股票名称", "需要从sql抽取的财务指标")
 
     def _get_timestamp(self) -> str:
         from datetime import datetime
@@ -72,13 +212,7 @@ class QueryParserAgent:
             model: 使用的模型，可选 "deepseek-chat"、"gpt-4" 或 "gpt-4-0613"
         """
         # 常用财务指标的手动映射表
-        self.manual_mappings = {
-            "归母净利润": "归属于母公司的净利润",
-            "归属于母公司所有者的净利润": "归属于母公司的净利润",
-            "归属于母公司股东的净利润": "归属于母公司的净利润",
-            "归母净利": "归属于母公司的净利润",
-            "归属于母公司净利": "归属于母公司的净利润"
-        }
+        self.manual_mappings = MANUAL_MAPPINGS
         
         self.model = model
         self.temperature = 0
@@ -90,126 +224,40 @@ class QueryParserAgent:
         # 根据模型选择配置
         self.model_name = "deepseek/deepseek-chat"
         os.environ["OPENAI_API_BASE"] = "https://api.deepseek.com/v1"
-            
-        self._load_financial_terms()
-        self._load_table_columns()
-        self._load_prompts()
+        # 可选的API地址，设置后覆盖模型提供商的默认地址（如本地测试服务）
+        self.api_base = None
         
-    def _load_financial_terms(self):
-        """加载金融术语和列名解释"""
-        self.standard_terms = set()
-        self.aliases = {}
+        # 引用进程内共享的术语索引，不再每次实例化都读取磁盘文件
+        self._attach_term_index(get_term_index())
         
-        try:
-            # 使用相对于当前文件的路径
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            db_columns_path = os.path.join(
-                current_dir, "db_columns_explained.json"
-            )
-            # print(f"Attempting to load financial terms from: {db_columns_path}") # 移除调试打印
-            
-            with open(db_columns_path, "r", encoding="utf-8") as f:
-                self.db_columns = json.load(f) # 保持加载原始数据
-                # print(f"Raw data loaded from db_columns_explained.json (first 500 chars): {str(self.db_columns)[:500]}") # 移除调试打印
-                
-                # 正确逻辑: 检查顶层结构并访问 'aliases' 键下的嵌套字典
-                if isinstance(self.db_columns, dict) and 'aliases' in self.db_columns:
-                    alias_mapping = self.db_columns['aliases']
-                    if isinstance(alias_mapping, dict):
-                        for alias, standard_name in alias_mapping.items():
-                            if isinstance(standard_name, str): # 确保值是字符串
-                                self.standard_terms.add(standard_name)
-                                self.aliases[alias] = standard_name
-                    else:
-                         print(f"Warning: Expected 'aliases' key in {db_columns_path} to contain a dictionary, but found {type(alias_mapping)}.")
-                else:
-                    print(f"Warning: Expected {db_columns_path} to be a JSON object with an 'aliases' key.")
-
-
-                # 确保标准名自身也能被识别（来自 db_columns_names.json）
-                # 这一步很重要，因为它能把 db_columns_names.json 中定义的列名也加入 standard_terms
-                if hasattr(self, 'table_columns') and isinstance(self.table_columns, dict):
-                   for table_info in self.table_columns.values():
-                       if isinstance(table_info, dict):
-                           for col_name in table_info.get("columns", []):
-                               self.standard_terms.add(col_name)
-
-
-        except FileNotFoundError:
-             print(f"Error: Financial terms file not found at {db_columns_path}")
-             self.db_columns = {}
-             self.standard_terms = set()
-             self.aliases = {}
-        except json.JSONDecodeError:
-             print(f"Error: Failed to decode JSON from {db_columns_path}")
-             self.db_columns = {}
-             self.standard_terms = set()
-             self.aliases = {}
-        except Exception as e:
-            print(f"加载金融术语时发生意外错误: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
-            # 使用默认空字典/集合，避免完全失败
-            self.db_columns = {}
-            self.standard_terms = set()
-            self.aliases = {}
+    def _attach_term_index(self, term_index: FinancialTermIndex):
+        """绑定共享的术语索引
         
-    def _load_table_columns(self):
-        """加载数据库表结构信息"""
-        try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            table_columns_path = os.path.join(
-                current_dir, "db_columns_names.json"
-            )
-            
-            with open(table_columns_path, "r", encoding="utf-8") as f:
-                self.table_columns = json.load(f)
-        except Exception as e:
-            print(f"加载数据库表结构信息失败: {str(e)}")
-            self.table_columns = {}
+        Args:
+            term_index: 进程内共享的只读术语索引
+        """
+        self.term_index = term_index
+        self.standard_terms = term_index.standard_terms
+        self.aliases = term_index.aliases
+        self.table_columns = term_index.table_columns
+        self.column_lookup = term_index.column_lookup
+        self.QPA_extract_prompt = term_index.qpa_extract_prompt
             
-    def _get_table_for_column(self, column_name: str) -> Optional[str]:
+    def _get_table_for_column(
+        self, column_name: str, preferred_tables: Optional[List[str]] = None
+    ) -> Optional[str]:
         """确定财务科目属于哪个表
         
         Args:
             column_name: 标准化后的财务科目名称
+            preferred_tables: 可选的优先表，科目存在于多张表时优先选用
             
         Returns:
             str: 表名 (income_table/balance_table/cashflow_table/ratio_table) 
                  或 None
         """
-        for table_name, table_info in self.table_columns.items():
-            if column_name in table_info["columns"]:
-                return table_name
-        return None
+        return self.column_lookup.table_for(column_name, preferred_tables)
         
-    def _load_prompts(self):
-        """加载prompt模板"""
-        try:
-            # 使用相对于当前文件的路径
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            prompt_path = os.path.join(
-                current_dir, "prompt/QPA_extract_prompt.yaml"
-            )
-            
-            # 加载提取信息的prompt
-            # 使用with语句打开文件，确保文件在使用完毕后被关闭
-            with open(prompt_path, "r", encoding="utf-8") as f:
-                # 读取yaml文件内容
-                yaml_content = yaml.safe_load(f)
-                # 构建完整的prompt
-                self.QPA_extract_prompt = (
-                    f"{yaml_content['system_prompt']}\n\n"
-                    f"请返回结果，严格遵守返回格式如下：\n"
-                    f"{yaml_content['return_format']}"
-                )
-        except Exception as e:
-            print(f"加载prompt模板失败: {str(e)}")
-            # 使用默认提示模板
-            self.QPA_extract_prompt = (
-                "请解析用户查询，提取关键信息，并返回JSON格式。"
-            )
-            
     def _match_financial_term(
         self, term: str
     ) -> Tuple[Optional[str], List[str]]:
@@ -221,9 +269,12 @@ class QueryParserAgent:
         Returns:
             Tuple[str, List[str]]: (匹配到的标准名称, 候选列表)
         """
-        # 1. 首先检查手动映射表
+        # 1. 首先检查手动映射表，映射目标本身是别名时继续映射到数据库列名
         if term in self.manual_mappings:
-            return self.manual_mappings[term], []
+            mapped = self.manual_mappings[term]
+            if mapped not in self.column_lookup:
+                mapped = self.aliases.get(mapped, mapped)
+            return mapped, []
             
         # 2. 检查是否直接是标准名称
         if term in self.standard_terms:
@@ -236,6 +287,37 @@ class QueryParserAgent:
         # 4. 如果都没找到匹配，返回原始术语
         return term, []
         
+    def _standardize_indicators(self, raw_indicators: List[str]) -> List[str]:
+        """将财务指标转换为标准名称并标注所属表
+        
+        先确定只属于一张表的科目，再以这些表作为优先表确定多表共有科目的归属，
+        避免生成不必要的跨表join。
+        
+        Args:
+            raw_indicators: 原始财务指标名称列表
+            
+        Returns:
+            List[str]: 格式为"指标名称来自:表名"的列表，找不到表的指标被丢弃
+        """
+        # 使用_match_financial_term方法将财务指标转换为标准名称
+        std_names = [
+            self._match_financial_term(indicator)[0]
+            for indicator in raw_indicators
+        ]
+        preferred_tables = [
+            self.column_lookup.tables_for(std_name)[0]
+            for std_name in std_names
+            if len(self.column_lookup.tables_for(std_name)) == 1
+        ]
+        
+        formatted_indicators = []
+        for std_name in std_names:
+            # 确定该指标属于哪个表
+            table_name = self._get_table_for_column(std_name, preferred_tables)
+            if table_name:
+                formatted_indicators.append(f"{std_name}来自:{table_name}")
+        return formatted_indicators
+        
     def _clean_string(self, text: str) -> str:
         """清理字符串中的转义字符和多余的引号
         
@@ -297,21 +379,34 @@ class QueryParserAgent:
             if not re.match(date_pattern, date_range):
                 # 尝试提取数字并格式化
                 dates = re.findall(r'\d{8}', date_range)
+                # 按规则解析"2019-2023年"、"2021Q1到2022Q4"等写法
+                extraction = (
+                    extract_date_range(date_range, apply_growth_extension=False)
+                    if len(dates) < 2 else None
+                )
                 if len(dates) >= 2:
                     date_range = f"{dates[0]}-{dates[1]}"
+                elif extraction is not None:
+                    date_range = extraction.date_range
                 elif len(dates) == 1:
                     date_range = f"{dates[0]}-{dates[0]}"
                 else:
                     date_range = ""
             cleaned_info["报告日区间"] = date_range
         
-        # 清理股票名称和行业名称
-        cleaned_info["筛选的股票名称"] = self._clean_string(
-            extracted_info.get("筛选的股票名称", "")
+        # 清理股票名称和行业名称，统一为数据库中的标准股票名称和申万行业名称
+        stock_names, unresolved = get_stock_resolver().canonicalize_names(
+            self._clean_string(extracted_info.get("筛选的股票名称", ""))
         )
-        cleaned_info["行业名称"] = self._clean_string(
-            extracted_info.get("行业名称", "")
+        if unresolved:
+            print(f"未在股票名称索引中找到: {unresolved}")
+        cleaned_info["筛选的股票名称"] = stock_names
+        industry_names, unresolved = get_industry_resolver().canonicalize_names(
+            self._clean_string(extracted_info.get("行业名称", ""))
         )
+        if unresolved:
+            print(f"未在申万行业分类中找到: {unresolved}")
+        cleaned_info["行业名称"] = industry_names
         
         # 处理财务指标
         if "需要从sql抽取的财务指标" in extracted_info:
@@ -323,50 +418,316 @@ class QueryParserAgent:
                 ]
             
             # 确保每个指标格式正确: "指标名称来自:表名"
-            formatted_indicators = []
-            valid_tables = {
-                "income_table", "balance_table", "cashflow_table", "ratio_table"
-            }
+            # db_columns_names.json 加载失败时表结构索引为空，退回到四张财务数据表
+            valid_tables = set(self.column_lookup.tables) or set(FINANCIAL_TABLES)
+            names_and_tables = []
             for indicator in indicators:
                 if isinstance(indicator, str):
                     # 清理指标字符串
                     indicator = self._clean_string(indicator)
                     # 检查格式是否正确
-                    if "来自:" in indicator:
-                        ind_parts = indicator.split("来自:")
-                        if len(ind_parts) == 2 and ind_parts[1] in valid_tables:
-                            formatted_indicators.append(indicator)
-                        else:
-                            # 尝试修复格式
-                            ind_name = ind_parts[0].strip()
-                            table_name = self._get_table_for_column(ind_name)
-                            if table_name:
-                                formatted_indicators.append(
-                                    f"{ind_name}来自:{table_name}"
-                                )
-                    else:
-                        # 没有表名信息，尝试确定表名
-                        ind_name = indicator.strip()
-                        table_name = self._get_table_for_column(ind_name)
-                        if table_name:
-                            formatted_indicators.append(
-                                f"{ind_name}来自:{table_name}"
-                            )
+                    ind_parts = indicator.split("来自:")
+                    table_name = None
+                    if len(ind_parts) == 2 and ind_parts[1] in valid_tables:
+                        table_name = ind_parts[1]
+                    names_and_tables.append((ind_parts[0].strip(), table_name))
+            
+            # 已确定表名的指标所在的表，作为多表共有科目的优先归属，减少跨表join
+            preferred_tables = [
+                table for _, table in names_and_tables if table
+            ]
+            formatted_indicators = []
+            for ind_name, table_name in names_and_tables:
+                if not table_name:
+                    # 没有表名信息或格式错误，尝试确定表名
+                    table_name = self._get_table_for_column(
+                        ind_name, preferred_tables
+                    )
+                if table_name:
+                    formatted_indicators.append(
+                        f"{ind_name}来自:{table_name}"
+                    )
             
             cleaned_info["需要从sql抽取的财务指标"] = formatted_indicators
         
         return cleaned_info
 
+    def _resolve_date_range_locally(
+        self, user_query: str
+    ) -> Tuple[Optional[str], List[Tuple[int, int]]]:
+        """按规则在本地解析查询中的报告日区间（含同比/环比的上一期扩展）
+        
+        本地区间会跳过LLM的日期解析并覆盖LLM的结果，所以只有匹配到的片段覆盖了
+        查询中全部的日期描述时才使用；否则返回None，由LLM按完整的日期说明解析。
+        
+        Args:
+            user_query: 用户输入的自然语言查询字符串
+            
+        Returns:
+            Tuple[Optional[str], List[Tuple[int, int]]]: 
+                (YYYYMMDD-YYYYMMDD格式的区间或None, 已解释的片段位置)
+        """
+        extraction = extract_date_range(user_query)
+        if extraction is None or not extraction.complete:
+            return None, []
+        return extraction.date_range, extraction.spans
+
+    def _parse_locally(
+        self, 
+        user_query: str, 
+        date_range: Optional[str] = None, 
+        date_spans: Optional[List[Tuple[int, int]]] = None
+    ) -> Optional[Dict]:
+        """不调用LLM，使用本地术语匹配器解析查询
+        
+        只有当财务指标全部由已知术语匹配得到、置信度足够高，且报告日区间也能
+        在本地确定时才返回结果，否则返回None交由LLM解析。股票（名称、简称、
+        代码）和申万行业由本地索引识别并替换为标准名称。
+        
+        Args:
+            user_query: 用户输入的自然语言查询字符串
+            date_range: 已在本地解析出的报告日区间，为None时在此解析
+            date_spans: 报告日区间在查询中的位置
+            
+        Returns:
+            Optional[Dict]: 与LLM解析结果格式相同的字典，或None
+        """
+        if not self.FAST_PATH_ENABLED:
+            return None
+        
+        if date_range is None:
+            date_range, date_spans = self._resolve_date_range_locally(
+                user_query
+            )
+        if not date_range:
+            return None
+        
+        # 先识别股票和行业名称，与财务术语重叠时保留较长的一方（如"中国平安"）
+        stock_matches, industry_matches = self._find_entities_locally(
+            user_query, date_spans
+        )
+        resolved_spans = list(date_spans or []) + [
+            (match.start, match.end) 
+            for match in stock_matches + industry_matches
+        ]
+        
+        extraction = get_term_matcher().extract(user_query, resolved_spans)
+        if extraction.confidence < self.FAST_PATH_MIN_CONFIDENCE:
+            return None
+        
+        formatted_indicators = self._standardize_indicators(
+            extraction.indicators
+        )
+        if not formatted_indicators:
+            return None
+        
+        stock_names = []
+        for match in stock_matches:
+            if match.entity.name not in stock_names:
+                stock_names.append(match.entity.name)
+        industry_names = []
+        for match in industry_matches:
+            if match.industry.name not in industry_names:
+                industry_names.append(match.industry.name)
+        
+        return self._format_validation_and_cleaning({
+            "报告日区间": date_range,
+            "筛选的股票名称": ",".join(stock_names),
+            "行业名称": ",".join(industry_names),
+            "需要从sql抽取的财务指标": formatted_indicators,
+        })
+
+    def _find_entities_locally(
+        self, 
+        user_query: str, 
+        date_spans: Optional[List[Tuple[int, int]]] = None
+    ) -> Tuple[List[StockMatch], List[IndustryMatch]]:
+        """在查询中识别股票（名称、简称、代码）和申万行业
+        
+        股票简称、行业名称可能与财务术语重叠（例如"电力"之于某个指标名称），
+        此时以更长的匹配为准；股票与行业重叠时（如"平安银行"中的"银行"）
+        以股票为准。
+        
+        Args:
+            user_query: 用户输入的自然语言查询字符串
+            date_spans: 已解析为报告日区间的片段，不参与识别
+            
+        Returns:
+            Tuple[List[StockMatch], List[IndustryMatch]]: 识别出的股票和行业
+        """
+        def overlaps(span, other_spans, strictly_longer=False):
+            start, end = span
+            return any(
+                start < other_end and other_start < end
+                and (not strictly_longer or other_end - other_start > end - start)
+                for other_start, other_end in other_spans
+            )
+        
+        date_spans = date_spans or []
+        term_spans = [
+            (term.start, term.end)
+            for term in get_term_matcher().extract(user_query, date_spans).matches
+        ]
+        
+        stock_matches = [
+            match for match in get_stock_resolver().find_in_text(user_query)
+            if not overlaps(match[:2], date_spans)
+            and not overlaps(match[:2], term_spans, strictly_longer=True)
+        ]
+        stock_spans = [match[:2] for match in stock_matches]
+        industry_matches = [
+            match for match in get_industry_resolver().find_in_text(user_query)
+            if not overlaps(match[:2], date_spans + stock_spans)
+            and not overlaps(match[:2], term_spans, strictly_longer=True)
+        ]
+        return stock_matches, industry_matches
+
+    def _parse_response_line(
+        self, line: str, extracted_info: Dict, progress_callback=None
+    ) -> Optional[str]:
+        """解析LLM返回的一行 "字段: 值"，结果写入extracted_info
+        
+        Args:
+            line: 一行响应文本
+            extracted_info: 已解析的字段
+            progress_callback: 可选的进度回调函数，用于报告进度
+            
+        Returns:
+            Optional[str]: 解析出的字段名，不是 "字段: 值" 格式时返回None
+        """
+        if ':' not in line:
+            return None
+        key, value = line.split(':', 1)
+        key = key.strip()
+        value = self._clean_string(value.strip())  # 清理字符串
+        
+        if key == "需要从sql抽取的财务指标":
+            # 报告进度 - 标准化财务指标
+            if progress_callback:
+                progress_callback(25.0, "标准化财务指标")
+            
+            # 对财务科目进行标准化处理
+            raw_indicators = [
+                x.strip() 
+                for x in value.split(',') 
+                if x.strip()
+            ]
+            # 存储标准化后的指标和其所属表
+            extracted_info[key] = self._standardize_indicators(raw_indicators)
+        else:
+            # 其他字段保持原样
+            extracted_info[key] = value
+            if progress_callback and "需要从sql抽取的财务指标" not in extracted_info:
+                # 财务指标到达之前，每解析出一个字段推进一点进度（15% -> 25%）
+                progress_callback(
+                    min(15.0 + 2.5 * len(extracted_info), 22.5), 
+                    "提取查询关键信息"
+                )
+        return key
+
+    def _completion_kwargs(self, system_prompt: str, user_query: str) -> Dict:
+        """构造LLM调用参数，同步、流式和异步调用共用
+        
+        Args:
+            system_prompt: 系统prompt
+            user_query: 用户查询
+            
+        Returns:
+            Dict: litellm completion/acompletion 的关键字参数
+        """
+        kwargs = {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_query}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+        if self.api_base:
+            kwargs["api_base"] = self.api_base
+        return kwargs
+
+    def _stream_completion(self, system_prompt: str, user_query: str, on_line) -> str:
+        """以流式方式调用LLM，每收到完整的一行就交给on_line处理
+        
+        Args:
+            system_prompt: 系统prompt
+            user_query: 用户查询
+            on_line: 处理一行响应文本的回调
+            
+        Returns:
+            str: 完整的响应文本
+        """
+        response = completion(
+            **self._completion_kwargs(system_prompt, user_query), stream=True
+        )
+        
+        chunks = []
+        buffer = ""
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if not delta:
+                continue
+            chunks.append(delta)
+            buffer += delta
+            # 与非流式解析一致，同时处理真实换行符和文本中的\\n
+            lines = re.split(r'\\n|\n', buffer)
+            buffer = lines.pop()
+            for line in lines:
+                on_line(line)
+        if buffer.strip():
+            on_line(buffer)
+        return "".join(chunks)
+
+    def _try_fast_path(
+        self, user_query: str
+    ) -> Tuple[Optional[Dict], Optional[str], str]:
+        """尝试本地快速路径，并为LLM解析准备系统prompt
+        
+        查询只包含已知术语时直接得到解析结果，不调用LLM；报告日区间已在本地
+        确定时LLM使用不含日期说明的精简prompt。
+        
+        Args:
+            user_query: 用户输入的自然语言查询字符串
+            
+        Returns:
+            Tuple[Optional[Dict], Optional[str], str]: 
+                (本地解析结果或None, 本地解析的报告日区间或None, 系统prompt)
+        """
+        local_start = time.perf_counter()
+        local_date_range, date_spans = self._resolve_date_range_locally(
+            user_query
+        )
+        local_info = self._parse_locally(
+            user_query, local_date_range, date_spans
+        )
+        if local_info is not None:
+            parse_stats.record_local(time.perf_counter() - local_start)
+            print(f"本地快速路径解析完成: {parse_stats.snapshot()}")
+        
+        system_prompt = (
+            self.term_index.qpa_extract_prompt_without_dates
+            if local_date_range else self.QPA_extract_prompt
+        )
+        return local_info, local_date_range, system_prompt
+
     def _extract_basic_info(
-        self, user_query: str, progress_callback=None
+        self, user_query: str, progress_callback=None, early_callback=None
     ) -> Dict:
         """从用户的自然语言查询中提取结构化的财务查询信息，失败时自动重试
         
         该方法使用LiteLLM API解析用户的自然语言查询,提取关键信息并进行标准化处理。
+        流式调用时逐行解析，股票名称和财务指标一到达就通过early_callback交给
+        下游提前准备数据获取，不必等待完整的响应。
         
         Args:
             user_query: 用户输入的自然语言查询字符串
             progress_callback: 可选的进度回调函数，用于报告进度
+            early_callback: 可选的回调函数，股票名称和财务指标解析完成时以
+                部分解析结果调用一次
             
         Returns:
             Dict: 包含以下字段的字典:
@@ -380,8 +741,19 @@ class QueryParserAgent:
         Raises:
             Exception: 所有重试都失败时抛出
         """
+        local_info, local_date_range, system_prompt = self._try_fast_path(
+            user_query
+        )
+        if local_info is not None:
+            if progress_callback:
+                progress_callback(25.0, "标准化财务指标")
+            self._hand_off_early(local_info, early_callback)
+            return local_info
+        
+        llm_start = time.perf_counter()
         errors = []
         retry_count = 0
+        handed_off = False
         
         # 重试循环
         while retry_count < self.MAX_RETRIES:
@@ -390,67 +762,55 @@ class QueryParserAgent:
                 if progress_callback:
                     progress_callback(15.0, "提取查询关键信息")
                 
-                # 调用LiteLLM API进行自然语言解析
-                response = completion(
-                    model=self.model_name,
-                    messages=[
-                        {"role": "system", "content": self.QPA_extract_prompt},
-                        {"role": "user", "content": user_query}
-                    ],
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens
-                )
-                
-                # 解析API返回的结果
-                result = response.choices[0].message.content
-                print(f"原始API响应内容: {result}")
-                
-                # 使用正则表达式分割字符串，处理各种可能的换行符形式
-                # 包括实际的\n换行符和文本中的\\n字符串
-                lines = re.split(r'\\n|\n', result.strip())
-                print(f"分割后的行数: {len(lines)}")
                 extracted_info = {}
                 
-                # 逐行处理API返回的结果
-                for line in lines:
-                    if ':' in line:
-                        key, value = line.split(':', 1)
-                        key = key.strip()
-                        value = self._clean_string(value.strip())  # 清理字符串
-                        
-                        if key == "需要从sql抽取的财务指标":
-                            # 报告进度 - 标准化财务指标
-                            if progress_callback:
-                                progress_callback(25.0, "标准化财务指标")
-                            
-                            # 对财务科目进行标准化处理
-                            raw_indicators = [
-                                x.strip() 
-                                for x in value.split(',') 
-                                if x.strip()
-                            ]
-                            # 存储标准化后的指标和其所属表
-                            formatted_indicators = []
-                            
-                            for indicator in raw_indicators:
-                                # 使用_match_financial_term方法将财务指标转换为标准名称
-                                std_name, _ = self._match_financial_term(
-                                    indicator
-                                )
-                                # 确定该指标属于哪个表
-                                table_name = self._get_table_for_column(
-                                    std_name
-                                )
-                                if table_name:
-                                    formatted_indicators.append(
-                                        f"{std_name}来自:{table_name}"
-                                    )
-                                    
-                            extracted_info[key] = formatted_indicators
-                        else:
-                            # 其他字段保持原样
-                            extracted_info[key] = value    
+                def on_line(line: str):
+                    nonlocal handed_off
+                    self._parse_response_line(
+                        line, extracted_info, progress_callback
+                    )
+                    if handed_off or not all(
+                        field in extracted_info 
+                        for field in self.EARLY_HANDOFF_FIELDS
+                    ):
+                        return
+                    partial_info = dict(extracted_info)
+                    if local_date_range:
+                        partial_info["报告日区间"] = local_date_range
+                    handed_off = self._hand_off_early(
+                        self._format_validation_and_cleaning(partial_info),
+                        early_callback
+                    )
+                
+                if self.STREAMING_ENABLED:
+                    # 流式调用，边接收边解析
+                    result = self._stream_completion(
+                        system_prompt, user_query, on_line
+                    )
+                    print(f"原始API响应内容: {result}")
+                else:
+                    # 调用LiteLLM API进行自然语言解析
+                    response = completion(
+                        **self._completion_kwargs(system_prompt, user_query)
+                    )
+                    
+                    # 解析API返回的结果
+                    result = response.choices[0].message.content
+                    print(f"原始API响应内容: {result}")
+                    
+                    # 使用正则表达式分割字符串，处理各种可能的换行符形式
+                    # 包括实际的\n换行符和文本中的\\n字符串
+                    lines = re.split(r'\\n|\n', result.strip())
+                    print(f"分割后的行数: {len(lines)}")
+                    
+                    # 逐行处理API返回的结果
+                    for line in lines:
+                        on_line(line)
               
+                # 本地规则解析的报告日区间优先于LLM的结果
+                if local_date_range:
+                    extracted_info["报告日区间"] = local_date_range
+                
                 # 验证和清理结果格式
                 cleaned_info = self._format_validation_and_cleaning(
                     extracted_info
@@ -460,6 +820,7 @@ class QueryParserAgent:
                 if "需要从sql抽取的财务指标" in cleaned_info and cleaned_info[
                     "需要从sql抽取的财务指标"
                 ]:
+                    parse_stats.record_llm(time.perf_counter() - llm_start)
                     return cleaned_info
                 else:
                     # 如果没有提取到财务指标，记录错误并重试
@@ -478,6 +839,7 @@ class QueryParserAgent:
                 print(traceback.format_exc())
         
         # 所有重试都失败，返回默认值
+        parse_stats.record_llm(time.perf_counter() - llm_start)
         print(f"达到最大重试次数 ({self.MAX_RETRIES})，所有尝试均失败")
         if errors:
             print(f"最后一次错误: {errors[-1]}")
@@ -489,23 +851,118 @@ class QueryParserAgent:
             "需要从sql抽取的财务指标": [],
         }
 
-    def parse_query(self, user_query: str, progress_callback=None) -> Dict:
+    async def _extract_basic_info_async(
+        self, user_query: str, semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Dict:
+        """_extract_basic_info 的异步版本，供批量解析并发调用
+        
+        Args:
+            user_query: 用户输入的自然语言查询字符串
+            semaphore: 可选的信号量，限制同时进行的LLM请求数
+            
+        Returns:
+            Dict: 与 _extract_basic_info 格式相同的解析结果
+        """
+        # 本地快速路径（术语匹配、股票和行业索引）是同步的CPU计算，
+        # 放到线程池中执行，不阻塞事件循环上其他查询的LLM请求
+        loop = asyncio.get_running_loop()
+        local_info, local_date_range, system_prompt = await loop.run_in_executor(
+            None, self._try_fast_path, user_query
+        )
+        if local_info is not None:
+            return local_info
+        
+        llm_start = time.perf_counter()
+        errors = []
+        for retry_count in range(1, self.MAX_RETRIES + 1):
+            try:
+                if semaphore is not None:
+                    async with semaphore:
+                        response = await acompletion(
+                            **self._completion_kwargs(system_prompt, user_query)
+                        )
+                else:
+                    response = await acompletion(
+                        **self._completion_kwargs(system_prompt, user_query)
+                    )
+                result = response.choices[0].message.content
+                
+                extracted_info = {}
+                for line in re.split(r'\\n|\n', result.strip()):
+                    self._parse_response_line(line, extracted_info)
+                
+                # 本地规则解析的报告日区间优先于LLM的结果
+                if local_date_range:
+                    extracted_info["报告日区间"] = local_date_range
+                
+                cleaned_info = self._format_validation_and_cleaning(
+                    extracted_info
+                )
+                if cleaned_info.get("需要从sql抽取的财务指标"):
+                    parse_stats.record_llm(time.perf_counter() - llm_start)
+                    return cleaned_info
+                error_msg = "未能提取有效的财务指标信息"
+            except Exception as e:
+                error_msg = str(e)
+            errors.append(error_msg)
+            print(f"[{user_query}] 重试 {retry_count}/{self.MAX_RETRIES}: {error_msg}")
+            if retry_count < self.MAX_RETRIES:
+                await asyncio.sleep(self._retry_delay(retry_count))
+        
+        # 所有重试都失败，返回默认值
+        parse_stats.record_llm(time.perf_counter() - llm_start)
+        print(f"[{user_query}] 达到最大重试次数 ({self.MAX_RETRIES})，所有尝试均失败")
+        return {
+            "报告日区间": "",
+            "筛选的股票名称": "",
+            "行业名称": "",
+            "需要从sql抽取的财务指标": [],
+        }
+
+    def _retry_delay(self, retry_count: int) -> float:
+        """第 retry_count 次失败后、下一次重试前的等待秒数（指数退避加随机抖动）"""
+        ceiling = min(
+            self.RETRY_BACKOFF_MAX, self.RETRY_BACKOFF_BASE * 2 ** (retry_count - 1)
+        )
+        return random.uniform(0, ceiling)
+
+    def _hand_off_early(self, partial_info: Dict, early_callback=None) -> bool:
+        """把部分解析结果交给下游，下游的异常不影响解析本身
+        
+        Args:
+            partial_info: 已清理的部分解析结果
+            early_callback: 下游提供的回调函数
+            
+        Returns:
+            bool: 是否已交接（没有可用的财务指标时不交接）
+        """
+        if not early_callback or not partial_info.get("需要从sql抽取的财务指标"):
+            return False
+        try:
+            early_callback(partial_info)
+        except Exception as e:
+            print(f"提前准备数据获取失败: {str(e)}")
+        return True
+
+    def parse_query(
+        self, user_query: str, progress_callback=None, early_callback=None
+    ) -> Dict:
         """解析用户查询并返回结构化数据
         
         Args:
             user_query: 用户的查询字符串
             progress_callback: 可选的进度回调函数，用于报告进度
+            early_callback: 可选的回调函数，股票名称和财务指标解析完成时调用
             
         Returns:
             Dict: 解析结果
         """
-        import time
         start_time = time.time()
         
         try:
             # 提取并标准化基本信息
             parsed_info = self._extract_basic_info(
-                user_query, progress_callback
+                user_query, progress_callback, early_callback
             )
             
             # 计算耗时
@@ -532,6 +989,33 @@ class QueryParserAgent:
                 "traceback": traceback.format_exc()
             }
 
+    async def parse_query_async(
+        self, user_query: str, semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Dict:
+        """parse_query 的异步版本
+        
+        Args:
+            user_query: 用户的查询字符串
+            semaphore: 可选的信号量，限制同时进行的LLM请求数
+            
+        Returns:
+            Dict: 解析结果，格式与 parse_query 相同
+        """
+        try:
+            parsed_info = await self._extract_basic_info_async(
+                user_query, semaphore
+            )
+            return {
+                "解析结果": parsed_info
+            }
+        except Exception as e:
+            print(f"解析过程中出错: {str(e)}")
+            import traceback
+            return {
+                "error": str(e),
+                "traceback": traceback.format_exc()
+            }
+
 
 class QueryJudgeAgent:
     """查询判断代理，负责判断用户的查询是否符合要求"""
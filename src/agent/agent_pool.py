@@ -0,0 +1,148 @@
+"""代理复用模块
+
+process_financial_query 原来每个任务都新建 DataFetcherAgent（创建 LiteLLMModel、
+重新读取prompt YAML），每次尝试再新建 CodeAgent。本模块提供：
+- AgentPool：进程内的空闲代理池，租用时取出一个空闲代理（没有时新建），归还时
+  清空代理的运行记录和代码执行器中的变量后放回；同一个代理同一时间只被一个线程使用
+- configure_llm_keepalive：为 litellm 设置进程内共享的 httpx 客户端，
+  与LLM服务之间的HTTPS连接在请求之间保持，不用每次重新握手
+
+环境变量：
+- LLM_KEEPALIVE_CONNECTIONS：与LLM服务保持的空闲连接数，默认8，0表示使用 litellm 的默认设置
+- LLM_KEEPALIVE_EXPIRY：空闲连接的保持时间（秒），默认60
+- LLM_REQUEST_TIMEOUT：LLM请求的超时时间（秒），默认600
+"""
+
+import contextlib
+import os
+import queue
+import threading
+from typing import Callable, Dict, Generic, Iterator, Optional, TypeVar
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import litellm
+except ImportError:
+    litellm = None
+
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "8"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "600"))
+
+T = TypeVar("T")
+
+
+class AgentPool(Generic[T]):
+    """空闲代理池"""
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        max_idle: int,
+        reset: Optional[Callable[[T], None]] = None,
+    ):
+        """
+        Args:
+            factory: 新建代理的函数
+            max_idle: 最多保留的空闲代理数，超出的代理归还时直接丢弃
+            reset: 归还时清空代理状态的函数
+        """
+        self.factory = factory
+        self.reset = reset
+        self._idle: "queue.LifoQueue[T]" = queue.LifoQueue(maxsize=max(max_idle, 1))
+        self._lock = threading.Lock()
+        # 统计
+        self.created = 0
+        self.reused = 0
+
+    @contextlib.contextmanager
+    def lease(self) -> Iterator[T]:
+        """租用一个代理，with 块结束时归还"""
+        try:
+            item = self._idle.get_nowait()
+            with self._lock:
+                self.reused += 1
+        except queue.Empty:
+            item = self.factory()
+            with self._lock:
+                self.created += 1
+        try:
+            yield item
+        finally:
+            if self.reset is not None:
+                self.reset(item)
+            try:
+                self._idle.put_nowait(item)
+            except queue.Full:
+                pass
+
+    def snapshot(self) -> Dict[str, int]:
+        """返回当前统计值
+
+        Returns:
+            Dict[str, int]: 新建、复用的次数和空闲代理数
+        """
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "idle": self._idle.qsize(),
+            }
+
+
+def reset_agent_memory(agent) -> None:
+    """清空 smolagents 代理的运行记录（兼容 memory 和旧版本的 logs）"""
+    memory = getattr(agent, "memory", None)
+    if memory is not None and hasattr(memory, "reset"):
+        memory.reset()
+    elif isinstance(getattr(agent, "logs", None), list):
+        agent.logs.clear()
+
+
+def reset_agent_state(agent) -> None:
+    """清空 CodeAgent 在任务之间保留的变量
+
+    CodeAgent 的 python_executor 保存上一次任务代码中定义的全部变量（例如查询结果
+    DataFrame），agent.state 保存 additional_args；池中的代理被另一个任务租用时，这些
+    变量会泄露给下一个用户。这里清空 agent.state 并新建执行器，工具由下一次 run()
+    重新发送给执行器。
+    """
+    state = getattr(agent, "state", None)
+    if isinstance(state, dict):
+        state.clear()
+    executor = getattr(agent, "python_executor", None)
+    if executor is None:
+        return
+    if hasattr(agent, "create_python_executor"):
+        if hasattr(executor, "cleanup"):
+            executor.cleanup()
+        agent.python_executor = agent.create_python_executor()
+    elif isinstance(getattr(executor, "state", None), dict):
+        executor.state.clear()
+
+
+_keepalive_lock = threading.Lock()
+
+
+def configure_llm_keepalive() -> bool:
+    """为 litellm 设置共享的 httpx 客户端，已经设置过时不做修改
+
+    Returns:
+        bool: 是否使用了共享客户端
+    """
+    if litellm is None or httpx is None or not LLM_KEEPALIVE_CONNECTIONS:
+        return False
+    with _keepalive_lock:
+        limits = httpx.Limits(
+            max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        )
+        if getattr(litellm, "client_session", None) is None:
+            litellm.client_session = httpx.Client(limits=limits, timeout=LLM_REQUEST_TIMEOUT)
+        if getattr(litellm, "aclient_session", None) is None:
+            litellm.aclient_session = httpx.AsyncClient(limits=limits, timeout=LLM_REQUEST_TIMEOUT)
+        return True
@@ -0,0 +1,306 @@
+"""财务数据 Arrow 快照模块
+
+Celery 的每个 prefork 子进程如果各自缓存财务数据，同一份数据会在内存中保存多份。
+本模块把四张财务数据表写成未压缩的 Arrow IPC 文件，查询时以只读方式内存映射：
+同一节点上的所有worker进程共享操作系统页缓存中的同一份数据，列的读取不需要拷贝。
+
+FETCH_BACKEND=arrow 时，编译后的查询不再访问SQLite，而是在映射的列上筛选、
+按 (股票代码, 报告日) 连接，只有结果行会被复制出来。
+快照记录数据版本标识，数据库更新后、重新构建前自动回退到 sqlite 后端。
+
+构建方式（在 src 目录下）：
+    python -m agent.arrow_snapshot build [--dir 输出目录]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import FINANCIAL_TABLES, ROOT_DIR, connect_readonly, get_data_stamp
+    from .sql_compiler import (
+        BASE_COLUMNS, JOIN_KEYS, CompiledQuery, quote_identifier, stock_filter
+    )
+    from .streaming_fetch import FetchedData
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import FINANCIAL_TABLES, ROOT_DIR, connect_readonly, get_data_stamp
+    from sql_compiler import (
+        BASE_COLUMNS, JOIN_KEYS, CompiledQuery, quote_identifier, stock_filter
+    )
+    from streaming_fetch import FetchedData
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # 快照和列式后端依赖 pyarrow
+    pa = None
+
+ARROW_SNAPSHOT_DIR = os.getenv(
+    "ARROW_SNAPSHOT_DIR", os.path.join(ROOT_DIR, "data/arrow")
+)
+MANIFEST_FILE = "_manifest.json"
+EXPORT_BATCH_ROWS = 50000
+
+
+def arrow_type_for(declared_type: str):
+    """按SQLite的类型亲和性规则把声明类型映射为Arrow类型"""
+    declared_type = (declared_type or "").upper()
+    if "INT" in declared_type:
+        return pa.int64()
+    if any(t in declared_type for t in ("CHAR", "CLOB", "TEXT", "BLOB")) or not declared_type:
+        return pa.string()
+    return pa.float64()
+
+
+def table_schema(conn, table: str):
+    """根据SQLite表的声明类型生成Arrow schema，表不存在时为None"""
+    fields = [
+        pa.field(row[1], arrow_type_for(row[2]))
+        for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")
+    ]
+    return pa.schema(fields) if fields else None
+
+
+def _coerce_value(value, arrow_type):
+    """把与列类型不符的值转换为列类型，无法转换时为空"""
+    if value is None:
+        return None
+    if pa.types.is_string(arrow_type):
+        return str(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if pa.types.is_integer(arrow_type):
+        return int(number) if number.is_integer() else None
+    return number
+
+
+def to_arrow_array(values: List, arrow_type):
+    """把一列Python值转换为Arrow数组"""
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # SQLite不强制列类型，个别行可能存的是字符串或空串
+        return pa.array([_coerce_value(v, arrow_type) for v in values], type=arrow_type)
+
+
+def iter_table_rows(conn, table: str, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[List[tuple]]:
+    """分批读取整张表的行"""
+    cursor = conn.execute(f"SELECT * FROM {quote_identifier(table)}")
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            return
+        yield rows
+
+
+def rows_to_arrays(rows: List[tuple], schema) -> List:
+    """把一批行按schema转换为Arrow数组列表"""
+    return [
+        to_arrow_array(list(values), field.type)
+        for values, field in zip(zip(*rows), schema)
+    ]
+
+
+def build_snapshot(snapshot_dir: str = ARROW_SNAPSHOT_DIR) -> Dict[str, int]:
+    """把四张财务数据表写成 Arrow IPC 文件
+
+    文件不压缩，内存映射后可以直接按列访问。先写入临时目录，完成后整体替换，
+    已经映射旧文件的进程不受影响。
+
+    Args:
+        snapshot_dir: 输出目录
+
+    Returns:
+        Dict[str, int]: 表名 -> 行数
+    """
+    tmp_dir = f"{snapshot_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    data_stamp = get_data_stamp()
+    conn = connect_readonly()
+    row_counts = {}
+    try:
+        for table in FINANCIAL_TABLES:
+            schema = table_schema(conn, table)
+            if schema is None:
+                continue
+            rows_written = 0
+            with pa.OSFile(os.path.join(tmp_dir, f"{table}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    for rows in iter_table_rows(conn, table):
+                        writer.write_batch(
+                            pa.RecordBatch.from_arrays(rows_to_arrays(rows, schema), schema=schema)
+                        )
+                        rows_written += len(rows)
+            row_counts[table] = rows_written
+    finally:
+        conn.close()
+
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {"data_stamp": data_stamp, "tables": row_counts}, f, ensure_ascii=False, indent=2
+        )
+
+    old_dir = f"{snapshot_dir}.old-{os.getpid()}"
+    if os.path.exists(snapshot_dir):
+        os.replace(snapshot_dir, old_dir)
+    os.replace(tmp_dir, snapshot_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return row_counts
+
+
+class ArrowSnapshotBackend:
+    """在内存映射的 Arrow 快照上执行编译后的查询"""
+
+    name = "arrow"
+
+    def __init__(self, snapshot_dir: str = ARROW_SNAPSHOT_DIR):
+        """
+        Args:
+            snapshot_dir: build_snapshot 的输出目录
+
+        Raises:
+            FileNotFoundError: 目录中没有快照清单时抛出
+        """
+        manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+        self.manifest_mtime = os.path.getmtime(manifest_path)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.snapshot_dir = snapshot_dir
+        # 只读映射：数据留在页缓存中，由同一节点上的所有进程共享
+        self.tables = {
+            table: pa.ipc.open_file(
+                pa.memory_map(os.path.join(snapshot_dir, f"{table}.arrow"), "r")
+            ).read_all()
+            for table in self.manifest["tables"]
+        }
+
+    def is_current(self) -> bool:
+        """快照是否与当前数据库版本一致"""
+        return self.manifest.get("data_stamp") == get_data_stamp()
+
+    def is_reexported(self) -> bool:
+        """快照是否在加载之后被重新构建"""
+        try:
+            return os.path.getmtime(
+                os.path.join(self.snapshot_dir, MANIFEST_FILE)
+            ) != self.manifest_mtime
+        except OSError:
+            return False
+
+    @staticmethod
+    def _scalar(value, column):
+        """把查询条件中的取值转换为列的类型（报告日可能存为整数）"""
+        return pa.scalar(value).cast(column.type)
+
+    def _date_mask(self, table, compiled: CompiledQuery):
+        if not compiled.date_range:
+            return None
+        dates = table["报告日"]
+        start, end = (self._scalar(v, dates) for v in compiled.date_range)
+        return pc.and_(pc.greater_equal(dates, start), pc.less_equal(dates, end))
+
+    def _row_mask(self, table, compiled: CompiledQuery):
+        """与编译SQL的 WHERE 条件相同的筛选"""
+        masks = []
+        date_mask = self._date_mask(table, compiled)
+        if date_mask is not None:
+            masks.append(date_mask)
+        stock_column, stocks = stock_filter(compiled)
+        if stocks:
+            column_values = table[stock_column]
+            masks.append(pc.is_in(
+                column_values, value_set=pa.array(stocks).cast(column_values.type)
+            ))
+        if compiled.industry_filters:
+            industry_mask = None
+            for column, values in compiled.industry_filters.items():
+                column_values = table[column]
+                mask = pc.is_in(
+                    column_values, value_set=pa.array(values).cast(column_values.type)
+                )
+                industry_mask = mask if industry_mask is None else pc.or_(industry_mask, mask)
+            masks.append(industry_mask)
+        if not masks:
+            return None
+        combined = masks[0]
+        for mask in masks[1:]:
+            combined = pc.and_(combined, mask)
+        # 与SQL一致：条件为NULL的行不返回
+        return pc.fill_null(combined, False)
+
+    def fetch(self, compiled: CompiledQuery) -> pd.DataFrame:
+        """执行编译结果
+
+        Args:
+            compiled: compile_parsed_query 的结果
+
+        Returns:
+            pd.DataFrame: 与在SQLite上执行编译SQL相同的列和行
+        """
+        # 先只保留输出列和筛选条件用到的列再筛选，filter 不必复制其余几百个指标列
+        output = list(BASE_COLUMNS) + list(compiled.table_columns[compiled.base_table])
+        filter_columns = [stock_filter(compiled)[0]] + list(compiled.industry_filters)
+        base = self.tables[compiled.base_table].select(
+            list(dict.fromkeys(output + filter_columns))
+        )
+        mask = self._row_mask(base, compiled)
+        if mask is not None:
+            base = base.filter(mask)
+        result = base.select(output)
+        for table in list(compiled.table_columns)[1:]:
+            right = self.tables[table].select(
+                list(JOIN_KEYS) + list(compiled.table_columns[table])
+            )
+            # 连接前按报告日区间缩小右表
+            date_mask = self._date_mask(right, compiled)
+            if date_mask is not None:
+                right = right.filter(pc.fill_null(date_mask, False))
+            result = result.join(right, keys=list(JOIN_KEYS), join_type="left outer")
+        result = result.sort_by([("股票代码", "ascending"), ("报告日", "ascending")])
+        return result.select(list(compiled.output_columns)).to_pandas()
+
+    def fetch_lazy(self, compiled: CompiledQuery) -> FetchedData:
+        """执行编译结果并按行数上限截断"""
+        return FetchedData.from_frame(self.fetch(compiled), ordered=True)
+
+
+def load_snapshot_backend(snapshot_dir: str = ARROW_SNAPSHOT_DIR) -> Optional[ArrowSnapshotBackend]:
+    """加载快照后端，依赖缺失或尚未构建时返回None"""
+    if pa is None:
+        print("未安装 pyarrow，数据获取使用 sqlite 后端")
+        return None
+    try:
+        return ArrowSnapshotBackend(snapshot_dir)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"加载 Arrow 快照失败，数据获取使用 sqlite 后端: {str(e)}")
+        return None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="构建财务数据的 Arrow IPC 快照")
+    parser.add_argument("command", choices=("build",))
+    parser.add_argument("--dir", default=ARROW_SNAPSHOT_DIR, help="输出目录")
+    args = parser.parse_args(argv)
+
+    if pa is None:
+        print("构建 Arrow 快照需要安装 pyarrow")
+        return 1
+    for table, rows in build_snapshot(args.dir).items():
+        print(f"{table}: {rows} 行")
+    print(f"已写入 {args.dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""数据获取代理复用基准测试
+
+比较每个任务的准备开销（不含LLM调用）：
+- 不复用：新建 DataFetcherAgent（创建 LiteLLMModel、读取prompt YAML），再新建 CodeAgent
+- 复用：get_data_fetcher() 取共享实例，从 AgentPool 租用 CodeAgent 并在归还时清空
+
+设置 --llm N 且配置了 DEEPSEEK_API_KEY 时，另外比较连续 N 次最小LLM请求
+（max_tokens=1）在 litellm 默认客户端和 configure_llm_keepalive 共享客户端下的耗时。
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_agent_pool [任务数，默认50] [--llm N]
+"""
+
+import argparse
+import statistics
+import time
+
+from agent.DataFetcherAgent import (
+    DatabaseTools, DataFetcherAgent, QueryResultSlot, get_data_fetcher
+)
+
+DEFAULT_TASKS = 50
+
+
+def time_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def setup_without_pool():
+    fetcher = DataFetcherAgent()
+    fetcher.datafetcher_create_agent(DatabaseTools.create_sql_query_tool(QueryResultSlot()))
+
+
+def setup_with_pool():
+    fetcher = get_data_fetcher()
+    with fetcher._code_agents.lease():
+        pass
+
+
+def llm_latency(repeat, keepalive):
+    import litellm
+    from agent.agent_pool import configure_llm_keepalive
+
+    litellm.client_session = None
+    if keepalive:
+        configure_llm_keepalive()
+    return time_ms(lambda: litellm.completion(
+        model="deepseek/deepseek-chat", api_key=DataFetcherAgent.DEEPSEEK_API_KEY,
+        messages=[{"role": "user", "content": "1"}], max_tokens=1,
+    ), repeat)
+
+
+def report(name, samples):
+    print(
+        f"{name:<16}{statistics.median(samples):>12.2f}{statistics.mean(samples):>12.2f}"
+        f"{max(samples):>12.2f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据获取代理复用基准测试")
+    parser.add_argument("tasks", nargs="?", type=int, default=DEFAULT_TASKS)
+    parser.add_argument("--llm", type=int, default=0, help="比较LLM连接保持时的请求次数")
+    args = parser.parse_args()
+
+    print(f"{'每个任务':<16}{'中位数(ms)':>12}{'平均(ms)':>12}{'最大(ms)':>12}")
+    report("不复用", time_ms(setup_without_pool, args.tasks))
+    # 第一次调用创建共享实例和CodeAgent，计入平均值
+    report("复用", time_ms(setup_with_pool, args.tasks))
+    print(f"CodeAgent 池: {get_data_fetcher()._code_agents.snapshot()}")
+
+    if args.llm:
+        if not DataFetcherAgent.DEEPSEEK_API_KEY:
+            print("未配置 DEEPSEEK_API_KEY，跳过LLM连接保持测试")
+        else:
+            print(f"\n{'LLM请求':<16}{'中位数(ms)':>12}{'平均(ms)':>12}{'最大(ms)':>12}")
+            report("默认客户端", llm_latency(args.llm, keepalive=False))
+            report("共享连接", llm_latency(args.llm, keepalive=True))
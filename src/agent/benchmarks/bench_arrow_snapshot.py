@@ -0,0 +1,126 @@
+"""Arrow 快照后端基准测试
+
+分别启动若干个worker进程，在 sqlite 后端和内存映射的 Arrow 快照后端上执行同一组
+编译查询，报告每个worker的常驻内存（RSS，拆分为进程私有的匿名内存和可共享的文件映射页）
+以及从进程开始取数到拿到第一个结果的时间。
+
+Arrow 快照的数据页属于文件映射（RssFile），在同一节点的所有worker之间只占一份页缓存；
+私有内存（RssAnon）只包含查询结果。SQL结果缓存在测试中关闭。
+
+运行前需要先构建快照：
+    python -m agent.arrow_snapshot build
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_arrow_snapshot [worker数，默认4]
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+DEFAULT_WORKERS = 4
+RSS_FIELDS = ("VmRSS", "RssAnon", "RssFile")
+
+
+def compiled_corpus():
+    """用数据库中实际存在的股票、行业和报告日构建编译查询"""
+    from agent.db_indexes import sample_values
+    from agent.financial_db import connect_readonly
+    from agent.sql_compiler import BASE_COLUMNS, CompiledQuery, render_sql
+
+    conn = connect_readonly()
+    try:
+        v = sample_values(conn)
+        indicators = {}
+        for table, count in (("income_table", 3), ("balance_table", 2)):
+            indicators[table] = tuple(
+                row[1] for row in conn.execute(f"PRAGMA table_info({table})")
+                if row[1] not in BASE_COLUMNS and (row[2] or "").upper() in ("REAL", "FLOAT", "DOUBLE")
+            )[:count]
+    finally:
+        conn.close()
+
+    date_range = (v["date_start"], v["date_end"])
+    specs = [
+        ({"income_table": indicators["income_table"]}, date_range, v["codes"][:1], {}),
+        (indicators, date_range, v["codes"], {}),
+        ({"income_table": indicators["income_table"]}, date_range, (), {"申万一级": (v["sw1"],)}),
+        (indicators, date_range, (), {"申万一级": (v["sw1"],), "申万二级": (v["sw2"],)}),
+        (indicators, (v["date_end"], v["date_end"]), (), {}),
+    ]
+    corpus = []
+    names_by_code = dict(zip(v["codes"], v["names"]))
+    for table_columns, dates, codes, industry_filters in specs:
+        compiled = CompiledQuery(
+            sql="", params=(), base_table=next(iter(table_columns)),
+            table_columns=table_columns, date_range=dates,
+            stock_names=tuple(names_by_code[c] for c in codes), industry_filters=industry_filters,
+            stock_codes=tuple(codes),
+        )
+        sql, params = render_sql(compiled)
+        corpus.append(compiled._replace(sql=sql, params=params))
+    return corpus
+
+
+def read_rss_kb():
+    """从 /proc/self/status 读取RSS（KB）"""
+    rss = {}
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in RSS_FIELDS:
+                rss[key] = int(value.split()[0])
+    return rss
+
+
+def run_worker(backend_name, results):
+    """在子进程中执行全部编译查询"""
+    started = time.perf_counter()
+    from agent.fetch_backend import SqliteFetchBackend
+    from agent.arrow_snapshot import ArrowSnapshotBackend
+
+    corpus = compiled_corpus()
+    backend = ArrowSnapshotBackend() if backend_name == "arrow" else SqliteFetchBackend()
+    rows = len(backend.fetch(corpus[0]))
+    first_row_ms = (time.perf_counter() - started) * 1000
+    for compiled in corpus[1:]:
+        rows += len(backend.fetch(compiled))
+    total_ms = (time.perf_counter() - started) * 1000
+    results.put({
+        "backend": backend_name,
+        "pid": os.getpid(),
+        "first_row_ms": first_row_ms,
+        "total_ms": total_ms,
+        "rows": rows,
+        **read_rss_kb(),
+    })
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_WORKERS
+    # 只比较两种取数方式本身，不让结果缓存影响内存和耗时
+    os.environ["SQL_CACHE_MAX_BYTES"] = "0"
+    context = multiprocessing.get_context("spawn")
+
+    print(
+        f"{'后端':<8}{'pid':>8}{'首个结果(ms)':>14}{'全部(ms)':>10}{'行数':>10}"
+        + "".join(f"{field + '(MB)':>14}" for field in RSS_FIELDS)
+    )
+    for backend_name in ("sqlite", "arrow"):
+        results = context.Queue()
+        processes = [
+            context.Process(target=run_worker, args=(backend_name, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        for report in sorted(reports, key=lambda r: r["pid"]):
+            print(
+                f"{report['backend']:<8}{report['pid']:>8}{report['first_row_ms']:>14.1f}"
+                f"{report['total_ms']:>10.1f}{report['rows']:>10}"
+                + "".join(f"{report.get(field, 0) / 1024:>14.1f}" for field in RSS_FIELDS)
+            )
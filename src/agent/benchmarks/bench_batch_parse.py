@@ -0,0 +1,106 @@
+"""批量异步解析基准测试
+
+启动一个本地的 OpenAI 兼容桩服务（每个请求固定延迟后返回QPA格式的响应），
+让 parse_queries 通过 litellm 的异步接口访问它，比较不同并发数下的吞吐量。
+吞吐量应随并发数近似线性增长，直到达到桩服务的线程数上限。
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_batch_parse [单次请求延迟(秒)，默认0.5] [查询数，默认32]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent.QueryParserAgent import QueryParserAgent, parse_queries
+
+STUB_RESPONSE = "\n".join([
+    "报告日区间: 20210101-20231231",
+    "筛选的股票名称: 贵州茅台",
+    "行业名称: ",
+    "需要从sql抽取的财务指标: 营业收入,归母净利润",
+])
+# 只由LLM解析（不会命中本地快速路径）的查询样本
+SAMPLE_QUERIES = [
+    "茅台这几年的营收和归母净利表现怎么样",
+    "帮我看下宁德时代最近的收入和利润",
+    "招行过去几年赚了多少钱",
+    "白酒龙头们的营收规模对比",
+]
+CONCURRENCY_LEVELS = (1, 2, 4, 8, 16)
+
+DEFAULT_LATENCY_SECONDS = 0.5
+DEFAULT_QUERY_COUNT = 32
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    """在后台线程启动 OpenAI 兼容的 chat completions 桩服务"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(latency)
+            body = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": STUB_RESPONSE},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150
+                },
+            }, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LATENCY_SECONDS
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_QUERY_COUNT
+    queries = [
+        SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] for i in range(query_count)
+    ]
+
+    server = start_stub_server(latency)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    parser = QueryParserAgent()
+    parser.model_name = "openai/stub-qpa"
+    parser.api_base = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    parser.FAST_PATH_ENABLED = False
+
+    print(f"桩服务延迟 {latency:.2f}s，查询数 {query_count}")
+    for concurrency in CONCURRENCY_LEVELS:
+        start = time.perf_counter()
+        results = asyncio.run(
+            parse_queries(queries, concurrency=concurrency, parser_agent=parser)
+        )
+        elapsed = time.perf_counter() - start
+        succeeded = sum(
+            1 for result in results
+            if result.get("解析结果", {}).get("需要从sql抽取的财务指标")
+        )
+        print(
+            f"并发 {concurrency:>2}: 耗时 {elapsed:6.2f}s，"
+            f"吞吐 {query_count / elapsed:6.2f} 条/秒，成功 {succeeded}/{query_count}"
+        )
+
+    server.shutdown()
@@ -0,0 +1,52 @@
+"""取数结果紧凑类型的内存基准测试
+
+从每张财务数据表读取最多 ROWS 行，分别统计以下三种情况下每10万行占用的内存
+（DataFrame.memory_usage(deep=True)）：
+- 原始：pd.read_sql_query 的结果（字符串列为object，数值列为float64）
+- 紧凑：frame_types.compact_frame 转换后
+- 紧凑+float32：比率列再转为float32（只影响 ratio_table）
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_compact_dtypes [行数，默认100000]
+"""
+
+import sys
+import time
+
+import pandas as pd
+
+from agent.financial_db import FINANCIAL_TABLES, connect_readonly
+from agent.frame_types import compact_frame
+
+DEFAULT_ROWS = 100000
+PER_ROWS = 100000
+
+
+def mb_per_rows(df: pd.DataFrame) -> float:
+    """每 PER_ROWS 行占用的内存（MB）"""
+    if not len(df):
+        return 0.0
+    return df.memory_usage(deep=True).sum() / len(df) * PER_ROWS / 1024 / 1024
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    conn = connect_readonly()
+    print(
+        f"{'表':<16}{'行数':>8}{'原始(MB/10万行)':>18}{'紧凑':>10}"
+        f"{'紧凑+float32':>14}{'转换耗时(ms)':>14}"
+    )
+    try:
+        for table in FINANCIAL_TABLES:
+            raw = pd.read_sql_query(f'SELECT * FROM "{table}" LIMIT ?', conn, params=(rows,))
+            start = time.perf_counter()
+            compact = compact_frame(raw.copy(), float32_ratios=False)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            compact32 = compact_frame(raw.copy(), float32_ratios=True)
+            print(
+                f"{table:<16}{len(raw):>8}{mb_per_rows(raw):>18.1f}"
+                f"{mb_per_rows(compact):>10.1f}{mb_per_rows(compact32):>14.1f}"
+                f"{elapsed_ms:>14.1f}"
+            )
+    finally:
+        conn.close()
@@ -0,0 +1,58 @@
+"""查询解析本地快速路径基准测试
+
+对一组代表性查询运行 QueryParserAgent 的本地解析，统计快速路径的触发比例、
+本地解析耗时，并按给定的LLM单次解析耗时估算节省的时间。
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_fast_path [LLM单次解析耗时(秒)，默认2.0]
+"""
+
+import statistics
+import sys
+import time
+
+from agent.QueryParserAgent import QueryParserAgent
+
+# 代表性查询样本
+SAMPLE_QUERIES = [
+    "20200331到20231231的营业收入和归母净利润",
+    "查询20230101-20231231各公司的货币资金和存货",
+    "20190101-20231231全部A股的经营现金流、毛利率数据",
+    "列出20221231-20231231的资产总计、负债合计",
+    "20180331至20231231的销售费用、管理费用和研发费用",
+    "列出贵州茅台2023年营业收入",
+    "宁德时代近三年的营业收入同比增速",
+    "2019-2023年机械设备行业的营业收入总和",
+    "近三年的营业收入、营业成本同比增速",
+    "2021Q1到2022Q4的经营现金流环比增长率",
+    "2021Q1到2022Q4招商银行的净利润环比增长率",
+    "白酒行业最新一期的毛利率排名",
+]
+
+DEFAULT_LLM_SECONDS = 2.0
+
+
+if __name__ == "__main__":
+    llm_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LLM_SECONDS
+    parser = QueryParserAgent()
+
+    hits = 0
+    local_timings = []
+    for query in SAMPLE_QUERIES:
+        start = time.perf_counter()
+        result = parser._parse_locally(query)
+        local_timings.append((time.perf_counter() - start) * 1000)
+        status = "本地" if result is not None else "LLM "
+        hits += result is not None
+        print(f"[{status}] {query}")
+        if result is not None:
+            print(f"        -> {result}")
+
+    total = len(SAMPLE_QUERIES)
+    print(f"\n快速路径触发: {hits}/{total} ({hits / total:.0%})")
+    print(f"本地解析平均耗时: {statistics.mean(local_timings):.3f} ms")
+    print(
+        f"按LLM单次解析 {llm_seconds:.1f}s 估算，"
+        f"共节省约 {hits * llm_seconds:.1f}s，"
+        f"平均每条查询节省 {hits * llm_seconds / total:.2f}s"
+    )
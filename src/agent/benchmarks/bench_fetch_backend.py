@@ -0,0 +1,81 @@
+"""数据获取后端基准测试
+
+在同一组代表性查询（与 db_indexes 校验查询计划时使用的相同，另加一条全市场多年、
+只取少数几列的查询）上比较 sqlite 后端和 duckdb（Parquet）后端的耗时，
+并检查两个后端返回的行数一致。不经过SQL结果缓存。
+
+运行前需要先导出 Parquet 数据集：
+    python -m agent.fetch_backend export
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_fetch_backend [重复次数，默认3]
+"""
+
+import statistics
+import sys
+import time
+
+from agent.db_indexes import PlanQuery, representative_queries
+from agent.fetch_backend import PARQUET_DIR, ParquetDuckDBBackend, SqliteFetchBackend
+from agent.financial_db import connect_readonly
+from agent.sql_compiler import quote_identifier
+
+DEFAULT_REPEAT = 3
+
+
+def build_corpus():
+    """代表性查询 + 全市场多年、只取一个指标列的查询"""
+    conn = connect_readonly()
+    try:
+        queries = representative_queries(conn)
+        numeric_column = next(
+            row[1] for row in conn.execute("PRAGMA table_info(income_table)")
+            if (row[2] or "").upper() in ("REAL", "FLOAT", "DOUBLE")
+        )
+        start, end = conn.execute(
+            'SELECT MIN("报告日"), MAX("报告日") FROM income_table'
+        ).fetchone()
+    finally:
+        conn.close()
+    queries.append(PlanQuery(
+        "全市场多年、少数几列",
+        f'SELECT "股票代码", "报告日", {quote_identifier(numeric_column)} '
+        f'FROM income_table WHERE "报告日" BETWEEN ? AND ?',
+        (start, end),
+    ))
+    return queries
+
+
+def time_backend(backend, query: PlanQuery, repeat: int):
+    """返回耗时中位数（毫秒）和结果行数"""
+    samples = []
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(backend.execute(query.sql, query.params))
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), rows
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REPEAT
+    sqlite_backend = SqliteFetchBackend()
+    duckdb_backend = ParquetDuckDBBackend(PARQUET_DIR)
+    print(f"Parquet 分区方式: {duckdb_backend.partition}")
+
+    print(f"\n{'查询':<24}{'sqlite(ms)':>12}{'duckdb(ms)':>12}{'加速':>8}{'行数':>10}")
+    mismatched = []
+    for query in build_corpus():
+        sqlite_ms, sqlite_rows = time_backend(sqlite_backend, query, repeat)
+        duckdb_ms, duckdb_rows = time_backend(duckdb_backend, query, repeat)
+        if sqlite_rows != duckdb_rows:
+            mismatched.append(query.name)
+        speedup = sqlite_ms / duckdb_ms if duckdb_ms else float("inf")
+        print(
+            f"{query.name:<24}{sqlite_ms:>12.2f}{duckdb_ms:>12.2f}"
+            f"{speedup:>7.1f}x{sqlite_rows:>10}"
+        )
+
+    if mismatched:
+        print(f"\n两个后端返回的行数不一致: {mismatched}")
+        sys.exit(1)
@@ -0,0 +1,129 @@
+"""按表并行抽取基准测试
+
+对涉及三张和四张表的编译查询，分别用一条多表 LEFT JOIN（render_sql）和按表并行抽取
+（parallel_fetch.fetch_tables_parallel）读取为DataFrame，输出耗时中位数，并检查结果一致。
+测试期间关闭SQL结果缓存，每次都实际执行查询。
+指标列按表结构摘要选取：优先使用下面列出的指标，表中没有时用该表的其他指标列补足，
+因此也可以在列较少的数据库（如测试数据库、benchmarks.synthetic_db 生成的数据库）上运行。
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_parallel_fetch [重复次数，默认5]
+"""
+
+import os
+
+os.environ["SQL_CACHE_MAX_BYTES"] = "0"
+
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+from agent.db_indexes import sample_values
+from agent.financial_db import connect_readonly, get_readonly_engine
+from agent.parallel_fetch import PARALLEL_FETCH_WORKERS, fetch_tables_parallel
+from agent.schema_digest import KEY_COLUMNS, SchemaDigest, get_schema_digest
+from agent.sql_compiler import CompiledQuery, render_sql
+
+DEFAULT_REPEAT = 5
+
+# (名称, 表名 -> 优先使用的指标列, 使用股票筛选, 使用行业筛选)
+MULTI_TABLE_SPECS = (
+    ("三张表、多只股票", {
+        "income_table": ("营业收入", "净利润"),
+        "balance_table": ("资产总计",),
+        "ratio_table": ("毛利率", "资产负债率"),
+    }, True, False),
+    ("三张表、申万一级行业", {
+        "income_table": ("归属于母公司所有者的净利润",),
+        "balance_table": ("存货",),
+        "cashflow_table": ("经营活动产生的现金流量净额",),
+    }, False, True),
+    ("四张表、多只股票", {
+        "income_table": ("营业收入",),
+        "balance_table": ("资产总计", "负债合计"),
+        "cashflow_table": ("经营活动产生的现金流量净额",),
+        "ratio_table": ("净资产收益率(ROE)",),
+    }, True, False),
+    ("四张表、申万一级行业", {
+        "income_table": ("营业收入", "营业成本"),
+        "balance_table": ("货币资金",),
+        "cashflow_table": ("收到的税费返还",),
+        "ratio_table": ("毛利率",),
+    }, False, True),
+)
+
+
+def pick_indicators(digest: SchemaDigest, preferred: dict) -> dict:
+    """按表结构摘要选取每张表的指标列，个数与 preferred 相同；缺少的表返回空字典"""
+    picked = {}
+    for table, columns in preferred.items():
+        info = digest.tables.get(table)
+        if info is None:
+            return {}
+        metrics = [
+            name for name, col_type in info["columns"]
+            if name not in KEY_COLUMNS and col_type.upper() in ("REAL", "FLOAT", "DOUBLE", "")
+        ]
+        chosen = [c for c in columns if c in metrics]
+        chosen += [c for c in metrics if c not in chosen][:len(columns) - len(chosen)]
+        if not chosen:
+            return {}
+        picked[table] = tuple(chosen)
+    return picked
+
+
+def median_ms(fetch, repeat):
+    samples = []
+    df = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = fetch()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), df
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REPEAT
+    conn = connect_readonly()
+    try:
+        v = sample_values(conn)
+    finally:
+        conn.close()
+
+    engine = get_readonly_engine()
+    digest = get_schema_digest()
+    date_range = (v["date_start"], v["date_end"])
+    print(f"线程数: {PARALLEL_FETCH_WORKERS}")
+    print(f"{'查询':<20}{'JOIN(ms)':>10}{'并行(ms)':>10}{'加速':>8}{'行数':>8}")
+    for name, preferred, by_stock, by_industry in MULTI_TABLE_SPECS:
+        table_columns = pick_indicators(digest, preferred)
+        if not table_columns:
+            print(f"{name:<20}数据库中缺少所需的表，跳过")
+            continue
+        compiled = CompiledQuery(
+            sql="", params=(), base_table=next(iter(table_columns)),
+            table_columns=table_columns, date_range=date_range,
+            stock_names=v["names"] if by_stock else (),
+            stock_codes=v["codes"] if by_stock else (),
+            industry_filters={"申万一级": (v["sw1"],)} if by_industry else {},
+        )
+        sql, params = render_sql(compiled)
+        compiled = compiled._replace(sql=sql, params=params)
+        join_ms, join_df = median_ms(
+            lambda: pd.read_sql_query(sql, engine, params=params), repeat
+        )
+        parallel_ms, parallel_df = median_ms(lambda: fetch_tables_parallel(compiled), repeat)
+        try:
+            pd.testing.assert_frame_equal(
+                join_df.reset_index(drop=True), parallel_df.reset_index(drop=True)
+            )
+        except AssertionError as e:
+            print(f"[结果不一致] {name}: {e}")
+            sys.exit(1)
+        speedup = join_ms / parallel_ms if parallel_ms else float("inf")
+        print(
+            f"{name:<20}{join_ms:>10.2f}{parallel_ms:>10.2f}"
+            f"{speedup:>7.1f}x{len(join_df):>8}"
+        )
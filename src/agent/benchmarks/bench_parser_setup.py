@@ -0,0 +1,64 @@
+"""查询解析代理初始化耗时基准测试
+
+对比每个任务的解析器准备耗时：
+- 改造前：每次实例化都从磁盘读取并解析 db_columns_explained.json、
+  db_columns_names.json 与 QPA prompt YAML（等价于 build_term_index）
+- 改造后：引用进程内共享的术语索引（get_term_index，仅做mtime检查）
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_parser_setup
+"""
+
+import statistics
+import time
+
+from agent.term_index import build_term_index, get_term_index
+
+ITERATIONS = 200
+
+
+def _time_calls(fn, iterations: int) -> list:
+    """多次调用函数并返回每次的耗时（毫秒）"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list) -> None:
+    """打印耗时统计"""
+    print(
+        f"{label:<28} 平均 {statistics.mean(timings):8.3f} ms  "
+        f"中位数 {statistics.median(timings):8.3f} ms  "
+        f"最大 {max(timings):8.3f} ms"
+    )
+
+
+def _parser_setup_with_shared_index() -> None:
+    """模拟改造后 QueryParserAgent 的实例化（需要安装litellm）"""
+    from agent.QueryParserAgent import QueryParserAgent
+    QueryParserAgent()
+
+
+if __name__ == "__main__":
+    print(f"每项测试 {ITERATIONS} 次\n")
+
+    cold = _time_calls(build_term_index, ITERATIONS)
+    _report("改造前: 每任务重新加载", cold)
+
+    get_term_index()  # 预热，对应worker进程启动时的首次构建
+    warm = _time_calls(get_term_index, ITERATIONS)
+    _report("改造后: 共享索引", warm)
+
+    try:
+        parser_timings = _time_calls(_parser_setup_with_shared_index, ITERATIONS)
+        _report("改造后: QueryParserAgent()", parser_timings)
+    except ImportError as e:
+        print(f"跳过 QueryParserAgent 实例化测试: {e}")
+
+    print(
+        f"\n每任务节省约 "
+        f"{statistics.mean(cold) - statistics.mean(warm):.3f} ms"
+    )
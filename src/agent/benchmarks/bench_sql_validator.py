@@ -0,0 +1,183 @@
+"""SQL预校验基准测试
+
+离线部分：用 render_sql 生成跨表查询（编译SQL写法）和不带表别名的单表查询
+（CodeAgent写法），再按 CodeAgent 常见的错误改写列名或表名：
+- 别名：把列名换成 db_columns_explained.json 中映射到它的别名
+- 错表：把另一张表的列写到主表别名上
+- 笔误：去掉列名的最后一个字
+- 表名：写错表名
+对每条SQL统计预校验是否拦截（或只在结果后提示）、SQLite是否报错（不带表别名的错误列名会被SQLite当作
+字符串常量，不报错但结果错误），以及预校验与SQLite执行的耗时。每个被拦截的错误
+省去一次SQLite往返，SQLite静默返回错误结果的情况还省去一次完整的重试。
+
+日志部分（可选）：对比启用预校验前后两个日志目录（query_log）中 CodeAgent
+的平均步数、耗时和重试次数。
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_sql_validator [--before 旧日志目录 --after 新日志目录]
+"""
+
+import argparse
+import sqlite3
+import statistics
+import sys
+import time
+
+from agent.db_indexes import sample_values
+from agent.financial_db import connect_readonly
+from agent.query_log import log_files, read_records, summarize
+from agent.sql_compiler import CompiledQuery, quote_identifier, render_sql
+from agent.sql_validator import SqlValidator, load_table_columns
+from agent.term_index import get_term_index
+
+# (表名 -> 指标列)，第一张表为主表
+SPECS = (
+    {"income_table": ("营业收入", "营业成本"), "ratio_table": ("毛利率",)},
+    {"income_table": ("归属于母公司的净利润",), "balance_table": ("资产总计", "货币资金")},
+    {"balance_table": ("存货",), "cashflow_table": ("经营活动产生的现金流量净额",)},
+)
+
+
+def mutations(sql, table_columns, tables, aliases_by_column):
+    """按常见错误改写SQL，返回 [(错误类型, SQL)]"""
+    result = []
+    base_table = next(iter(table_columns))
+    for table, columns in table_columns.items():
+        for column in columns:
+            quoted = quote_identifier(column)
+            for alias in aliases_by_column.get(column, ())[:1]:
+                result.append(("别名", sql.replace(quoted, quote_identifier(alias))))
+            if len(column) > 2 and column[:-1] not in tables[table]:
+                result.append(("笔误", sql.replace(quoted, quote_identifier(column[:-1]))))
+            if table != base_table and column not in tables[base_table]:
+                result.append(("错表", sql.replace(f"t1.{quoted}", f"t0.{quoted}")))
+    result.append(("表名", sql.replace(quote_identifier(base_table), quote_identifier(base_table[:-1] + "s"), 1)))
+    return result
+
+
+def run_sqlite(conn, sql, params):
+    """执行SQL，返回 (耗时ms, 是否报错)"""
+    start = time.perf_counter()
+    try:
+        conn.execute(sql, params).fetchmany(100)
+        failed = False
+    except sqlite3.Error:
+        failed = True
+    return (time.perf_counter() - start) * 1000, failed
+
+
+def offline_benchmark(conn):
+    tables = load_table_columns(conn)
+    validator = SqlValidator(tables, dict(get_term_index().aliases))
+    aliases_by_column = {}
+    for alias, standard in get_term_index().aliases.items():
+        if alias != standard and not any(alias in columns for columns in tables.values()):
+            aliases_by_column.setdefault(standard, []).append(alias)
+
+    v = sample_values(conn)
+    candidates = []  # (错误类型, SQL, 参数)
+    for table_columns in SPECS:
+        table_columns = {
+            table: tuple(c for c in columns if c in tables.get(table, ()))
+            for table, columns in table_columns.items()
+        }
+        if not all(table_columns.values()):
+            continue
+        compiled = CompiledQuery(
+            sql="", params=(), base_table=next(iter(table_columns)), table_columns=table_columns,
+            date_range=(v["date_start"], v["date_end"]), stock_names=v["names"], industry_filters={},
+            stock_codes=v["codes"],
+        )
+        sql, params = render_sql(compiled)
+        candidates.append(("正确", sql, params))
+        candidates += [(kind, s, params) for kind, s in mutations(sql, table_columns, tables, aliases_by_column)]
+        # CodeAgent 写法：不带表别名
+        for table, columns in table_columns.items():
+            select = ", ".join(quote_identifier(c) for c in ("股票代码", "报告日") + columns)
+            agent_sql = f"SELECT {select} FROM {quote_identifier(table)} WHERE \"股票名称\" = ?"
+            agent_params = (v["names"][0],)
+            candidates.append(("正确(无别名)", agent_sql, agent_params))
+            candidates += [
+                (kind + "(无别名)", s, agent_params)
+                for kind, s in mutations(agent_sql, {table: columns}, tables, aliases_by_column)
+            ]
+
+    stats = {}
+    validate_ms, sqlite_ms = [], []
+    for kind, sql, params in candidates:
+        start = time.perf_counter()
+        issues = validator.validate(sql)
+        validate_ms.append((time.perf_counter() - start) * 1000)
+        elapsed, failed = run_sqlite(conn, sql, params)
+        sqlite_ms.append(elapsed)
+        entry = stats.setdefault(
+            kind, {"count": 0, "caught": 0, "warned": 0, "sqlite_error": 0}
+        )
+        blocked = any(issue.blocking for issue in issues)
+        entry["count"] += 1
+        entry["caught"] += blocked
+        entry["warned"] += bool(issues) and not blocked
+        entry["sqlite_error"] += failed
+
+    print(f"{'SQL类型':<14}{'条数':>6}{'预校验拦截':>12}{'执行并提示':>12}{'SQLite报错':>12}")
+    for kind, entry in stats.items():
+        print(
+            f"{kind:<14}{entry['count']:>6}{entry['caught']:>12}"
+            f"{entry['warned']:>12}{entry['sqlite_error']:>12}"
+        )
+    print(
+        f"预校验耗时中位数 {statistics.median(validate_ms):.3f}ms，"
+        f"SQLite执行耗时中位数 {statistics.median(sqlite_ms):.3f}ms"
+    )
+    wrong = sum(e["count"] for k, e in stats.items() if not k.startswith("正确"))
+    caught = sum(e["caught"] for k, e in stats.items() if not k.startswith("正确"))
+    silent = sum(
+        e["count"] - e["sqlite_error"] for k, e in stats.items() if not k.startswith("正确")
+    )
+    warned = sum(e["warned"] for k, e in stats.items() if not k.startswith("正确"))
+    false_alarms = sum(
+        e["caught"] + e["warned"] for k, e in stats.items() if k.startswith("正确")
+    )
+    print(
+        f"错误SQL {wrong} 条，预校验拦截 {caught} 条、执行并提示 {warned} 条，"
+        f"其中SQLite不报错 {silent} 条；正确SQL误报 {false_alarms} 条"
+    )
+
+
+def compare_logs(before_dir, after_dir):
+    rows = []
+    for label, log_dir in (("启用前", before_dir), ("启用后", after_dir)):
+        files = log_files(log_dir)
+        if not files:
+            print(f"{log_dir} 中没有数据获取日志")
+            return
+        summary = summarize(read_records(files))
+        agent = summary.get("agent", {})
+        retries = summary["retries"]
+        attempts = sum((retry + 1) * count for retry, count in retries.items())
+        fetches = sum(retries.values())
+        rows.append((
+            label, agent.get("queries", 0), agent.get("mean_steps", 0.0),
+            agent.get("p50_ms", 0.0), agent.get("p95_ms", 0.0),
+            attempts / fetches if fetches else 0.0, summary["final_failures"],
+        ))
+    print(f"{'':<8}{'成功':>6}{'平均步数':>10}{'P50(ms)':>10}{'P95(ms)':>10}{'平均尝试次数':>14}{'最终失败':>10}")
+    for label, queries, steps, p50, p95, attempts, failures in rows:
+        print(f"{label:<8}{queries:>6}{steps:>10.2f}{p50:>10.1f}{p95:>10.1f}{attempts:>14.2f}{failures:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQL预校验基准测试")
+    parser.add_argument("--before", help="启用预校验前的日志目录")
+    parser.add_argument("--after", help="启用预校验后的日志目录")
+    args = parser.parse_args()
+
+    conn = connect_readonly()
+    try:
+        offline_benchmark(conn)
+    finally:
+        conn.close()
+    if args.before and args.after:
+        print()
+        compare_logs(args.before, args.after)
+    sys.exit(0)
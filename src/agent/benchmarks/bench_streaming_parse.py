@@ -0,0 +1,85 @@
+"""查询解析流式交接基准测试
+
+用一个按固定速度逐字输出的模拟LLM代替 litellm.completion，比较：
+- 非流式：等待完整响应后再解析，下游在解析结束后才能开始准备数据获取
+- 流式：逐行解析，股票名称和财务指标一到达就交给下游（early_callback）
+
+输出两种方式下游可以开始工作的时间，即 time-to-first-data 的差值。
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_streaming_parse [每秒输出字数，默认30]
+"""
+
+import sys
+import time
+from types import SimpleNamespace
+
+import agent.QueryParserAgent as qpa_module
+from agent.QueryParserAgent import QueryParserAgent
+
+# 模拟的QPA响应：指标之后还有较长的计算说明，慢速模型输出这部分需要不少时间
+SAMPLE_RESPONSE = "\n".join([
+    "报告日区间: 20210101-20231231",
+    "筛选的股票名称: 贵州茅台,五粮液",
+    "行业名称: ",
+    "需要从sql抽取的财务指标: 营业收入,归母净利润,经营活动产生的现金流量净额",
+    "需要计算的指标: 营业收入同比增速,归母净利润同比增速,净利润现金含量",
+    "计算步骤: 1. 按股票和报告日排序 2. 计算每年营业收入和归母净利润相对上一年的"
+    "增速 3. 用经营活动产生的现金流量净额除以归母净利润得到净利润现金含量",
+])
+SAMPLE_QUERY = "对比茅台和五粮液近三年的营收、归母净利增速以及净利润现金含量"
+
+DEFAULT_CHARS_PER_SECOND = 30.0
+
+
+def make_simulated_completion(chars_per_second: float):
+    """构造按固定速度输出的模拟 completion 函数"""
+    delay = 1.0 / chars_per_second
+
+    def simulated_completion(*args, stream=False, **kwargs):
+        if not stream:
+            time.sleep(len(SAMPLE_RESPONSE) * delay)
+            message = SimpleNamespace(content=SAMPLE_RESPONSE)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        def chunks():
+            for char in SAMPLE_RESPONSE:
+                time.sleep(delay)
+                delta = SimpleNamespace(content=char)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+        return chunks()
+
+    return simulated_completion
+
+
+def measure(parser: QueryParserAgent, streaming: bool) -> tuple:
+    """返回 (下游可以开始工作的时间, 解析完成的时间)，单位秒"""
+    parser.STREAMING_ENABLED = streaming
+    handoff = {}
+    start = time.perf_counter()
+    parser.parse_query(
+        SAMPLE_QUERY,
+        early_callback=lambda info: handoff.setdefault(
+            "at", time.perf_counter() - start
+        ),
+    )
+    total = time.perf_counter() - start
+    # 非流式时回调在完整响应解析后才触发
+    return handoff.get("at", total), total
+
+
+if __name__ == "__main__":
+    chars_per_second = (
+        float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CHARS_PER_SECOND
+    )
+    qpa_module.completion = make_simulated_completion(chars_per_second)
+    parser = QueryParserAgent()
+    parser.FAST_PATH_ENABLED = False
+
+    blocking_handoff, blocking_total = measure(parser, streaming=False)
+    streaming_handoff, streaming_total = measure(parser, streaming=True)
+
+    print(f"模拟输出速度: {chars_per_second:.0f} 字/秒，响应 {len(SAMPLE_RESPONSE)} 字")
+    print(f"非流式: 下游开始 {blocking_handoff:.2f}s，解析完成 {blocking_total:.2f}s")
+    print(f"流式:   下游开始 {streaming_handoff:.2f}s，解析完成 {streaming_total:.2f}s")
+    print(f"time-to-first-data 提前 {blocking_handoff - streaming_handoff:.2f}s")
@@ -0,0 +1,93 @@
+"""宽表基准测试
+
+对一组跨表的编译查询，分别在多表 LEFT JOIN（render_sql）和宽表（WideTables.rewrite）
+上执行，输出两种写法的耗时中位数，并检查结果完全一致。
+
+运行前需要先构建宽表：
+    python -m agent.wide_table build
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.bench_wide_table [重复次数，默认5]
+"""
+
+import statistics
+import sys
+import time
+
+from agent.db_indexes import sample_values
+from agent.financial_db import connect_readonly
+from agent.sql_compiler import CompiledQuery, render_sql
+from agent.wide_table import get_wide_tables
+
+DEFAULT_REPEAT = 5
+
+# (名称, 表名 -> 指标列, 使用股票筛选, 使用行业筛选)
+CROSS_TABLE_SPECS = (
+    ("两张表、单只股票", {
+        "income_table": ("营业收入", "净利润"),
+        "balance_table": ("货币资金",),
+    }, True, False),
+    ("四张表、多只股票", {
+        "income_table": ("营业收入",),
+        "balance_table": ("资产总计", "负债合计"),
+        "cashflow_table": ("经营活动产生的现金流量净额",),
+        "ratio_table": ("毛利率",),
+    }, True, False),
+    ("三张表、申万一级行业", {
+        "income_table": ("归属于母公司所有者的净利润",),
+        "balance_table": ("存货",),
+        "ratio_table": ("净资产收益率(ROE)", "资产负债率"),
+    }, False, True),
+    ("非常用指标、全市场", {
+        "income_table": ("其他业务收入",),
+        "cashflow_table": ("收到的税费返还",),
+    }, False, False),
+)
+
+
+def median_ms(conn, sql, params, repeat):
+    samples = []
+    rows = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), rows
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REPEAT
+    wide_tables = get_wide_tables()
+    if wide_tables is None or not wide_tables.is_current():
+        print("宽表尚未构建或已过期，请先运行 python -m agent.wide_table build")
+        sys.exit(1)
+
+    conn = connect_readonly()
+    try:
+        v = sample_values(conn)
+        date_range = (v["date_start"], v["date_end"])
+        print(f"{'查询':<20}{'宽表':<22}{'JOIN(ms)':>10}{'宽表(ms)':>10}{'加速':>8}{'行数':>8}")
+        for name, table_columns, by_stock, by_industry in CROSS_TABLE_SPECS:
+            compiled = CompiledQuery(
+                sql="", params=(), base_table=next(iter(table_columns)),
+                table_columns=table_columns,
+                date_range=date_range if by_stock or by_industry else (v["date_end"], v["date_end"]),
+                stock_names=(v["names"][:1] if len(table_columns) == 2 else v["names"]) if by_stock else (),
+                stock_codes=(v["codes"][:1] if len(table_columns) == 2 else v["codes"]) if by_stock else (),
+                industry_filters={"申万一级": (v["sw1"],)} if by_industry else {},
+            )
+            sql, params = render_sql(compiled)
+            wide = wide_tables.rewrite(compiled._replace(sql=sql, params=params))
+            target = wide_tables.table_for(compiled)
+            join_ms, join_rows = median_ms(conn, sql, params, repeat)
+            wide_ms, wide_rows = median_ms(conn, wide.sql, wide.params, repeat)
+            if join_rows != wide_rows:
+                print(f"[结果不一致] {name}")
+                sys.exit(1)
+            speedup = join_ms / wide_ms if wide_ms else float("inf")
+            print(
+                f"{name:<20}{target[0] if target else '-':<22}{join_ms:>10.2f}"
+                f"{wide_ms:>10.2f}{speedup:>7.1f}x{len(join_rows):>8}"
+            )
+    finally:
+        conn.close()
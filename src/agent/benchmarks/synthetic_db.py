@@ -0,0 +1,114 @@
+"""生成基准测试用的合成财务数据库
+
+四张财务数据表的列与 db_columns_names.json 一致（真实数据库的全部列），取值为随机数：
+- 股票代码为六位字符串，股票名称、申万一级/二级行业、上市日期等为文本
+- 报告日为每年四个季度末（YYYYMMDD 文本）
+- 指标列为保留两位小数的浮点数，每家公司约有 NULL_FRACTION 的指标列整列为空
+  （对应银行、保险等行业没有的科目）
+
+生成后可以运行 python -m agent.db_indexes build --db 输出路径 建索引，再把
+FINANCIAL_DB_PATH 指向该文件运行 benchmarks 中的各项基准测试。
+
+运行方式（在 src 目录下）：
+    python -m agent.benchmarks.synthetic_db 输出路径 [--stocks 2000] [--start-year 2010] [--end-year 2023]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from agent.financial_db import FINANCIAL_TABLES
+from agent.sql_compiler import quote_identifier
+
+COLUMNS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "db_columns_names.json")
+TEXT_COLUMNS = ("股票代码", "股票名称", "上市日期", "申万一级", "申万二级", "上市板", "上市地点", "报告日")
+# (申万一级, 申万二级)
+INDUSTRIES = (
+    ("银行", "股份制银行"), ("银行", "城商行"), ("非银金融", "证券Ⅱ"), ("非银金融", "保险Ⅱ"),
+    ("食品饮料", "白酒Ⅱ"), ("食品饮料", "饮料乳品"), ("医药生物", "化学制药"), ("医药生物", "医疗器械"),
+    ("电子", "半导体"), ("电子", "消费电子"), ("计算机", "软件开发"), ("计算机", "IT服务Ⅱ"),
+    ("电力设备", "电池"), ("电力设备", "光伏设备"), ("汽车", "乘用车"), ("汽车", "汽车零部件"),
+    ("机械设备", "通用设备"), ("机械设备", "专用设备"), ("基础化工", "化学制品"), ("有色金属", "工业金属"),
+    ("房地产", "房地产开发"), ("建筑装饰", "基础建设"), ("交通运输", "物流"), ("公用事业", "电力"),
+    ("传媒", "游戏Ⅱ"), ("家用电器", "白色家电"), ("农林牧渔", "养殖业"), ("钢铁", "普钢"),
+    ("煤炭", "煤炭开采"), ("国防军工", "航空装备Ⅱ"), ("通信", "通信设备"),
+)
+NULL_FRACTION = 0.2
+DEFAULT_STOCKS = 2000
+
+
+def load_table_columns(path: str = COLUMNS_PATH):
+    """表名 -> 列名列表"""
+    with open(path, "r", encoding="utf-8") as f:
+        columns = json.load(f)
+    return {table: columns[table]["columns"] for table in FINANCIAL_TABLES}
+
+
+def build(path: str, stocks: int, start_year: int, end_year: int, seed: int = 0) -> None:
+    """在 path 生成合成数据库，已存在的文件会被覆盖"""
+    rng = np.random.default_rng(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    codes = [f"{code:06d}" for code in rng.choice(np.arange(1, 700000), stocks, replace=False)]
+    industries = [INDUSTRIES[i] for i in rng.integers(0, len(INDUSTRIES), stocks)]
+    dates = [
+        f"{year}{month_day}"
+        for year in range(start_year, end_year + 1)
+        for month_day in ("0331", "0630", "0930", "1231")
+    ]
+
+    conn = sqlite3.connect(path)
+    try:
+        for table, columns in load_table_columns().items():
+            start = time.perf_counter()
+            metrics = [c for c in columns if c not in TEXT_COLUMNS]
+            definitions = ", ".join(
+                f"{quote_identifier(c)} {'TEXT' if c in TEXT_COLUMNS else 'REAL'}" for c in columns
+            )
+            conn.execute(f"CREATE TABLE {quote_identifier(table)} ({definitions})")
+            placeholders = ", ".join("?" for _ in columns)
+            insert = f"INSERT INTO {quote_identifier(table)} VALUES ({placeholders})"
+            scale = 1.0 if table == "ratio_table" else 1e8
+            for index, code in enumerate(codes):
+                sw1, sw2 = industries[index]
+                text = {
+                    "股票代码": code, "股票名称": f"公司{code}", "上市日期": "20080101",
+                    "申万一级": sw1, "申万二级": sw2, "上市板": "主板",
+                    "上市地点": "上海" if code.startswith("6") else "深圳",
+                }
+                values = np.round(rng.lognormal(0, 1.5, (len(dates), len(metrics))) * scale, 2)
+                empty = rng.random(len(metrics)) < NULL_FRACTION
+                rows = []
+                for date_index, report_date in enumerate(dates):
+                    text["报告日"] = report_date
+                    numbers = iter(
+                        None if empty[i] else float(v) for i, v in enumerate(values[date_index])
+                    )
+                    rows.append(tuple(
+                        text[c] if c in TEXT_COLUMNS else next(numbers) for c in columns
+                    ))
+                conn.executemany(insert, rows)
+            conn.commit()
+            print(
+                f"{table}: {len(codes) * len(dates)} 行, {len(columns)} 列, "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成基准测试用的合成财务数据库")
+    parser.add_argument("path", help="输出的数据库文件路径")
+    parser.add_argument("--stocks", type=int, default=DEFAULT_STOCKS)
+    parser.add_argument("--start-year", type=int, default=2010)
+    parser.add_argument("--end-year", type=int, default=2023)
+    args = parser.parse_args()
+    build(args.path, args.stocks, args.start_year, args.end_year)
+    sys.exit(0)
@@ -0,0 +1,240 @@
+"""报告日区间规则抽取模块
+
+不依赖LLM，按规则从用户查询中解析 QPA prompt 中列出的各种日期写法，
+统一转换为 "YYYYMMDD-YYYYMMDD" 格式的报告日区间：
+- 20200331到20231231、20200331-20231231、20231231
+- 2019-2023年、2019年到2023年、2023年、2023年年报、2019-2023年年报
+- 2021Q1到2022Q4、2021年Q3、2021年一季度
+- 2020年以来、2018年到现在、2021Q1至今（到最新一期）
+- 近三年、最近5年、近4个季度
+- 最新一期、最近一期
+
+当查询包含同比/环比等计算需求时，区间起点会向前扩展一个周期，
+保证计算第一期增速所需的上一期数据也能被抽取。
+
+抽取结果的 complete 表示匹配到的片段覆盖了查询中全部的日期描述；
+片段后面还跟着规则不认识的日期限定（如"2020年开始"）或查询中还有其他年份时为False，
+调用方不应直接使用这样的区间。
+"""
+
+import re
+from datetime import date
+from typing import List, NamedTuple, Optional, Tuple
+
+# 同比类关键词：起点向前扩展一年
+YOY_KEYWORDS = ("同比", "增速", "增长率", "增幅")
+# 环比关键词：起点向前扩展一个季度
+QOQ_KEYWORDS = ("环比",)
+GROWTH_KEYWORDS = YOY_KEYWORDS + QOQ_KEYWORDS
+
+# 季度末日期
+QUARTER_ENDS = ("0331", "0630", "0930", "1231")
+
+_CHINESE_NUMBERS = {
+    "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5,
+    "六": 6, "七": 7, "八": 8, "九": 9, "十": 10,
+}
+
+_NUMBER = r"(\d{1,2}|[一二两三四五六七八九十])"
+_RANGE_SEP = r"\s*(?:-|—|~|到|至)\s*"
+_QUARTER = r"(?:[Qq]([1-4])|(?:第)?([1-4一二三四])季度?)"
+
+_DATE_RANGE = re.compile(rf"(\d{{8}}){_RANGE_SEP}(\d{{8}})")
+_SINGLE_DATE = re.compile(r"(?<!\d)(\d{8})(?!\d)")
+_QUARTER_RANGE = re.compile(
+    rf"(\d{{4}})年?{_QUARTER}{_RANGE_SEP}(\d{{4}})年?{_QUARTER}"
+)
+_SINGLE_QUARTER = re.compile(rf"(?<!\d)(\d{{4}})年?{_QUARTER}")
+_ANNUAL_REPORT = re.compile(r"(?<!\d)(\d{4})年?(?:度)?(?:的)?年报")
+_YEAR_RANGE = re.compile(
+    rf"(?<!\d)(\d{{4}})年?{_RANGE_SEP}(\d{{4}})年(?:度)?((?:的)?年报)?"
+)
+_SINGLE_YEAR = re.compile(r"(?<!\d)(\d{4})年(?:度)?")
+_RECENT_YEARS = re.compile(rf"(?:最近|近|过去)(?:的)?{_NUMBER}年")
+_RECENT_QUARTERS = re.compile(rf"(?:最近|近|过去)(?:的)?{_NUMBER}个?季度")
+_LATEST_PERIOD = re.compile(r"最[新近]一期")
+# 紧跟在单个日期、季度或年份后面，表示区间一直延续到最新一期
+_OPEN_END = re.compile(r"\s*(?:以来|至今|迄今|(?:到|至)(?:现在|目前|今天|今))")
+# 日期片段后面规则无法解释的限定词
+_TRAILING_CONTEXT = re.compile(
+    r"\s*(?:的)?(?:以来|至今|迄今|到现在|到目前|到今|年报|年度报告|开始|起|以后|之后|以前|之前|前)"
+)
+_YEAR_MENTION = re.compile(r"(?<!\d)\d{4}(?!\d)")
+
+
+class DateRangeExtraction(NamedTuple):
+    """报告日区间抽取结果"""
+    date_range: str
+    spans: List[Tuple[int, int]]
+    extended: bool
+    # 片段覆盖了查询中全部的日期描述
+    complete: bool = True
+
+
+def _to_int(text: str) -> int:
+    """把阿拉伯数字或中文数字转换为整数"""
+    return int(text) if text.isdigit() else _CHINESE_NUMBERS[text]
+
+
+def _quarter_end(year: int, quarter: int) -> str:
+    """返回某年某季度的季度末日期"""
+    return f"{year}{QUARTER_ENDS[quarter - 1]}"
+
+
+def _shift_quarters(report_date: str, quarters: int) -> str:
+    """把季度末日期向前（负数）或向后移动若干个季度，非季度末日期按月份折算"""
+    year, month = int(report_date[:4]), int(report_date[4:6])
+    index = year * 4 + (month - 1) // 3 + quarters
+    return _quarter_end(index // 4, index % 4 + 1)
+
+
+def latest_report_date(reference: Optional[date] = None) -> str:
+    """按定期报告披露截止日推算最新一期可用的报告日
+
+    一季报、年报于4月底前披露，半年报于8月底前披露，三季报于10月底前披露。
+
+    Args:
+        reference: 参考日期，默认为今天
+
+    Returns:
+        str: YYYYMMDD 格式的报告日
+    """
+    reference = reference or date.today()
+    month_day = (reference.month, reference.day)
+    if month_day > (10, 31):
+        return f"{reference.year}0930"
+    if month_day > (8, 31):
+        return f"{reference.year}0630"
+    if month_day > (4, 30):
+        return f"{reference.year}0331"
+    return f"{reference.year - 1}0930"
+
+
+def latest_annual_report_date(reference: Optional[date] = None) -> str:
+    """最新一期已披露年报的报告日（年报于次年4月底前披露）"""
+    reference = reference or date.today()
+    if (reference.month, reference.day) > (4, 30):
+        return f"{reference.year - 1}1231"
+    return f"{reference.year - 2}1231"
+
+
+def _parse_quarter(groups: Tuple[Optional[str], Optional[str]]) -> int:
+    """从 Q1 或 一季度 两种写法的分组中取出季度数"""
+    q_digit, q_text = groups
+    return int(q_digit) if q_digit else _to_int(q_text)
+
+
+def _open_ended(
+    query: str, match: "re.Match", start: str, end: str, latest: str
+) -> Tuple[str, str, Tuple[int, int]]:
+    """单个日期后面跟着"以来"、"至今"等时，区间延续到最新一期"""
+    open_end = _OPEN_END.match(query, match.end())
+    if open_end:
+        return start, max(latest, start), (match.start(), open_end.end())
+    return start, end, match.span()
+
+
+def _match_base_range(
+    query: str, reference: Optional[date], latest_date: Optional[str]
+) -> Optional[Tuple[str, str, Tuple[int, int]]]:
+    """按优先级依次尝试各种日期写法，返回 (起始日, 结束日, 位置)"""
+    latest = latest_date or latest_report_date(reference)
+
+    match = _DATE_RANGE.search(query)
+    if match:
+        return match.group(1), match.group(2), match.span()
+
+    match = _QUARTER_RANGE.search(query)
+    if match:
+        start_year, end_year = int(match.group(1)), int(match.group(4))
+        start = _quarter_end(start_year, _parse_quarter(match.group(2, 3)))
+        end = _quarter_end(end_year, _parse_quarter(match.group(5, 6)))
+        return start, end, match.span()
+
+    match = _SINGLE_DATE.search(query)
+    if match:
+        return _open_ended(query, match, match.group(1), match.group(1), latest)
+
+    match = _SINGLE_QUARTER.search(query)
+    if match:
+        report_date = _quarter_end(
+            int(match.group(1)), _parse_quarter(match.group(2, 3))
+        )
+        return _open_ended(query, match, report_date, report_date, latest)
+
+    # 年份区间先于单年的年报，"2019-2023年年报" 取五年的年报
+    match = _YEAR_RANGE.search(query)
+    if match:
+        if match.group(3):
+            return f"{match.group(1)}1231", f"{match.group(2)}1231", match.span()
+        return f"{match.group(1)}0101", f"{match.group(2)}1231", match.span()
+
+    match = _ANNUAL_REPORT.search(query)
+    if match:
+        report_date = f"{match.group(1)}1231"
+        return report_date, report_date, match.span()
+
+    match = _SINGLE_YEAR.search(query)
+    if match:
+        return _open_ended(
+            query, match, f"{match.group(1)}0101", f"{match.group(1)}1231", latest
+        )
+
+    match = _RECENT_YEARS.search(query)
+    if match:
+        end = latest_annual_report_date(reference)
+        start_year = int(end[:4]) - _to_int(match.group(1)) + 1
+        return f"{start_year}0101", end, match.span()
+
+    match = _RECENT_QUARTERS.search(query)
+    if match:
+        start = _shift_quarters(latest, 1 - _to_int(match.group(1)))
+        return start, latest, match.span()
+
+    match = _LATEST_PERIOD.search(query)
+    if match:
+        return latest, latest, match.span()
+
+    return None
+
+
+def extract_date_range(
+    query: str,
+    reference: Optional[date] = None,
+    latest_date: Optional[str] = None,
+    apply_growth_extension: bool = True,
+) -> Optional[DateRangeExtraction]:
+    """从查询中抽取报告日区间
+
+    Args:
+        query: 用户查询或LLM返回的日期描述
+        reference: 计算"近三年"、"最新一期"等相对日期的参考日期，默认为今天
+        latest_date: 数据库中已知的最新报告日（YYYYMMDD），提供时优先使用
+        apply_growth_extension: 查询包含同比/环比需求时是否向前扩展一个周期
+
+    Returns:
+        Optional[DateRangeExtraction]: 区间、日期在查询中的位置、是否做了扩展、
+            片段是否覆盖了全部日期描述；无法识别时返回None。同比/环比等关键词
+            不计入位置，以便术语匹配器识别"营业收入增长率"这类包含关键词的指标
+    """
+    base = _match_base_range(query, reference, latest_date)
+    if base is None:
+        return None
+    start, end, span = base
+    if start > end:
+        start, end = end, start
+    spans = [span]
+    complete = not _TRAILING_CONTEXT.match(query, span[1]) and not (
+        _YEAR_MENTION.search(query[:span[0]]) or _YEAR_MENTION.search(query[span[1]:])
+    )
+
+    extended = False
+    if apply_growth_extension:
+        if any(keyword in query for keyword in YOY_KEYWORDS):
+            start = f"{int(start[:4]) - 1}{start[4:]}"
+            extended = True
+        elif any(keyword in query for keyword in QOQ_KEYWORDS):
+            start = _shift_quarters(start, -1)
+            extended = True
+
+    return DateRangeExtraction(f"{start}-{end}", spans, extended, complete)
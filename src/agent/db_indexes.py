@@ -0,0 +1,290 @@
+"""财务数据库索引构建与校验工具
+
+生成的查询几乎都按 股票代码/股票名称/申万行业 + 报告日 筛选，或按 (股票代码, 报告日)
+连接多张表。本工具为四张财务数据表幂等地创建以下复合索引并执行 ANALYZE：
+- (股票代码, 报告日)：单只股票查询（编译SQL按股票代码筛选）、多表 LEFT JOIN
+- (股票名称, 报告日)：CodeAgent 按股票名称筛选
+- (申万一级, 报告日)、(申万二级, 报告日)：行业范围查询
+- (报告日, 股票代码)：只按报告日区间筛选的全市场查询
+
+然后对一组代表性查询运行 EXPLAIN QUERY PLAN，只要有一条查询对数据表做全表扫描就失败。
+build 命令会在创建索引前后分别对单只股票、行业范围的查询计时并输出对比。
+索引在数据库文件的副本上创建，完成后整体替换原文件（见 financial_db.rebuild_copy），
+运行中以 immutable=1 打开数据库的 worker 不受影响；构建期间需要预留一份数据库大小的磁盘空间。
+
+运行方式（在 src 目录下）：
+    python -m agent.db_indexes build [--repeat N]   # 建索引、ANALYZE、计时并校验
+    python -m agent.db_indexes verify               # 只校验查询计划
+    python -m agent.db_indexes timings [--repeat N] # 只对代表性查询计时
+"""
+
+import argparse
+import re
+import sqlite3
+import statistics
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import FINANCIAL_DB_PATH, FINANCIAL_TABLES, rebuild_copy
+    from .sql_compiler import quote_identifier
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import FINANCIAL_DB_PATH, FINANCIAL_TABLES, rebuild_copy
+    from sql_compiler import quote_identifier
+
+# 每张表需要的索引：(索引名后缀, 列)
+INDEX_SPECS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("code_date", ("股票代码", "报告日")),
+    ("name_date", ("股票名称", "报告日")),
+    ("sw1_date", ("申万一级", "报告日")),
+    ("sw2_date", ("申万二级", "报告日")),
+    ("date_code", ("报告日", "股票代码")),
+)
+
+# EXPLAIN QUERY PLAN 中表示全表扫描的行（SCAN CONSTANT ROW 不是对数据表的扫描）
+_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)")
+
+DEFAULT_REPEAT = 3
+
+
+class PlanQuery(NamedTuple):
+    """一条代表性查询"""
+    name: str
+    sql: str
+    params: Tuple
+    # 计入创建索引前后的耗时对比
+    timed: bool = False
+
+
+def index_name(table: str, suffix: str) -> str:
+    """索引名称，如 idx_income_table_code_date"""
+    return f"idx_{table}_{suffix}"
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """表中实际存在的列名"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+
+
+def ensure_indexes(
+    conn: sqlite3.Connection, tables: Sequence[str] = FINANCIAL_TABLES
+) -> List[str]:
+    """幂等地创建索引并执行 ANALYZE
+
+    表中缺少索引列时跳过对应的索引（例如某张表没有 申万二级 列）。
+
+    Args:
+        conn: 可写的数据库连接；不要直接使用 worker 正在读取的数据库文件，
+            应当使用 rebuild_copy 提供的副本连接
+        tables: 需要建索引的表，默认为四张财务数据表
+
+    Returns:
+        List[str]: 本次新创建的索引名称
+    """
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    }
+    created = []
+    for table in tables:
+        columns = set(table_columns(conn, table))
+        for suffix, index_columns in INDEX_SPECS:
+            if not columns.issuperset(index_columns):
+                continue
+            name = index_name(table, suffix)
+            column_list = ", ".join(quote_identifier(c) for c in index_columns)
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} "
+                f"ON {quote_identifier(table)} ({column_list})"
+            )
+            if name not in existing:
+                created.append(name)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    return created
+
+
+def sample_values(conn: sqlite3.Connection) -> Dict[str, object]:
+    """从数据库中取代表性查询使用的股票、行业和报告日"""
+    dates = [
+        row[0] for row in conn.execute(
+            'SELECT DISTINCT "报告日" FROM income_table ORDER BY "报告日" DESC LIMIT 12'
+        )
+    ]
+    stocks = conn.execute(
+        'SELECT "股票代码", "股票名称" FROM income_table '
+        'WHERE "报告日" = ? LIMIT 3', (dates[0],)
+    ).fetchall()
+    industry = conn.execute(
+        'SELECT "申万一级", "申万二级" FROM income_table '
+        'WHERE "申万一级" IS NOT NULL AND "报告日" = ? LIMIT 1', (dates[0],)
+    ).fetchone()
+    return {
+        "date_start": dates[-1],
+        "date_end": dates[0],
+        "codes": tuple(code for code, _ in stocks),
+        "names": tuple(name for _, name in stocks),
+        "sw1": industry[0],
+        "sw2": industry[1],
+    }
+
+
+def representative_queries(conn: sqlite3.Connection) -> List[PlanQuery]:
+    """构建代表性查询，形式与 sql_compiler 和 CodeAgent 生成的SQL一致
+
+    Args:
+        conn: 数据库连接，用于选取实际存在的股票、行业和报告日
+
+    Returns:
+        List[PlanQuery]: 代表性查询列表
+    """
+    v = sample_values(conn)
+    start, end = v["date_start"], v["date_end"]
+    name, code = v["names"][0], v["codes"][0]
+    codes = v["codes"]
+    in_codes = ", ".join("?" for _ in codes)
+    base = 't0."股票代码", t0."股票名称", t0."报告日", t0."申万一级"'
+    join = (
+        'LEFT JOIN balance_table AS t1 '
+        'ON t1."股票代码" = t0."股票代码" AND t1."报告日" = t0."报告日"'
+    )
+    order = 'ORDER BY t0."股票代码", t0."报告日"'
+
+    return [
+        PlanQuery(
+            "单只股票（编译SQL）",
+            f'SELECT {base} FROM income_table AS t0 '
+            f'WHERE t0."报告日" BETWEEN ? AND ? AND t0."股票代码" IN (?) {order}',
+            (start, end, code), timed=True,
+        ),
+        PlanQuery(
+            "多只股票、两张表",
+            f'SELECT {base} FROM income_table AS t0 {join} '
+            f'WHERE t0."报告日" BETWEEN ? AND ? AND t0."股票代码" IN ({in_codes}) {order}',
+            (start, end) + codes,
+        ),
+        PlanQuery(
+            "单只股票（按代码，CodeAgent写法）",
+            'SELECT * FROM ratio_table WHERE "股票代码" = ? AND "报告日" >= ?',
+            (code, start),
+        ),
+        PlanQuery(
+            "单只股票（按名称，CodeAgent写法）",
+            'SELECT * FROM cashflow_table WHERE "股票名称" = ? ORDER BY "报告日"',
+            (name,), timed=True,
+        ),
+        PlanQuery(
+            "申万一级行业（编译SQL）",
+            f'SELECT {base} FROM income_table AS t0 '
+            f'WHERE t0."报告日" BETWEEN ? AND ? AND (t0."申万一级" IN (?)) {order}',
+            (start, end, v["sw1"]), timed=True,
+        ),
+        PlanQuery(
+            "申万一级或二级行业、两张表",
+            f'SELECT {base} FROM income_table AS t0 {join} '
+            f'WHERE t0."报告日" BETWEEN ? AND ? '
+            f'AND (t0."申万一级" IN (?) OR t0."申万二级" IN (?)) {order}',
+            (start, end, v["sw1"], v["sw2"]), timed=True,
+        ),
+        PlanQuery(
+            "全市场单期",
+            f'SELECT {base} FROM income_table AS t0 {join} '
+            f'WHERE t0."报告日" BETWEEN ? AND ? {order}',
+            (end, end),
+        ),
+    ]
+
+
+def full_scans(conn: sqlite3.Connection, query: PlanQuery) -> List[str]:
+    """返回查询计划中的全表扫描步骤"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query.sql}", query.params).fetchall()
+    return [row[3] for row in plan if _FULL_SCAN.match(row[3])]
+
+
+def verify_plans(conn: sqlite3.Connection, queries: Sequence[PlanQuery]) -> bool:
+    """检查全部代表性查询都能使用索引
+
+    Returns:
+        bool: 没有任何全表扫描时为True
+    """
+    ok = True
+    for query in queries:
+        scans = full_scans(conn, query)
+        if scans:
+            ok = False
+            print(f"[全表扫描] {query.name}: {'; '.join(scans)}")
+        else:
+            print(f"[使用索引] {query.name}")
+    return ok
+
+
+def time_queries(
+    conn: sqlite3.Connection, queries: Sequence[PlanQuery], repeat: int = DEFAULT_REPEAT
+) -> Dict[str, float]:
+    """对需要计时的查询取 repeat 次执行耗时的中位数（毫秒）"""
+    timings = {}
+    for query in queries:
+        if not query.timed:
+            continue
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(query.sql, query.params).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[query.name] = statistics.median(samples)
+    return timings
+
+
+def print_timings(before: Optional[Dict[str, float]], after: Dict[str, float]) -> None:
+    """输出创建索引前后的耗时对比"""
+    print(f"\n{'查询':<24}{'建索引前(ms)':>14}{'建索引后(ms)':>14}{'加速':>8}")
+    for name, after_ms in after.items():
+        before_ms = (before or {}).get(name)
+        if before_ms is None:
+            print(f"{name:<24}{'-':>14}{after_ms:>14.2f}{'-':>8}")
+        else:
+            speedup = before_ms / after_ms if after_ms else float("inf")
+            print(f"{name:<24}{before_ms:>14.2f}{after_ms:>14.2f}{speedup:>7.1f}x")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="财务数据库索引构建与校验")
+    parser.add_argument("command", choices=("build", "verify", "timings"))
+    parser.add_argument("--db", default=FINANCIAL_DB_PATH, help="数据库文件路径")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="计时重复次数")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        queries = representative_queries(conn)
+        if args.command == "timings":
+            print_timings(None, time_queries(conn, queries, args.repeat))
+            return 0
+
+        if args.command == "build":
+            before = time_queries(conn, queries, args.repeat)
+            conn.close()
+            build_start = time.perf_counter()
+            with rebuild_copy(args.db) as write_conn:
+                created = ensure_indexes(write_conn)
+            print(
+                f"新建索引 {len(created)} 个，ANALYZE 完成，"
+                f"耗时 {time.perf_counter() - build_start:.1f}s"
+            )
+            for name in created:
+                print(f"  + {name}")
+            conn = sqlite3.connect(args.db)
+            print_timings(before, time_queries(conn, queries, args.repeat))
+            print()
+
+        return 0 if verify_plans(conn, queries) else 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""数据获取后端模块
+
+编译生成的SQL可以在以下后端上执行，通过环境变量 FETCH_BACKEND 选择：
+- sqlite（默认）：在 Astock_financial_data.db 上执行，经过SQL结果缓存
+- duckdb：把四张财务数据表导出为分区的 Parquet 文件，由嵌入式列式引擎 DuckDB 查询。
+  只读取查询用到的列（投影下推），按报告日、股票、行业条件跳过无关的分区和行组
+  （谓词下推），返回以 Arrow 为存储的DataFrame。适合跨多年、全行业但只取少数几列的查询。
+- arrow：在内存映射的 Arrow IPC 快照上筛选（见 arrow_snapshot），同一节点的worker共享一份数据
+
+Parquet 按报告年份（PARQUET_PARTITION=year，默认）或申万一级行业（sw1）分区，
+导出时记录数据版本标识；数据库更新后、重新导出前，duckdb 后端自动回退到 sqlite。
+
+导出方式（在 src 目录下）：
+    python -m agent.fetch_backend export [--partition year|sw1] [--dir 输出目录]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import (
+        FINANCIAL_TABLES, ROOT_DIR, connect_readonly, get_data_stamp, get_readonly_engine
+    )
+    from .result_cache import get_sql_cache
+    from .streaming_fetch import FetchedData, fetch_sql
+    from .sql_compiler import CompiledQuery, quote_identifier, render_sql
+    from .arrow_snapshot import (
+        ARROW_SNAPSHOT_DIR, iter_table_rows, load_snapshot_backend, rows_to_arrays, table_schema
+    )
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import (
+        FINANCIAL_TABLES, ROOT_DIR, connect_readonly, get_data_stamp, get_readonly_engine
+    )
+    from result_cache import get_sql_cache
+    from streaming_fetch import FetchedData, fetch_sql
+    from sql_compiler import CompiledQuery, quote_identifier, render_sql
+    from arrow_snapshot import (
+        ARROW_SNAPSHOT_DIR, iter_table_rows, load_snapshot_backend, rows_to_arrays, table_schema
+    )
+
+try:
+    import duckdb
+except ImportError:  # 列式后端为可选功能
+    duckdb = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+except ImportError:
+    pa = None
+
+FETCH_BACKEND = os.getenv("FETCH_BACKEND", "sqlite").lower()
+PARQUET_DIR = os.getenv("PARQUET_DIR", os.path.join(ROOT_DIR, "data/parquet"))
+PARQUET_PARTITION = os.getenv("PARQUET_PARTITION", "year")
+
+# 分区方式 -> 分区列。分区列只用于分区裁剪，不出现在查询结果中
+PARTITION_COLUMNS = {"year": "report_year", "sw1": "sw1_partition"}
+# 申万一级为空的行所在的分区
+UNCLASSIFIED_INDUSTRY = "未分类"
+MANIFEST_FILE = "_manifest.json"
+
+
+class SqliteFetchBackend:
+    """在SQLite财务数据库上执行查询"""
+
+    name = "sqlite"
+
+    def execute(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        """执行任意SQL（不经过缓存）"""
+        return pd.read_sql_query(sql, get_readonly_engine(), params=tuple(params))
+
+    def fetch(self, compiled: CompiledQuery) -> pd.DataFrame:
+        """执行编译结果"""
+        return get_sql_cache().read_sql(
+            compiled.sql, get_readonly_engine(), params=compiled.params
+        )
+
+    def fetch_lazy(self, compiled: CompiledQuery) -> FetchedData:
+        """分块执行编译结果，大结果写入临时文件"""
+        return fetch_sql(
+            compiled.sql, get_readonly_engine(), compiled.params, ordered=True
+        )
+
+
+class ParquetDuckDBBackend:
+    """在分区的 Parquet 文件上用 DuckDB 执行查询"""
+
+    name = "duckdb"
+
+    def __init__(self, parquet_dir: str = PARQUET_DIR):
+        """
+        Args:
+            parquet_dir: export_parquet 的输出目录
+
+        Raises:
+            FileNotFoundError: 目录中没有导出清单时抛出
+        """
+        manifest_path = os.path.join(parquet_dir, MANIFEST_FILE)
+        self.manifest_mtime = os.path.getmtime(manifest_path)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.parquet_dir = parquet_dir
+        self.partition = self.manifest["partition"]
+        self._conn = duckdb.connect(database=":memory:")
+        for table in self.manifest["tables"]:
+            pattern = os.path.join(parquet_dir, table, "**", "*.parquet").replace("'", "''")
+            self._conn.execute(
+                f"CREATE VIEW {quote_identifier(table)} AS "
+                f"SELECT * FROM read_parquet('{pattern}', hive_partitioning = true)"
+            )
+
+    def is_current(self) -> bool:
+        """导出的数据是否与当前数据库版本一致"""
+        return self.manifest.get("data_stamp") == get_data_stamp()
+
+    def is_reexported(self) -> bool:
+        """数据集是否在加载之后被重新导出"""
+        try:
+            return os.path.getmtime(
+                os.path.join(self.parquet_dir, MANIFEST_FILE)
+            ) != self.manifest_mtime
+        except OSError:
+            return False
+
+    def execute(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        """执行任意SQL（不经过缓存），返回以 Arrow 为存储的DataFrame"""
+        # 同一个连接上的游标共享视图定义，每个游标只能在一个线程中使用
+        cursor = self._conn.cursor()
+        try:
+            table = cursor.execute(sql, list(params)).fetch_arrow_table()
+        finally:
+            cursor.close()
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def fetch(self, compiled: CompiledQuery) -> pd.DataFrame:
+        """执行编译结果，按年份分区时增加分区列上的条件"""
+        year_column = PARTITION_COLUMNS["year"] if self.partition == "year" else None
+        sql, params = render_sql(compiled, year_partition_column=year_column)
+        # 注释区分两个后端的缓存条目
+        return get_sql_cache().read_sql(
+            f"/* duckdb */ {sql}", self, params=params,
+            runner=lambda sql, con, params: self.execute(sql, params),
+        )
+
+    def fetch_lazy(self, compiled: CompiledQuery) -> FetchedData:
+        """执行编译结果并按行数上限截断（结果以列式存储，不写临时文件）"""
+        return FetchedData.from_frame(self.fetch(compiled), ordered=True)
+
+
+def _partition_values(partition: str, rows: List[tuple], column_index: Dict[str, int]) -> List:
+    """计算每一行的分区列取值"""
+    if partition == "year":
+        date_index = column_index["报告日"]
+        years = []
+        for row in rows:
+            year = str(row[date_index] or "")[:4]
+            years.append(int(year) if year.isdigit() else 0)
+        return years
+    industry_index = column_index["申万一级"]
+    return [row[industry_index] or UNCLASSIFIED_INDUSTRY for row in rows]
+
+
+def _table_batches(conn, table: str, schema, partition: str) -> Iterator:
+    """分批读取整张表并转换为带分区列的 Arrow RecordBatch"""
+    column_index = {name: i for i, name in enumerate(schema.names[:-1])}
+    partition_type = schema.field(len(schema) - 1).type
+    for rows in iter_table_rows(conn, table):
+        arrays = rows_to_arrays(rows, schema)
+        arrays.append(pa.array(
+            _partition_values(partition, rows, column_index), type=partition_type
+        ))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_parquet(parquet_dir: str = PARQUET_DIR, partition: str = PARQUET_PARTITION) -> Dict[str, int]:
+    """把四张财务数据表导出为分区的 Parquet 数据集
+
+    先写入临时目录，全部完成后替换原目录，导出过程中查询仍使用旧的数据集。
+
+    Args:
+        parquet_dir: 输出目录
+        partition: 分区方式，year（报告年份）或 sw1（申万一级行业）
+
+    Returns:
+        Dict[str, int]: 表名 -> 导出的行数
+    """
+    if partition not in PARTITION_COLUMNS:
+        raise ValueError(f"未知的分区方式: {partition}")
+    partition_column = PARTITION_COLUMNS[partition]
+    partition_type = pa.int32() if partition == "year" else pa.string()
+
+    tmp_dir = f"{parquet_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    data_stamp = get_data_stamp()
+    conn = connect_readonly()
+    row_counts = {}
+    try:
+        for table in FINANCIAL_TABLES:
+            schema = table_schema(conn, table)
+            if schema is None:
+                continue
+            schema = schema.append(pa.field(partition_column, partition_type))
+            pa_dataset.write_dataset(
+                _table_batches(conn, table, schema, partition),
+                base_dir=os.path.join(tmp_dir, table),
+                schema=schema,
+                format="parquet",
+                partitioning=pa_dataset.partitioning(
+                    pa.schema([(partition_column, partition_type)]), flavor="hive"
+                ),
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            row_counts[table] = conn.execute(
+                f"SELECT COUNT(*) FROM {quote_identifier(table)}"
+            ).fetchone()[0]
+    finally:
+        conn.close()
+
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "data_stamp": data_stamp,
+            "partition": partition,
+            "tables": row_counts,
+        }, f, ensure_ascii=False, indent=2)
+
+    old_dir = f"{parquet_dir}.old-{os.getpid()}"
+    if os.path.exists(parquet_dir):
+        os.replace(parquet_dir, old_dir)
+    os.replace(tmp_dir, parquet_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return row_counts
+
+
+_sqlite_backend = SqliteFetchBackend()
+_columnar_backend = None
+_columnar_backend_lock = threading.Lock()
+# 上次加载失败时数据集清单的修改时间；清单不变时不再重复尝试加载
+_columnar_failed_mtime: Optional[float] = None
+
+
+def _load_duckdb_backend() -> Optional[ParquetDuckDBBackend]:
+    """创建 duckdb 后端，依赖缺失或尚未导出时返回None"""
+    if duckdb is None or pa is None:
+        print("未安装 duckdb 或 pyarrow，数据获取使用 sqlite 后端")
+        return None
+    try:
+        return ParquetDuckDBBackend(PARQUET_DIR)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"加载 Parquet 数据集失败，数据获取使用 sqlite 后端: {str(e)}")
+        return None
+
+
+# FETCH_BACKEND -> (列式后端的加载函数, 数据集目录)
+_COLUMNAR_BACKEND_LOADERS = {
+    "duckdb": (_load_duckdb_backend, PARQUET_DIR),
+    "arrow": (load_snapshot_backend, ARROW_SNAPSHOT_DIR),
+}
+
+
+def _manifest_mtime(data_dir: str) -> float:
+    """数据集清单的修改时间，尚未导出时为0"""
+    try:
+        return os.path.getmtime(os.path.join(data_dir, MANIFEST_FILE))
+    except OSError:
+        return 0.0
+
+
+def get_fetch_backend():
+    """按 FETCH_BACKEND 返回数据获取后端
+
+    列式后端（duckdb / arrow）的数据集与当前数据库版本不一致时回退到 sqlite，
+    数据集重新导出后自动重新加载。加载失败（依赖缺失、尚未导出）时同样回退，
+    并记住失败时清单的修改时间，数据集重新导出之前不再重复加载。
+
+    Returns:
+        SqliteFetchBackend、ParquetDuckDBBackend 或 ArrowSnapshotBackend
+    """
+    global _columnar_backend, _columnar_failed_mtime
+    entry = _COLUMNAR_BACKEND_LOADERS.get(FETCH_BACKEND)
+    if entry is None:
+        return _sqlite_backend
+    loader, data_dir = entry
+
+    backend = _columnar_backend
+    if backend is not None and backend.is_current():
+        return backend
+    if backend is None and _columnar_failed_mtime == _manifest_mtime(data_dir):
+        return _sqlite_backend
+    with _columnar_backend_lock:
+        if _columnar_backend is None or _columnar_backend.is_reexported():
+            manifest_mtime = _manifest_mtime(data_dir)
+            if _columnar_backend is not None or _columnar_failed_mtime != manifest_mtime:
+                _columnar_backend = loader()
+                _columnar_failed_mtime = manifest_mtime if _columnar_backend is None else None
+        if _columnar_backend is None or not _columnar_backend.is_current():
+            return _sqlite_backend
+        return _columnar_backend
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="导出财务数据表为分区的 Parquet 数据集")
+    parser.add_argument("command", choices=("export",))
+    parser.add_argument("--partition", choices=tuple(PARTITION_COLUMNS), default=PARQUET_PARTITION)
+    parser.add_argument("--dir", default=PARQUET_DIR, help="输出目录")
+    args = parser.parse_args(argv)
+
+    if pa is None:
+        print("导出 Parquet 需要安装 pyarrow")
+        return 1
+    row_counts = export_parquet(args.dir, args.partition)
+    for table, rows in row_counts.items():
+        print(f"{table}: {rows} 行")
+    print(f"已按 {args.partition} 分区导出到 {args.dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""A股财务数据库访问模块
+
+统一管理 data/Astock_financial_data.db 的位置和只读连接，供各个本地解析器、
+索引构建工具和 DataFetcherAgent 共享：
+- 以 mode=ro（默认同时 immutable=1）的URI打开，设置 mmap_size、cache_size、temp_store
+- DataFetcherAgent 使用大小固定的连接池，每条查询受时间预算限制
+- 建索引、建宽表等写操作通过 rebuild_copy 在副本上进行，完成后整体替换文件
+"""
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+# 项目根目录
+ROOT_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../..")
+)
+# 财务数据库文件路径，可通过环境变量覆盖
+FINANCIAL_DB_PATH = os.getenv(
+    "FINANCIAL_DB_PATH", os.path.join(ROOT_DIR, "data/Astock_financial_data.db")
+)
+
+# 只读连接的性能参数
+FINANCIAL_DB_IMMUTABLE = os.getenv("FINANCIAL_DB_IMMUTABLE", "1") != "0"
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(1024 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+# 单条查询的时间预算（秒），0表示不限制
+QUERY_TIME_BUDGET = float(os.getenv("SQL_QUERY_TIME_BUDGET", "30"))
+# 每执行多少条SQLite虚拟机指令检查一次时间预算
+PROGRESS_HANDLER_OPS = 10000
+
+# 四张财务数据表
+FINANCIAL_TABLES = ("income_table", "balance_table", "cashflow_table", "ratio_table")
+# 可选的数据版本表：数据库刷新时写入新的版本号，各节点上的同一份数据得到相同的版本标识
+DATA_VERSION_TABLE = "data_version"
+
+
+def get_data_version() -> float:
+    """返回财务数据库的数据版本（文件修改时间），文件不存在时为0"""
+    try:
+        return os.path.getmtime(FINANCIAL_DB_PATH)
+    except OSError:
+        return 0.0
+
+
+_data_stamp: Optional[Tuple[float, str]] = None
+_data_stamp_lock = threading.Lock()
+
+
+def _read_version_table() -> Optional[str]:
+    """读取数据版本表中的最新版本号，表不存在时返回None"""
+    try:
+        conn = connect_readonly()
+    except sqlite3.Error:
+        return None
+    try:
+        row = conn.execute(
+            f'SELECT MAX("version") FROM "{DATA_VERSION_TABLE}"'
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+    return str(row[0]) if row and row[0] is not None else None
+
+
+def get_data_stamp() -> str:
+    """返回用于缓存失效的数据版本标识
+
+    数据库中有 data_version 表时使用其中的版本号，否则使用文件修改时间。
+    同一份数据复制到不同节点后修改时间不同，跨节点共享的缓存应当依赖版本表。
+    版本表只在文件修改时间变化时重新读取。
+
+    Returns:
+        str: "version:<版本号>" 或 "mtime:<修改时间>"
+    """
+    global _data_stamp
+    mtime = get_data_version()
+    cached = _data_stamp
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _data_stamp_lock:
+        if _data_stamp is None or _data_stamp[0] != mtime:
+            version = _read_version_table()
+            stamp = f"version:{version}" if version else f"mtime:{mtime:.6f}"
+            _data_stamp = (mtime, stamp)
+        return _data_stamp[1]
+
+
+class ReadOnlyConnection(sqlite3.Connection):
+    """带查询时间预算的只读连接
+
+    通过 SQLite 的 progress handler 每执行一定数量的虚拟机指令检查一次截止时间，
+    超时后SQLite中止当前语句并抛出 sqlite3.OperationalError("interrupted")，
+    避免LLM生成的失控查询长时间占用worker。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.data_version = get_data_version()
+        self.budget_exceeded = False
+        self._deadline: Optional[float] = None
+        self.set_progress_handler(self._check_deadline, PROGRESS_HANDLER_OPS)
+
+    def _check_deadline(self) -> int:
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self.budget_exceeded = True
+            return 1
+        return 0
+
+    def start_budget(self, seconds: Optional[float] = QUERY_TIME_BUDGET) -> None:
+        """为接下来执行的语句（包括读取结果）设置时间预算
+
+        Args:
+            seconds: 预算秒数，为None或不大于0时不限制
+        """
+        self.budget_exceeded = False
+        self._deadline = time.monotonic() + seconds if seconds and seconds > 0 else None
+
+    def clear_budget(self) -> None:
+        """取消时间预算"""
+        self._deadline = None
+
+
+def connect_readonly(immutable: bool = FINANCIAL_DB_IMMUTABLE) -> ReadOnlyConnection:
+    """以只读模式打开财务数据库，并设置适合只读分析查询的pragma
+
+    Args:
+        immutable: 是否以 immutable=1 打开；数据库文件不会被原地修改时可以省去
+            文件锁和变更检测，数据刷新应当通过替换文件完成
+
+    Returns:
+        ReadOnlyConnection: 只读连接
+
+    Raises:
+        sqlite3.OperationalError: 数据库文件不存在或无法打开时抛出
+    """
+    db_uri = Path(FINANCIAL_DB_PATH).resolve().as_uri()
+    query = "mode=ro&immutable=1" if immutable else "mode=ro"
+    conn = sqlite3.connect(
+        f"{db_uri}?{query}",
+        uri=True,
+        check_same_thread=False,
+        factory=ReadOnlyConnection,
+    )
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+@contextlib.contextmanager
+def rebuild_copy(db_path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """在数据库文件的副本上执行写操作，成功后用 os.replace 替换原文件
+
+    worker 以 immutable=1 打开数据库，SQLite 不会察觉文件被原地修改，读到写了一半的
+    页面会得到错误结果甚至 "database disk image is malformed"。替换文件则是原子的：
+    已打开的连接继续读取旧文件，文件修改时间变化后连接池丢弃旧连接、打开新文件。
+    构建期间磁盘上同时存在新旧两份数据库，需要预留与数据库文件相同大小的空间。
+
+    Args:
+        db_path: 数据库文件路径，默认为 FINANCIAL_DB_PATH
+
+    Yields:
+        sqlite3.Connection: 副本上的可写连接，with 块正常结束时提交并替换原文件；
+            出现异常时删除副本，原文件保持不变
+    """
+    db_path = db_path or FINANCIAL_DB_PATH
+    tmp_path = f"{db_path}.rebuild-{os.getpid()}"
+    source = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        source.backup(conn)
+        source.close()
+        yield conn
+        conn.commit()
+        conn.close()
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        source.close()
+        conn.close()
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def is_budget_exceeded(error: BaseException) -> bool:
+    """判断查询错误是否由超出时间预算导致"""
+    return "interrupted" in str(error)
+
+
+def create_readonly_engine(pool_size: int = SQLITE_POOL_SIZE):
+    """创建访问财务数据库的SQLAlchemy engine
+
+    连接由 connect_readonly 创建，放在大小固定的连接池中供各线程复用；
+    每条语句执行前重新开始计算时间预算，数据库文件更新后旧连接在取出时被丢弃。
+
+    Args:
+        pool_size: 连接池大小，也是同时执行的查询数上限
+
+    Returns:
+        sqlalchemy.engine.Engine: 只读engine
+    """
+    from sqlalchemy import create_engine, event, exc
+    from sqlalchemy.pool import QueuePool
+
+    engine = create_engine(
+        "sqlite://",
+        creator=connect_readonly,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+
+    @event.listens_for(engine, "checkout")
+    def _discard_stale(dbapi_connection, connection_record, connection_proxy):
+        if dbapi_connection.data_version != get_data_version():
+            raise exc.DisconnectionError("财务数据库已更新，重新建立连接")
+
+    @event.listens_for(engine, "checkin")
+    def _clear_budget(dbapi_connection, connection_record):
+        if dbapi_connection is not None:
+            dbapi_connection.clear_budget()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_budget(conn, cursor, statement, parameters, context, executemany):
+        cursor.connection.start_budget()
+
+    return engine
+
+
+_readonly_engine = None
+_readonly_engine_lock = threading.Lock()
+
+
+def get_readonly_engine():
+    """获取进程内共享的只读engine（见 create_readonly_engine）"""
+    global _readonly_engine
+    if _readonly_engine is None:
+        with _readonly_engine_lock:
+            if _readonly_engine is None:
+                _readonly_engine = create_readonly_engine()
+    return _readonly_engine
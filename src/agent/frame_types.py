@@ -0,0 +1,146 @@
+"""取数结果的紧凑类型转换模块
+
+SQL查询返回的DataFrame中，股票代码、股票名称、申万一级、申万二级都是object列
+（每个单元格一个Python字符串对象），其余列都是float64；PandasAIAgent 初始化时
+再逐列 pd.to_numeric 推断类型并复制一次。本模块在取数时统一做一次类型转换：
+- 列名包含"代码"的列（股票代码等，与 PandasAIAgent 的规则相同）补齐为6位后转为 category
+- 股票名称、申万一级、申万二级转为 category（同一只股票、同一个行业在各期重复出现）
+- 报告日（yyyymmdd）转为 datetime64
+- 其余object列只有全部取值都是数值（不含文本）时才转为数值列，文本列即使看起来像
+  数字（如 "00001"）也保持原样；FETCH_FLOAT32_RATIOS=1 时 ratio_table 中的比率列使用 float32
+转换后的类型记录在 df.attrs[SCHEMA_ATTR] 中，后续阶段据此跳过重新推断。
+"""
+
+import os
+from typing import Dict, FrozenSet, Optional
+
+import pandas as pd
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .schema_digest import KEY_COLUMNS, get_schema_digest
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from schema_digest import KEY_COLUMNS, get_schema_digest
+
+FETCH_FLOAT32_RATIOS = os.getenv("FETCH_FLOAT32_RATIOS", "0") == "1"
+
+# 列名包含这些关键词的列按股票代码处理
+CODE_COLUMN_KEYWORDS = ("股票代码", "代码")
+CODE_WIDTH = 6
+REPORT_DATE_COLUMN = "报告日"
+REPORT_DATE_FORMAT = "%Y%m%d"
+CATEGORY_COLUMNS = ("股票名称", "申万一级", "申万二级")
+RATIO_TABLE = "ratio_table"
+# 记录转换后类型的 DataFrame.attrs 键
+SCHEMA_ATTR = "fetch_schema"
+
+
+def frame_schema(df: pd.DataFrame) -> Dict[str, str]:
+    """列名 -> 数据类型名称"""
+    return {str(column): str(dtype) for column, dtype in df.dtypes.items()}
+
+
+def is_compact(df: pd.DataFrame) -> bool:
+    """DataFrame 是否已经过 compact_frame 且之后没有改变列类型"""
+    return df.attrs.get(SCHEMA_ATTR) == frame_schema(df)
+
+
+def ratio_columns() -> FrozenSet[str]:
+    """ratio_table 中的比率列名"""
+    try:
+        columns = get_schema_digest().tables.get(RATIO_TABLE, {}).get("columns", [])
+    except Exception as e:
+        print(f"读取比率列失败，不使用float32: {str(e)}")
+        return frozenset()
+    return frozenset(column[0] for column in columns if column[0] not in KEY_COLUMNS)
+
+
+def is_code_column(column) -> bool:
+    """是否为股票代码列"""
+    return any(keyword in str(column) for keyword in CODE_COLUMN_KEYWORDS)
+
+
+def _code_column(values: pd.Series) -> pd.Series:
+    """股票代码补齐为定长字符串（例如 1 -> 000001）"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    codes = values.astype("string").str.replace(r"\.0$", "", regex=True).str.zfill(CODE_WIDTH)
+    return codes.astype("category")
+
+
+def _lost_values(original: pd.Series, converted: pd.Series) -> bool:
+    """转换后是否有非空、非空白的值变成了空值"""
+    lost = converted.isna() & original.notna()
+    if not lost.any():
+        return False
+    return bool((original[lost].astype("string").str.strip() != "").any())
+
+
+def _report_date_column(values: pd.Series) -> pd.Series:
+    """报告日转为datetime，无法无损转换时保持原样"""
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+    text = values
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        try:
+            text = values.astype("Int64")
+        except (TypeError, ValueError):
+            return values
+    text = text.astype("string")
+    dates = pd.to_datetime(text, format=REPORT_DATE_FORMAT, errors="coerce")
+    if _lost_values(values, dates):
+        # CodeAgent 生成的SQL可能把报告日格式化为 yyyy-mm-dd 等写法
+        dates = pd.to_datetime(text, errors="coerce")
+    return values if _lost_values(values, dates) else dates
+
+
+# pd.api.types.infer_dtype 中表示取值全部是数值的结果
+_NUMERIC_INFERRED = frozenset(("integer", "floating", "mixed-integer-float", "decimal"))
+
+
+def _numeric_column(values: pd.Series) -> pd.Series:
+    """取值全部是数值对象（SQLite中混有NULL的数值列）的object列转为数值列，文本列保持原样"""
+    if values.dtype != object:
+        return values
+    if pd.api.types.infer_dtype(values, skipna=True) not in _NUMERIC_INFERRED:
+        return values
+    return pd.to_numeric(values, errors="coerce")
+
+
+def compact_frame(df: pd.DataFrame, float32_ratios: Optional[bool] = None) -> pd.DataFrame:
+    """对取数结果做一次紧凑类型转换并记录schema
+
+    已经转换过的DataFrame直接返回。列名重复时（SELECT * 连接多张表）不做转换。
+
+    Args:
+        df: 取数结果，会被原地修改
+        float32_ratios: 比率列是否使用float32，默认取 FETCH_FLOAT32_RATIOS
+
+    Returns:
+        pd.DataFrame: 转换后的DataFrame
+    """
+    if is_compact(df) or df.columns.duplicated().any():
+        return df
+    if float32_ratios is None:
+        float32_ratios = FETCH_FLOAT32_RATIOS
+    float32_columns = ratio_columns() if float32_ratios else frozenset()
+
+    for column in df.columns:
+        values = df[column]
+        if is_code_column(column):
+            df[column] = _code_column(values)
+        elif column == REPORT_DATE_COLUMN:
+            df[column] = _report_date_column(values)
+        elif column in CATEGORY_COLUMNS:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                df[column] = values.astype("category")
+        else:
+            values = _numeric_column(values)
+            if column in float32_columns and pd.api.types.is_float_dtype(values.dtype):
+                values = values.astype("float32")
+            df[column] = values
+
+    df.attrs[SCHEMA_ATTR] = frame_schema(df)
+    return df
@@ -0,0 +1,326 @@
+"""申万行业名称本地解析模块
+
+从 sw.csv 读取申万一级/申万二级（2021年）行业层级，构建进程内的行业索引，
+把LLM或用户给出的口语化行业名称解析为标准名称：
+- 标准名称及去掉"Ⅱ"后缀的写法：白酒 -> 白酒Ⅱ
+- 带"行业"、"板块"等后缀的写法：机械行业 -> 机械设备
+- 唯一前缀：机械 -> 机械设备
+- 常用俗称：券商 -> 非银金融、芯片 -> 半导体
+
+解析结果可直接转换为 申万一级/申万二级 列上的等值筛选条件，一级行业也可以
+展开为其下的全部二级行业。
+"""
+
+import bisect
+import csv
+import os
+import re
+import threading
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .term_matcher import AhoCorasickAutomaton
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from term_matcher import AhoCorasickAutomaton
+
+# 行业层级文件路径（相对于当前文件）
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SW_CSV_PATH = os.path.join(CURRENT_DIR, "sw.csv")
+
+LEVEL1_COLUMN = "申万一级"
+LEVEL2_COLUMN = "申万二级"
+
+# 常用俗称 -> 标准行业名称（只收录无法由前缀规则推出的写法）
+INDUSTRY_SYNONYMS: Mapping[str, str] = MappingProxyType({
+    "券商": "非银金融",
+    "证券": "非银金融",
+    "保险": "非银金融",
+    "军工": "国防军工",
+    "化工": "基础化工",
+    "地产": "房地产",
+    "家电": "家用电器",
+    "建材": "建筑材料",
+    "建筑": "建筑装饰",
+    "有色": "有色金属",
+    "石化": "石油石化",
+    "石油": "石油石化",
+    "医药": "医药生物",
+    "零售": "商贸零售",
+    "纺织": "纺织服饰",
+    "服装": "纺织服饰",
+    "农业": "农林牧渔",
+    "食品": "食品饮料",
+    "芯片": "半导体",
+    "集成电路": "半导体",
+    "锂电": "电池",
+    "锂电池": "电池",
+    "动力电池": "电池",
+    "新能源": "电力设备",
+    "光伏": "电力设备",
+    "风电": "风电设备",
+    "酒店": "酒店餐饮",
+    "餐饮": "酒店餐饮",
+    "旅游": "旅游及景区",
+    "航空": "航空机场",
+    "机场": "航空机场",
+    "港口": "航运港口",
+    "航运": "航运港口",
+    "养猪": "养殖业",
+    "生猪": "养殖业",
+    "软件": "软件开发",
+    "整车": "乘用车",
+    "中药": "中药Ⅱ",
+    "城商行": "城商行Ⅱ",
+    "农商行": "农商行Ⅱ",
+    "国有银行": "国有大型银行Ⅱ",
+    "国有大行": "国有大型银行Ⅱ",
+})
+
+# 行业名称后常见的修饰词
+_INDUSTRY_SUFFIX = re.compile(r"(?:行业|板块|产业|赛道|类股|公司|企业|股)$")
+_SUFFIX_IN_TEXT = re.compile(r"行业|板块|产业|赛道|类股|股(?![票东本份息价利权])")
+# 多个行业名称之间的分隔符
+_NAME_SEPARATORS = re.compile(r"[,，、;；/\s]+")
+# 唯一前缀的最短长度
+MIN_PREFIX_LENGTH = 2
+
+
+class Industry(NamedTuple):
+    """一个申万行业"""
+    level: int
+    name: str
+    level1: str
+
+
+class IndustryMatch(NamedTuple):
+    """查询文本中识别出的行业"""
+    start: int
+    end: int
+    industry: Industry
+
+
+def _normalize(name: str) -> str:
+    """去掉"Ⅱ"后缀和空白，用于不区分写法的比较"""
+    return name.strip().replace("Ⅱ", "").replace("II", "")
+
+
+class IndustryResolver:
+    """申万行业索引"""
+
+    def __init__(self, hierarchy: Iterable[Tuple[str, str]]):
+        """根据 (申万一级, 申万二级) 列表构建索引
+
+        Args:
+            hierarchy: (申万一级, 申万二级) 列表
+        """
+        industries: Dict[str, Industry] = {}
+        children: Dict[str, List[str]] = {}
+        for level1, level2 in hierarchy:
+            level1, level2 = level1.strip(), level2.strip()
+            if not level1:
+                continue
+            industries.setdefault(level1, Industry(1, level1, level1))
+            children.setdefault(level1, [])
+            if level2 and level2 not in industries:
+                industries[level2] = Industry(2, level2, level1)
+                children[level1].append(level2)
+
+        self._industries = industries
+        self._children = {
+            level1: tuple(names) for level1, names in children.items()
+        }
+
+        # 规范化写法 -> 标准名称；一级、二级同名时（如 电力设备/电力）以完全一致者为准
+        lookup: Dict[str, str] = {}
+        for name in industries:
+            lookup.setdefault(_normalize(name), name)
+        for name in industries:
+            lookup[name] = name
+        for synonym, name in INDUSTRY_SYNONYMS.items():
+            if name in industries:
+                lookup.setdefault(synonym, name)
+        self._lookup = lookup
+        self._sorted_keys = sorted(lookup)
+
+        # 自由文本中额外识别一级行业的唯一前缀（机械、国防），二级行业的前缀
+        # 多为"一般"、"专业"之类的常用词，不参与扫描
+        text_patterns = dict(lookup)
+        for name in self._children:
+            for length in range(MIN_PREFIX_LENGTH, len(name)):
+                prefix = name[:length]
+                industry = self.resolve(prefix)
+                if prefix not in text_patterns and industry is not None:
+                    text_patterns[prefix] = industry.name
+        self._text_patterns = text_patterns
+        self._automaton = AhoCorasickAutomaton(text_patterns)
+
+    def __len__(self) -> int:
+        return len(self._industries)
+
+    @property
+    def level1_names(self) -> Tuple[str, ...]:
+        """全部申万一级行业名称"""
+        return tuple(self._children)
+
+    def children(self, level1: str) -> Tuple[str, ...]:
+        """把一级行业展开为其下的全部二级行业
+
+        Args:
+            level1: 申万一级行业名称（可以是口语化写法）
+
+        Returns:
+            Tuple[str, ...]: 二级行业名称，不是一级行业时为空元组
+        """
+        industry = self.resolve(level1)
+        if industry is None or industry.level != 1:
+            return ()
+        return self._children[industry.name]
+
+    def resolve(self, text: str) -> Optional[Industry]:
+        """把一个行业名称解析为标准申万行业
+
+        Args:
+            text: 行业名称，如 "机械行业"、"白酒"、"券商"
+
+        Returns:
+            Optional[Industry]: 唯一匹配的行业，无法确定时返回None
+        """
+        text = text.strip()
+        if not text:
+            return None
+
+        for key in (text, _INDUSTRY_SUFFIX.sub("", text)):
+            if not key:
+                continue
+            # 1. 标准名称、去"Ⅱ"写法、俗称
+            for candidate in (key, _normalize(key)):
+                name = self._lookup.get(candidate)
+                if name:
+                    return self._industries[name]
+
+            # 2. 唯一前缀（机械 -> 机械设备）
+            if len(key) >= MIN_PREFIX_LENGTH:
+                start = bisect.bisect_left(self._sorted_keys, key)
+                names = set()
+                for candidate in self._sorted_keys[start:]:
+                    if not candidate.startswith(key):
+                        break
+                    names.add(self._lookup[candidate])
+                if len(names) == 1:
+                    return self._industries[names.pop()]
+        return None
+
+    def find_in_text(self, text: str) -> List[IndustryMatch]:
+        """在自由文本中识别行业名称和俗称
+
+        紧跟在行业名称后的"行业"、"板块"等修饰词一并计入匹配片段。
+
+        Args:
+            text: 用户查询
+
+        Returns:
+            List[IndustryMatch]: 按出现顺序排列、互不重叠的识别结果
+        """
+        matches = []
+        for start, end in self._automaton.find_longest(text):
+            industry = self._industries[self._text_patterns[text[start:end]]]
+            suffix = _SUFFIX_IN_TEXT.match(text, end)
+            if suffix:
+                end = suffix.end()
+            matches.append(IndustryMatch(start, end, industry))
+        return matches
+
+    def canonicalize_names(self, names: str) -> Tuple[str, List[str]]:
+        """把逗号等分隔的行业名称列表规范化为标准申万行业名称
+
+        Args:
+            names: 如 "机械行业、白酒"
+
+        Returns:
+            Tuple[str, List[str]]: (逗号分隔的标准名称，无法识别的名称原样保留,
+                无法识别的名称列表)
+        """
+        canonical = []
+        unresolved = []
+        for name in _NAME_SEPARATORS.split(names or ""):
+            if not name:
+                continue
+            industry = self.resolve(name)
+            if industry is None:
+                unresolved.append(name)
+                resolved_name = name
+            else:
+                resolved_name = industry.name
+            if resolved_name not in canonical:
+                canonical.append(resolved_name)
+        return ",".join(canonical), unresolved
+
+    def industry_filters(
+        self, names: str, expand_level1: bool = False
+    ) -> Dict[str, List[str]]:
+        """把行业名称转换为 申万一级/申万二级 列上的等值筛选条件
+
+        Args:
+            names: 逗号等分隔的行业名称
+            expand_level1: 为True时一级行业展开为其下的二级行业，
+                全部条件落在申万二级列上
+
+        Returns:
+            Dict[str, List[str]]: 列名 -> 取值列表，只包含能识别的行业，
+                例如 {"申万一级": ["机械设备"], "申万二级": ["白酒Ⅱ"]}
+        """
+        filters: Dict[str, List[str]] = {}
+        for name in _NAME_SEPARATORS.split(names or ""):
+            industry = self.resolve(name) if name else None
+            if industry is None:
+                continue
+            if industry.level == 1 and expand_level1:
+                column, values = LEVEL2_COLUMN, self._children[industry.name]
+            elif industry.level == 1:
+                column, values = LEVEL1_COLUMN, (industry.name,)
+            else:
+                column, values = LEVEL2_COLUMN, (industry.name,)
+            column_values = filters.setdefault(column, [])
+            for value in values:
+                if value not in column_values:
+                    column_values.append(value)
+        return filters
+
+
+def _load_hierarchy(path: str) -> List[Tuple[str, str]]:
+    """加载申万行业层级（sw.csv）"""
+    hierarchy = []
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                hierarchy.append(
+                    (row.get(LEVEL1_COLUMN) or "", row.get(LEVEL2_COLUMN) or "")
+                )
+    except Exception as e:
+        print(f"加载申万行业分类失败: {str(e)}")
+    return hierarchy
+
+
+_industry_resolver: Optional[IndustryResolver] = None
+_industry_resolver_lock = threading.Lock()
+
+
+def get_industry_resolver() -> IndustryResolver:
+    """获取进程内共享的申万行业索引，首次调用时加载 sw.csv
+
+    Returns:
+        IndustryResolver: 行业索引
+    """
+    global _industry_resolver
+    resolver = _industry_resolver
+    if resolver is not None:
+        return resolver
+
+    with _industry_resolver_lock:
+        if _industry_resolver is None:
+            _industry_resolver = IndustryResolver(_load_hierarchy(SW_CSV_PATH))
+        return _industry_resolver
@@ -0,0 +1,112 @@
+"""按表并行抽取模块
+
+指标分布在 income_table、balance_table、ratio_table 等多张表时，编译SQL是一条多表
+LEFT JOIN，SQLite 只能串行执行。本模块按解析结果中的 "来自:表名" 把请求拆成每张表
+一条只含所需列的窄查询（sql_compiler.render_table_sql），在线程池中并发执行
+（SQLite 执行查询时释放GIL，连接池中的多个只读连接可以同时工作），
+再按 (股票代码, 报告日) 把已排序的结果依次左连接到主表上。
+
+每张表的查询单独经过SQL结果缓存，指标部分重合的后续查询可以复用其中几张表的结果。
+
+环境变量：
+- PARALLEL_FETCH_WORKERS：线程池大小，默认4
+- PARALLEL_FETCH_MIN_TABLES：使用并行抽取的最少表数，0表示关闭；多核机器上默认2，
+  单核机器上默认0（各表查询无法同时执行，拆分和合并的开销使总耗时约为一条JOIN的两倍，
+  见 benchmarks/bench_parallel_fetch.py）
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import get_readonly_engine
+    from .result_cache import get_sql_cache
+    from .sql_compiler import JOIN_KEYS, CompiledQuery, render_table_sql
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import get_readonly_engine
+    from result_cache import get_sql_cache
+    from sql_compiler import JOIN_KEYS, CompiledQuery, render_table_sql
+
+PARALLEL_FETCH_WORKERS = int(os.getenv("PARALLEL_FETCH_WORKERS", "4"))
+PARALLEL_FETCH_MIN_TABLES = int(
+    os.getenv("PARALLEL_FETCH_MIN_TABLES", "2" if (os.cpu_count() or 1) > 1 else "0")
+)
+
+
+class TableQuery(NamedTuple):
+    """拆分后的一张表的查询"""
+    table: str
+    sql: str
+    params: Tuple
+
+
+def plan_table_queries(compiled: CompiledQuery) -> List[TableQuery]:
+    """按表拆分编译结果，主表在第一位"""
+    return [
+        TableQuery(table, *render_table_sql(compiled, table))
+        for table in compiled.table_columns
+    ]
+
+
+def should_fetch_parallel(compiled: CompiledQuery) -> bool:
+    """编译结果涉及的表数是否达到并行抽取的阈值"""
+    return bool(PARALLEL_FETCH_MIN_TABLES) and len(compiled.table_columns) >= PARALLEL_FETCH_MIN_TABLES
+
+
+def merge_table_frames(compiled: CompiledQuery, frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """把按 (股票代码, 报告日) 排序的各表结果依次左连接到主表上
+
+    左连接保持主表的行顺序，结果与多表 LEFT JOIN 的SQL相同。
+
+    Args:
+        compiled: 编译结果
+        frames: 与 plan_table_queries 顺序一致的各表结果
+
+    Returns:
+        pd.DataFrame: 列顺序为 compiled.output_columns 的结果
+    """
+    result = frames[0]
+    for right in frames[1:]:
+        result = result.merge(right, on=list(JOIN_KEYS), how="left", sort=False)
+    return result[list(compiled.output_columns)]
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """获取进程内共享的按表抽取线程池"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=PARALLEL_FETCH_WORKERS, thread_name_prefix="table-fetch"
+                )
+    return _executor
+
+
+def fetch_tables_parallel(compiled: CompiledQuery) -> pd.DataFrame:
+    """并发执行各表的窄查询并合并
+
+    Args:
+        compiled: compile_parsed_query 的结果
+
+    Returns:
+        pd.DataFrame: 与执行编译SQL相同的列和行
+    """
+    engine = get_readonly_engine()
+    cache = get_sql_cache()
+    futures = [
+        _get_executor().submit(cache.read_sql, query.sql, engine, query.params)
+        for query in plan_table_queries(compiled)
+    ]
+    return merge_table_frames(compiled, [future.result() for future in futures])
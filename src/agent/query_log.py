@@ -0,0 +1,424 @@
+"""结构化的数据获取日志模块
+
+DataFetcherAgent 原来每次尝试都在 logs/ 下新建一个小文件并同步写入，负载较高时每小时
+产生数千个文件，写文件也发生在查询路径上。本模块把日志改为JSONL记录：
+- 调用方只把记录放入有界队列（队列已满时丢弃并计数，不阻塞查询）
+- 后台线程批量写入 logs/dfa_queries.<pid>.jsonl，超过大小上限时轮转并压缩为
+  dfa_queries.<pid>.<时间戳>.jsonl.gz，目录中只保留最近 QUERY_LOG_BACKUPS 个历史文件。
+  Celery prefork 的多个 worker 进程各写各的文件，互不干扰对方的轮转；
+  fork 之后子进程第一次记录日志时切换到自己的文件
+- 读取工具汇总各路径的耗时分位数、重试次数分布和错误数
+
+每条记录包含：ts（ISO时间）、event（query / error）、job_id、prompt_hash、path
+（compiled / agent / resolve）、retry（-1 表示最终失败）、sql、duration_ms、rows、message，
+CodeAgent 的记录另有 steps（本次运行的步数）；
+error 记录另外保存原始查询 query，便于排查。
+
+job_id 通过 bind_job 绑定到当前上下文，例如：
+    with bind_job(job_id):
+        data_fetcher.process_query_lazy(query)
+
+环境变量：
+- QUERY_LOG_DIR：日志目录，默认 <项目根目录>/logs
+- QUERY_LOG_MAX_BYTES：单个日志文件的大小上限（字节），默认64MB
+- QUERY_LOG_BACKUPS：保留的压缩历史文件数，默认20
+- QUERY_LOG_QUEUE_SIZE：队列容量，默认10000，0表示关闭日志
+
+汇总统计（在 src 目录下）：
+    python -m agent.query_log [日志目录]
+"""
+
+import argparse
+import atexit
+import contextlib
+import contextvars
+import glob
+import gzip
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import ROOT_DIR
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import ROOT_DIR
+
+DEFAULT_LOG_DIR = os.path.join(ROOT_DIR, "logs")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_BACKUPS = 20
+DEFAULT_QUEUE_SIZE = 10000
+LOG_NAME = "dfa_queries"
+# 当前文件 dfa_queries.<pid>.jsonl；压缩的历史文件 dfa_queries.<pid>.<时间戳>.jsonl.gz
+# （也兼容旧版本不带 pid 的 dfa_queries.jsonl 和 dfa_queries.<时间戳>.jsonl.gz）
+_CURRENT_FILE = re.compile(rf"^{LOG_NAME}(?:\.\d+)?\.jsonl$")
+_ROTATED_FILE = re.compile(rf"^{LOG_NAME}(?:\.(\d+))?\.(\d{{8}}_\d{{6}}_\d{{6}})\.jsonl\.gz$")
+# 后台线程每批最多写入的记录数、等待新记录的最长时间（秒）
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+
+_STOP = object()
+_job_id: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar(
+    "query_log_job_id", default=None
+)
+
+
+@contextlib.contextmanager
+def bind_job(job_id: Optional[str]):
+    """在 with 块内把日志记录的 job_id 设为指定值"""
+    token = _job_id.set(job_id)
+    try:
+        yield
+    finally:
+        _job_id.reset(token)
+
+
+def prompt_hash(query: str) -> str:
+    """查询文本的短哈希，用于把同一查询的多次尝试归为一组"""
+    return hashlib.sha1(str(query).encode("utf-8")).hexdigest()[:16]
+
+
+class QueryLogger:
+    """通过后台线程写入JSONL的日志记录器"""
+
+    def __init__(
+        self,
+        log_dir: str = DEFAULT_LOG_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        """
+        Args:
+            log_dir: 日志目录
+            max_bytes: 单个日志文件的大小上限，超过后轮转
+            backups: 保留的压缩历史文件数
+            queue_size: 队列容量，0表示不记录
+        """
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = queue_size > 0
+        self._queue_size = max(queue_size, 1)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self._queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._pid = os.getpid()
+        self.path = self._path_for(self._pid)
+        # 统计
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.write_errors = 0
+
+    def log(self, event: str, query: str, **fields) -> None:
+        """记录一条日志，只做入队，不在调用线程中写文件
+
+        Args:
+            event: query 或 error
+            query: 原始查询，记录其哈希（error 记录同时保存原文）
+            **fields: path、retry、sql、duration_ms、rows、message 等字段
+        """
+        if not self.enabled:
+            return
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "event": event,
+            "job_id": _job_id.get(),
+            "prompt_hash": prompt_hash(query),
+        }
+        record.update(fields)
+        if event == "error":
+            record["query"] = query
+        if self._pid != os.getpid():
+            self._after_fork()
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _path_for(self, pid: int) -> str:
+        """进程 pid 写入的当前日志文件"""
+        return os.path.join(self.log_dir, f"{LOG_NAME}.{pid}.jsonl")
+
+    def _after_fork(self) -> None:
+        """fork 出的子进程不继承父进程的写线程，改写自己的文件并丢弃从父进程复制来的队列"""
+        self._pid = os.getpid()
+        self.path = self._path_for(self._pid)
+        self._queue = queue.Queue(maxsize=self._queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self.written = self.dropped = self.rotations = self.write_errors = 0
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="query-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        """后台线程：批量取出记录写入文件，收到停止标记后退出"""
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if any(record is _STOP for record in batch):
+                stopping = True
+                batch = [record for record in batch if record is not _STOP]
+            self._write(batch)
+            for _ in range(len(batch) + stopping):
+                self._queue.task_done()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, records: List[Dict]) -> None:
+        if not records:
+            return
+        try:
+            if self._file is None:
+                os.makedirs(self.log_dir, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            for record in records:
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            self._file.flush()
+            self.written += len(records)
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            self.write_errors += 1
+            print(f"写入数据获取日志失败: {e}")
+
+    def _rotate(self) -> None:
+        """把本进程的当前文件压缩为带时间戳的 .jsonl.gz，并删除超出保留数的旧文件
+
+        只移动本进程自己的文件；清理历史文件时按时间戳统计目录中所有进程的文件，
+        其他进程可能同时在清理，已被删除的文件直接跳过。
+        """
+        self._file.close()
+        self._file = None
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        rotated = os.path.join(self.log_dir, f"{LOG_NAME}.{self._pid}.{stamp}.jsonl")
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+        self.rotations += 1
+        history = _rotated_files(self.log_dir)
+        for old in history[:max(len(history) - self.backups, 0)]:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+    def flush(self) -> None:
+        """等待队列中已有的记录全部写入"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """写入剩余记录并停止后台线程"""
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        with self._lock:
+            self._thread = None
+
+    def snapshot(self) -> Dict[str, int]:
+        """返回当前统计值
+
+        Returns:
+            Dict[str, int]: 已写入、丢弃的记录数，轮转次数和队列中的记录数
+        """
+        with self._lock:
+            return {
+                "written": self.written,
+                "dropped": self.dropped,
+                "rotations": self.rotations,
+                "write_errors": self.write_errors,
+                "pending": self._queue.qsize(),
+            }
+
+
+_query_logger: Optional[QueryLogger] = None
+_query_logger_lock = threading.Lock()
+
+
+def get_query_logger() -> QueryLogger:
+    """获取进程内共享的数据获取日志记录器，进程退出时写入剩余记录
+
+    Returns:
+        QueryLogger: 按环境变量配置的日志记录器
+    """
+    global _query_logger
+    if _query_logger is not None:
+        return _query_logger
+
+    with _query_logger_lock:
+        if _query_logger is None:
+            _query_logger = QueryLogger(
+                os.getenv("QUERY_LOG_DIR", DEFAULT_LOG_DIR),
+                int(os.getenv("QUERY_LOG_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+                int(os.getenv("QUERY_LOG_BACKUPS", str(DEFAULT_BACKUPS))),
+                int(os.getenv("QUERY_LOG_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE))),
+            )
+            atexit.register(_query_logger.close)
+        return _query_logger
+
+
+def _rotated_files(log_dir: str) -> List[str]:
+    """所有进程的压缩历史文件，按轮转时间排序"""
+    rotated = []
+    for path in glob.glob(os.path.join(log_dir, f"{LOG_NAME}.*.jsonl.gz")):
+        match = _ROTATED_FILE.match(os.path.basename(path))
+        if match:
+            rotated.append((match.group(2), int(match.group(1) or 0), path))
+    return [path for _, _, path in sorted(rotated)]
+
+
+def log_files(log_dir: str = DEFAULT_LOG_DIR) -> List[str]:
+    """列出所有进程的日志文件：压缩的历史文件按轮转时间在前，各进程的当前文件在最后"""
+    current = sorted(
+        path for path in glob.glob(os.path.join(log_dir, f"{LOG_NAME}*.jsonl"))
+        if _CURRENT_FILE.match(os.path.basename(path))
+    )
+    return _rotated_files(log_dir) + current
+
+
+def read_records(paths: Iterable[str]) -> Iterator[Dict]:
+    """逐条读取日志记录，跳过无法解析的行（例如进程中断时写了一半的最后一行）"""
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(records: Iterable[Dict]) -> Dict[str, Dict]:
+    """汇总日志记录
+
+    Args:
+        records: read_records 的结果
+
+    Returns:
+        Dict[str, Dict]: 每个 path 的成功次数、错误次数、耗时分位数（毫秒）、平均行数和
+            CodeAgent 平均步数；
+            "retries" 为每个 (job_id, prompt_hash) 最终成功前的重试次数分布，
+            "final_failures" 为所有重试都失败的次数
+    """
+    durations: Dict[str, List[float]] = {}
+    rows: Dict[str, List[int]] = {}
+    steps: Dict[str, List[int]] = {}
+    errors: Dict[str, int] = {}
+    attempts: Dict[tuple, int] = {}
+    final_failures = 0
+    for record in records:
+        path = record.get("path") or "unknown"
+        key = (record.get("job_id"), record.get("prompt_hash"))
+        if record.get("event") == "error":
+            errors[path] = errors.get(path, 0) + 1
+            if record.get("retry") == -1:
+                final_failures += 1
+            continue
+        durations.setdefault(path, [])
+        if record.get("duration_ms") is not None:
+            durations[path].append(float(record["duration_ms"]))
+        if record.get("rows") is not None:
+            rows.setdefault(path, []).append(int(record["rows"]))
+        if record.get("steps") is not None:
+            steps.setdefault(path, []).append(int(record["steps"]))
+        if path == "agent":
+            attempts[key] = max(attempts.get(key, 0), int(record.get("retry") or 0))
+
+    summary: Dict[str, Dict] = {}
+    for path in sorted(set(durations) | set(errors)):
+        values = sorted(durations.get(path, []))
+        path_rows = rows.get(path, [])
+        path_steps = steps.get(path, [])
+        summary[path] = {
+            "queries": len(durations.get(path, [])),
+            "errors": errors.get(path, 0),
+            "p50_ms": _percentile(values, 0.50),
+            "p95_ms": _percentile(values, 0.95),
+            "p99_ms": _percentile(values, 0.99),
+            "max_ms": values[-1] if values else 0.0,
+            "mean_rows": sum(path_rows) / len(path_rows) if path_rows else 0.0,
+            "mean_steps": sum(path_steps) / len(path_steps) if path_steps else 0.0,
+        }
+    retries: Dict[int, int] = {}
+    for retry in attempts.values():
+        retries[retry] = retries.get(retry, 0) + 1
+    summary["retries"] = dict(sorted(retries.items()))
+    summary["final_failures"] = final_failures
+    return summary
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="汇总数据获取日志的耗时和重试统计")
+    parser.add_argument("log_dir", nargs="?", default=os.getenv("QUERY_LOG_DIR", DEFAULT_LOG_DIR))
+    args = parser.parse_args(argv)
+
+    files = log_files(args.log_dir)
+    if not files:
+        print(f"{args.log_dir} 中没有数据获取日志")
+        return 1
+    summary = summarize(read_records(files))
+    retries = summary.pop("retries")
+    final_failures = summary.pop("final_failures")
+    print(
+        f"{'路径':<10}{'成功':>8}{'错误':>8}{'P50(ms)':>10}{'P95(ms)':>10}"
+        f"{'P99(ms)':>10}{'最大(ms)':>10}{'平均行数':>10}{'平均步数':>10}"
+    )
+    for path, stats in summary.items():
+        print(
+            f"{path:<10}{stats['queries']:>8}{stats['errors']:>8}{stats['p50_ms']:>10.1f}"
+            f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}"
+            f"{stats['mean_rows']:>10.1f}{stats['mean_steps']:>10.1f}"
+        )
+    print(f"CodeAgent 成功前的重试次数分布: {retries}")
+    print(f"所有重试均失败: {final_failures}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""查询难度本地路由模块
+
+根据查询中的关键词和解析出的财务指标，在本地判断查询难度，不调用LLM：
+- 难度等级1：只需要把指定股票/行业、指定期间的财务指标取出来展示，
+  DataFetcherAgent 的结果直接整理成表格返回，跳过 PandasAI 阶段
+- 难度等级2：包含增速、排名、分位数、筛选、作图等计算需求，仍走 PandasAI
+
+判断标准与 QueryJudgeAgent 的难度prompt一致，但偏保守：
+只要出现任何计算、排序、条件筛选类的词语就判为难度2。
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .term_matcher import get_term_matcher
+    from .date_range_extractor import GROWTH_KEYWORDS
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from term_matcher import get_term_matcher
+    from date_range_extractor import GROWTH_KEYWORDS
+
+# 路由名称，记录在任务（jobs.route）上
+ROUTE_DIRECT_TABLE = "direct_table"
+ROUTE_PANDASAI = "pandasai"
+
+# 需要在取数之后做计算、排序、筛选或作图的关键词
+COMPUTE_KEYWORDS = GROWTH_KEYWORDS + (
+    "增长", "下降", "变化", "变动", "趋势", "波动", "复合", "CAGR",
+    "单季度", "单季", "分位", "排名", "排行", "排序", "百分比", "%", "％",
+    "占比", "比重", "平均", "均值", "中位数", "合计", "总和", "求和", "汇总",
+    "最大", "最小", "最高", "最低", "前十", "前五", "前三", "前几", "top", "TOP",
+    "大于", "小于", "超过", "高于", "低于", "不低于", "不高于", "以上", "以下",
+    "对比", "比较", "相关", "标准差", "方差", "差值", "差额", "倍",
+    "图", "画", "绘制", "可视化", "分析", "计算", "预测", "为什么", "原因",
+)
+
+_COMPUTE_PATTERN = re.compile(
+    "|".join(re.escape(w) for w in sorted(COMPUTE_KEYWORDS, key=len, reverse=True))
+)
+# 前N名、后N名之类的写法
+_TOP_N_PATTERN = re.compile(r"[前后]\s*\d+\s*[名位家只个]")
+
+# 尚未观测到 PandasAI 阶段耗时时使用的默认估计值（秒）
+DEFAULT_PANDASAI_SECONDS = float(os.getenv("PANDASAI_DEFAULT_SECONDS", "20"))
+
+
+class QueryRoute(NamedTuple):
+    """一次路由判断的结果"""
+    difficulty: int
+    route: str
+    reason: str
+
+
+def judge_query_difficulty_locally(
+    user_query: str, parsed_info: Optional[Dict] = None
+) -> QueryRoute:
+    """在本地判断查询难度并给出路由
+
+    财务指标本身的名称（如"营业收入同比增长率"是数据库中已有的列）不计入
+    关键词判断，避免把直接取数的查询误判为需要计算。
+
+    Args:
+        user_query: 用户原始查询
+        parsed_info: QueryParserAgent 的解析结果（"解析结果"字段的内容）
+
+    Returns:
+        QueryRoute: 难度等级（1或2）、路由名称和判断理由
+    """
+    indicators = (parsed_info or {}).get("需要从sql抽取的财务指标") or []
+    if not indicators:
+        return QueryRoute(2, ROUTE_PANDASAI, "未解析出需要抽取的财务指标")
+
+    # 去掉已匹配为财务术语的片段后再检查关键词
+    masked = list(user_query)
+    for match in get_term_matcher().extract(user_query).matches:
+        for index in range(match.start, match.end):
+            masked[index] = " "
+    remaining = "".join(masked)
+
+    match = _COMPUTE_PATTERN.search(remaining) or _TOP_N_PATTERN.search(remaining)
+    if match:
+        return QueryRoute(
+            2, ROUTE_PANDASAI, f"查询包含计算或筛选需求: {match.group(0)}"
+        )
+    return QueryRoute(1, ROUTE_DIRECT_TABLE, "仅需抽取并展示财务指标")
+
+
+def format_direct_table(dataframe, sort_columns: Optional[List[str]] = None):
+    """把 DataFetcherAgent 的取数结果整理为直接返回给用户的表格
+
+    去掉重复列，并按股票、报告日排序，便于阅读。
+
+    Args:
+        dataframe: DataFetcherAgent 返回的 DataFrame
+        sort_columns: 排序列，默认为 股票代码、报告日 中存在的列
+
+    Returns:
+        pd.DataFrame: 整理后的表格
+    """
+    table = dataframe.loc[:, ~dataframe.columns.duplicated()]
+    if sort_columns is None:
+        sort_columns = [
+            column for column in ("股票代码", "报告日") if column in table.columns
+        ]
+    if sort_columns:
+        table = table.sort_values(sort_columns, kind="stable")
+    return table.reset_index(drop=True)
+
+
+class RouteStats:
+    """进程内的路由统计，用 PandasAI 阶段的实际耗时估算直接返回节省的时间"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.direct_routes = 0
+        self.pandasai_routes = 0
+        self.pandasai_seconds = 0.0
+
+    def record_pandasai(self, seconds: float) -> None:
+        """记录一次 PandasAI 阶段的耗时"""
+        with self._lock:
+            self.pandasai_routes += 1
+            self.pandasai_seconds += seconds
+
+    def record_direct(self) -> None:
+        """记录一次直接返回表格"""
+        with self._lock:
+            self.direct_routes += 1
+
+    def estimated_pandasai_seconds(self) -> float:
+        """PandasAI 阶段的平均耗时，没有样本时使用默认估计值"""
+        with self._lock:
+            if not self.pandasai_routes:
+                return DEFAULT_PANDASAI_SECONDS
+            return self.pandasai_seconds / self.pandasai_routes
+
+    def latency_saved_ms(self, direct_seconds: float) -> int:
+        """估算一次直接返回相比走 PandasAI 节省的毫秒数
+
+        Args:
+            direct_seconds: 直接整理表格实际花费的时间（秒）
+
+        Returns:
+            int: 节省的毫秒数，不小于0
+        """
+        saved = self.estimated_pandasai_seconds() - direct_seconds
+        return max(0, int(saved * 1000))
+
+
+# 进程内共享的路由统计
+route_stats = RouteStats()
@@ -0,0 +1,431 @@
+"""SQL查询结果缓存模块
+
+Astock_financial_data.db 是静态数据，相同的SQL没有必要反复执行 pd.read_sql_query。
+缓存键为 规范化后的SQL + 参数 + 数据版本标识（financial_db.get_data_stamp），分两级：
+1、进程内LRU：按DataFrame占用的字节数限制容量，命中时直接返回副本
+2、共享层：以 Arrow IPC 格式保存在 Redis 或本地磁盘上，多个worker节点共享，
+   反序列化几乎不需要拷贝（磁盘文件通过内存映射读取）
+
+数据库刷新后数据版本标识变化，进程内缓存整体清空，共享层中旧版本的结果不会再被读到
+（Redis 中的键带有过期时间，磁盘上旧版本的目录被删除，进程启动后第一次使用缓存时
+也会删除上次运行留下的旧版本目录）。
+
+环境变量：
+- SQL_CACHE_MAX_BYTES：进程内LRU的容量（字节），默认256MB，0表示关闭
+- SQL_CACHE_SHARED：共享层后端，redis / disk / none，默认 none
+- SQL_CACHE_DIR：磁盘共享层目录，默认 <项目根目录>/output/cache/sql
+- SQL_CACHE_TTL：Redis 中缓存结果的过期时间（秒），默认7天
+- REDIS_HOST / REDIS_PORT / REDIS_DB / REDIS_PASSWORD：Redis 连接配置
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence
+
+import pandas as pd
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import ROOT_DIR, get_data_stamp
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import ROOT_DIR, get_data_stamp
+
+try:
+    import pyarrow as pa
+except ImportError:  # 共享层依赖 pyarrow，未安装时只使用进程内缓存
+    pa = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_SHARED_TTL = 7 * 24 * 3600
+DEFAULT_CACHE_DIR = os.path.join(ROOT_DIR, "output/cache/sql")
+REDIS_KEY_PREFIX = "talk2data:sql:"
+
+_WHITESPACE = re.compile(r"\s+")
+# 字符串字面量和带引号的标识符中的空白不能合并
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def normalize_sql(sql: str) -> str:
+    """规范化SQL文本：合并引号外的空白、去掉首尾空白和结尾分号
+
+    Args:
+        sql: 原始SQL
+
+    Returns:
+        str: 规范化后的SQL
+    """
+    parts = _QUOTED.split(sql.strip().rstrip(";").strip())
+    return "".join(
+        part if index % 2 else _WHITESPACE.sub(" ", part)
+        for index, part in enumerate(parts)
+    )
+
+
+def make_cache_key(sql: str, params: Optional[Sequence], data_stamp: str) -> str:
+    """生成缓存键
+
+    Args:
+        sql: SQL语句
+        params: 查询参数
+        data_stamp: 数据版本标识
+
+    Returns:
+        str: 十六进制摘要
+    """
+    payload = "\x1f".join(
+        (data_stamp, normalize_sql(sql), repr(tuple(params or ())))
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def dataframe_nbytes(df: pd.DataFrame) -> int:
+    """DataFrame占用的内存字节数（包括object列中的字符串）"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class LocalResultCache:
+    """按字节数限制容量的进程内LRU缓存"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_bytes: 缓存的DataFrame总字节数上限，0表示不缓存
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """读取缓存，命中时把条目移到最近使用的位置"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, df: pd.DataFrame) -> int:
+        """写入缓存
+
+        Args:
+            key: 缓存键
+            df: 查询结果
+
+        Returns:
+            int: 因容量不足被淘汰的条目数
+        """
+        nbytes = dataframe_nbytes(df)
+        if nbytes > self.max_bytes:
+            return 0
+        evicted = 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            while self._entries and self.current_bytes + nbytes > self.max_bytes:
+                _, (_, size) = self._entries.popitem(last=False)
+                self.current_bytes -= size
+                evicted += 1
+            self._entries[key] = (df, nbytes)
+            self.current_bytes += nbytes
+        return evicted
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+def dataframe_to_ipc(df: pd.DataFrame) -> bytes:
+    """把DataFrame序列化为 Arrow IPC stream 字节串"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_to_dataframe(source) -> pd.DataFrame:
+    """从 Arrow IPC stream（字节串或内存映射文件）还原DataFrame"""
+    return pa.ipc.open_stream(source).read_all().to_pandas()
+
+
+class RedisArrowStore:
+    """以 Arrow IPC 格式把查询结果保存在 Redis 中，多个worker节点共享"""
+
+    def __init__(self, client, ttl: int = DEFAULT_SHARED_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    def get(self, key: str, data_stamp: str) -> Optional[pd.DataFrame]:
+        payload = self.client.get(REDIS_KEY_PREFIX + key)
+        if payload is None:
+            return None
+        return ipc_to_dataframe(pa.py_buffer(payload))
+
+    def put(self, key: str, data_stamp: str, df: pd.DataFrame) -> None:
+        # 缓存键中已包含数据版本，旧版本的结果依靠过期时间清理
+        self.client.set(REDIS_KEY_PREFIX + key, dataframe_to_ipc(df), ex=self.ttl)
+
+    def invalidate(self, data_stamp: str) -> None:
+        pass
+
+
+class DiskArrowStore:
+    """以 Arrow IPC 文件把查询结果保存在本地（或共享）磁盘上，读取时内存映射"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _version_dir(self, data_stamp: str) -> str:
+        digest = hashlib.sha256(data_stamp.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, digest)
+
+    def get(self, key: str, data_stamp: str) -> Optional[pd.DataFrame]:
+        path = os.path.join(self._version_dir(data_stamp), f"{key}.arrow")
+        try:
+            with pa.memory_map(path, "r") as source:
+                return ipc_to_dataframe(source)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data_stamp: str, df: pd.DataFrame) -> None:
+        version_dir = self._version_dir(data_stamp)
+        os.makedirs(version_dir, exist_ok=True)
+        path = os.path.join(version_dir, f"{key}.arrow")
+        # 先写临时文件再改名，其他进程不会读到写了一半的文件
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(dataframe_to_ipc(df))
+        os.replace(tmp_path, path)
+
+    def invalidate(self, data_stamp: str) -> None:
+        """删除除当前数据版本以外的全部缓存目录"""
+        current = os.path.basename(self._version_dir(data_stamp))
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name != current:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+
+def _create_shared_store():
+    """按 SQL_CACHE_SHARED 创建共享层，依赖缺失或连接失败时返回None"""
+    backend = os.getenv("SQL_CACHE_SHARED", "none").lower()
+    if backend in ("", "none"):
+        return None
+    if pa is None:
+        print("未安装 pyarrow，SQL结果缓存只使用进程内缓存")
+        return None
+    if backend == "disk":
+        return DiskArrowStore(os.getenv("SQL_CACHE_DIR", DEFAULT_CACHE_DIR))
+    if backend == "redis":
+        if redis is None:
+            print("未安装 redis，SQL结果缓存只使用进程内缓存")
+            return None
+        try:
+            client = redis.Redis(
+                host=os.getenv("REDIS_HOST", "localhost"),
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                db=int(os.getenv("REDIS_DB", "0")),
+                password=os.getenv("REDIS_PASSWORD") or None,
+            )
+            client.ping()
+        except Exception as e:
+            print(f"连接Redis失败，SQL结果缓存只使用进程内缓存: {str(e)}")
+            return None
+        ttl = int(os.getenv("SQL_CACHE_TTL", str(DEFAULT_SHARED_TTL)))
+        return RedisArrowStore(client, ttl)
+    print(f"未知的SQL结果缓存共享层: {backend}")
+    return None
+
+
+class SqlResultCache:
+    """两级SQL结果缓存"""
+
+    def __init__(self, local: LocalResultCache, shared=None):
+        """
+        Args:
+            local: 进程内LRU缓存
+            shared: 共享层（RedisArrowStore / DiskArrowStore），为None时只使用进程内缓存
+        """
+        self.local = local
+        self.shared = shared
+        self._data_stamp: Optional[str] = None
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.shared_errors = 0
+
+    def _current_stamp(self) -> str:
+        """返回当前数据版本标识，版本变化时使缓存失效"""
+        data_stamp = get_data_stamp()
+        if data_stamp != self._data_stamp:
+            with self._lock:
+                if data_stamp != self._data_stamp:
+                    if self._data_stamp is not None:
+                        self._invalidate(data_stamp)
+                    else:
+                        # 进程启动后第一次使用：清理上次运行时留下的旧版本结果
+                        self._prune_shared(data_stamp)
+                    self._data_stamp = data_stamp
+        return data_stamp
+
+    def _invalidate(self, data_stamp: str) -> None:
+        self.local.clear()
+        self.invalidations += 1
+        self._prune_shared(data_stamp)
+
+    def _prune_shared(self, data_stamp: str) -> None:
+        """删除共享层中不属于当前数据版本的结果（调用方持有锁）"""
+        if self.shared is None:
+            return
+        try:
+            self.shared.invalidate(data_stamp)
+        except Exception as e:
+            self.shared_errors += 1
+            print(f"清理共享SQL结果缓存失败: {str(e)}")
+
+    def invalidate(self) -> None:
+        """数据库刷新后手动清空缓存"""
+        with self._lock:
+            self._invalidate(get_data_stamp())
+
+    def _record(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def read_sql(
+        self,
+        sql: str,
+        con,
+        params: Optional[Sequence] = None,
+        runner: Optional[Callable[..., pd.DataFrame]] = None,
+    ) -> pd.DataFrame:
+        """带缓存地执行 pd.read_sql_query
+
+        返回的DataFrame是缓存内容的副本，调用方可以随意修改。
+
+        Args:
+            sql: SQL查询语句
+            con: 数据库连接或SQLAlchemy engine
+            params: 查询参数
+            runner: 未命中时执行查询的函数，默认 pd.read_sql_query
+
+        Returns:
+            pd.DataFrame: 查询结果
+        """
+        df = self.get(sql, params)
+        if df is not None:
+            return df
+        runner = runner or pd.read_sql_query
+        df = runner(sql, con, params=params)
+        self.put(sql, params, df)
+        return df.copy()
+
+    def get(self, sql: str, params: Optional[Sequence] = None) -> Optional[pd.DataFrame]:
+        """只查缓存，未命中时记录一次miss并返回None
+
+        Returns:
+            Optional[pd.DataFrame]: 缓存内容的副本
+        """
+        data_stamp = self._current_stamp()
+        key = make_cache_key(sql, params, data_stamp)
+
+        df = self.local.get(key)
+        if df is not None:
+            self._record("local_hits")
+            return df.copy()
+
+        if self.shared is not None:
+            try:
+                df = self.shared.get(key, data_stamp)
+            except Exception as e:
+                self._record("shared_errors")
+                print(f"读取共享SQL结果缓存失败: {str(e)}")
+                df = None
+            if df is not None:
+                self._record("shared_hits")
+                self._record("evictions", self.local.put(key, df))
+                return df.copy()
+
+        self._record("misses")
+        return None
+
+    def put(self, sql: str, params: Optional[Sequence], df: pd.DataFrame) -> None:
+        """把查询结果写入两级缓存"""
+        data_stamp = self._current_stamp()
+        key = make_cache_key(sql, params, data_stamp)
+        self._record("evictions", self.local.put(key, df))
+        if self.shared is not None:
+            try:
+                self.shared.put(key, data_stamp, df)
+            except Exception as e:
+                self._record("shared_errors")
+                print(f"写入共享SQL结果缓存失败: {str(e)}")
+
+    def snapshot(self) -> Dict[str, float]:
+        """返回当前统计值
+
+        Returns:
+            Dict[str, float]: 两级命中次数、未命中次数、淘汰次数、失效次数和命中率
+        """
+        with self._lock:
+            total = self.local_hits + self.shared_hits + self.misses
+            return {
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "shared_errors": self.shared_errors,
+                "hit_rate": (
+                    (self.local_hits + self.shared_hits) / total if total else 0.0
+                ),
+                "local_entries": len(self.local),
+                "local_bytes": self.local.current_bytes,
+            }
+
+
+_sql_cache: Optional[SqlResultCache] = None
+_sql_cache_lock = threading.Lock()
+
+
+def get_sql_cache() -> SqlResultCache:
+    """获取进程内共享的SQL结果缓存
+
+    Returns:
+        SqlResultCache: 按环境变量配置的两级缓存
+    """
+    global _sql_cache
+    if _sql_cache is not None:
+        return _sql_cache
+
+    with _sql_cache_lock:
+        if _sql_cache is None:
+            max_bytes = int(os.getenv("SQL_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+            _sql_cache = SqlResultCache(
+                LocalResultCache(max_bytes), _create_shared_store()
+            )
+        return _sql_cache
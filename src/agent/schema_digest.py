@@ -0,0 +1,234 @@
+"""财务数据库表结构摘要模块
+
+DatabaseTools.get_table_info 原先每次调用都用 SQLAlchemy inspector 遍历全部表和列，
+返回几百列的完整表结构，既耗时又占用大量发送给LLM的token。
+
+本模块为每个数据版本计算一次表结构摘要并缓存在磁盘上（worker重启后直接读取）：
+- 每张表的列名和类型、行数
+- 关键列（股票代码、股票名称、申万行业等）的不同取值个数
+- 报告日的最小值和最大值
+
+输出时可以按需要的财务指标过滤，只保留关键列和与指标相关的列。
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import FINANCIAL_TABLES, ROOT_DIR, connect_readonly, get_data_stamp
+    from .sql_compiler import quote_identifier
+    from .term_index import get_term_index
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import FINANCIAL_TABLES, ROOT_DIR, connect_readonly, get_data_stamp
+    from sql_compiler import quote_identifier
+    from term_index import get_term_index
+
+# 统计不同取值个数、并且总是输出的关键列
+KEY_COLUMNS = ("股票代码", "股票名称", "报告日", "申万一级", "申万二级")
+REPORT_DATE_COLUMN = "报告日"
+SCHEMA_DIGEST_PATH = os.getenv(
+    "SCHEMA_DIGEST_PATH", os.path.join(ROOT_DIR, "output/cache/schema_digest.json")
+)
+
+# 指标写法中的 "来自:表名" 后缀和分隔符
+_TABLE_SUFFIX = re.compile(r"来自:\w+$")
+_INDICATOR_SEPARATORS = re.compile(r"[,，、;；\n]+")
+
+
+class SchemaDigest:
+    """某个数据版本下的表结构摘要"""
+
+    __slots__ = ("data_stamp", "tables")
+
+    def __init__(self, data_stamp: str, tables: Dict[str, Dict]):
+        """
+        Args:
+            data_stamp: 数据版本标识
+            tables: 表名 -> {"row_count", "columns": [[列名, 类型], ...],
+                "distinct_counts": {关键列: 个数}, "report_date_range": [最小, 最大]}
+        """
+        self.data_stamp = data_stamp
+        self.tables = tables
+
+    def to_dict(self) -> Dict:
+        return {"data_stamp": self.data_stamp, "tables": self.tables}
+
+    def relevant_columns(self, table: str, indicators: Iterable[str]) -> List[List[str]]:
+        """表中与指标相关的列
+
+        指标先通过别名映射为标准名，列名与标准名相同或包含标准名时视为相关
+        （例如 营业收入 -> 营业收入、营业收入同比增长率）。
+        """
+        term_index = get_term_index()
+        terms = set()
+        for indicator in indicators:
+            indicator = _TABLE_SUFFIX.sub("", indicator.strip())
+            if indicator:
+                terms.add(term_index.aliases.get(indicator, indicator))
+        return [
+            column for column in self.tables[table]["columns"]
+            if column[0] not in KEY_COLUMNS
+            and any(term in column[0] for term in terms)
+        ]
+
+    def format(self, indicators: Optional[Iterable[str]] = None) -> str:
+        """输出给LLM的表结构说明
+
+        Args:
+            indicators: 需要的财务指标；为空时输出全部列
+
+        Returns:
+            str: 格式化的表结构信息
+        """
+        indicators = [i for i in (indicators or []) if i and i.strip()]
+        table_info = []
+        for table_name, table in self.tables.items():
+            key_columns = [c for c in table["columns"] if c[0] in KEY_COLUMNS]
+            if indicators:
+                other_columns = self.relevant_columns(table_name, indicators)
+                if not other_columns:
+                    continue
+            else:
+                other_columns = [c for c in table["columns"] if c[0] not in KEY_COLUMNS]
+
+            date_range = table.get("report_date_range") or [None, None]
+            table_info.append(f"\n表名: {table_name}")
+            table_info.append(
+                f"行数: {table['row_count']}, 报告日范围: {date_range[0]} ~ {date_range[1]}"
+            )
+            table_info.append("关键列:")
+            for name, col_type in key_columns:
+                distinct = table["distinct_counts"].get(name)
+                suffix = f" ({distinct}个不同取值)" if distinct is not None else ""
+                table_info.append(f"  - {name}: {col_type}{suffix}")
+            table_info.append("列信息:" if not indicators else "相关列:")
+            for name, col_type in other_columns:
+                table_info.append(f"  - {name}: {col_type}")
+
+        if indicators and not table_info:
+            return (
+                f"没有找到与 {','.join(indicators)} 相关的列，"
+                f"可不传入指标查看全部表结构"
+            )
+        return "\n".join(table_info)
+
+
+def build_schema_digest(conn: sqlite3.Connection, data_stamp: str) -> SchemaDigest:
+    """从数据库读取表结构并统计行数、关键列取值个数和报告日范围
+
+    Args:
+        conn: 数据库连接
+        data_stamp: 数据版本标识
+
+    Returns:
+        SchemaDigest: 表结构摘要
+    """
+    tables = {}
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    for table in FINANCIAL_TABLES:
+        if table not in existing:
+            continue
+        quoted_table = quote_identifier(table)
+        columns = [
+            [row[1], row[2] or ""]
+            for row in conn.execute(f"PRAGMA table_info({quoted_table})")
+        ]
+        names = {name for name, _ in columns}
+        key_columns = [c for c in KEY_COLUMNS if c in names and c != REPORT_DATE_COLUMN]
+
+        select_items = ["COUNT(*)"]
+        select_items += [f"COUNT(DISTINCT {quote_identifier(c)})" for c in key_columns]
+        if REPORT_DATE_COLUMN in names:
+            quoted_date = quote_identifier(REPORT_DATE_COLUMN)
+            select_items += [
+                f"COUNT(DISTINCT {quoted_date})", f"MIN({quoted_date})", f"MAX({quoted_date})"
+            ]
+        row = conn.execute(f"SELECT {', '.join(select_items)} FROM {quoted_table}").fetchone()
+
+        distinct_counts = dict(zip(key_columns, row[1:1 + len(key_columns)]))
+        report_date_range = None
+        if REPORT_DATE_COLUMN in names:
+            distinct_counts[REPORT_DATE_COLUMN] = row[-3]
+            report_date_range = [row[-2], row[-1]]
+        tables[table] = {
+            "row_count": row[0],
+            "columns": columns,
+            "distinct_counts": distinct_counts,
+            "report_date_range": report_date_range,
+        }
+    return SchemaDigest(data_stamp, tables)
+
+
+def _load_cached_digest(data_stamp: str) -> Optional[SchemaDigest]:
+    """读取磁盘上的摘要，数据版本不一致或摘要中没有表时返回None"""
+    try:
+        with open(SCHEMA_DIGEST_PATH, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("data_stamp") != data_stamp or not cached.get("tables"):
+        return None
+    return SchemaDigest(data_stamp, cached["tables"])
+
+
+def _save_cached_digest(digest: SchemaDigest) -> None:
+    """把摘要写入磁盘缓存，写入失败只影响下次启动"""
+    try:
+        os.makedirs(os.path.dirname(SCHEMA_DIGEST_PATH), exist_ok=True)
+        tmp_path = f"{SCHEMA_DIGEST_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(digest.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, SCHEMA_DIGEST_PATH)
+    except OSError as e:
+        print(f"保存表结构摘要失败: {str(e)}")
+
+
+def split_indicators(indicators: Optional[str]) -> List[str]:
+    """拆分逗号、顿号等分隔的指标列表"""
+    return [i.strip() for i in _INDICATOR_SEPARATORS.split(indicators or "") if i.strip()]
+
+
+_schema_digest: Optional[SchemaDigest] = None
+_schema_digest_lock = threading.Lock()
+
+
+def get_schema_digest() -> SchemaDigest:
+    """获取当前数据版本的表结构摘要，优先使用进程内和磁盘上的缓存
+
+    Returns:
+        SchemaDigest: 表结构摘要；数据库不可用时为空摘要。空摘要不写入磁盘也不在
+            进程内缓存，数据库就绪后的下一次调用重新读取
+    """
+    global _schema_digest
+    data_stamp = get_data_stamp()
+    digest = _schema_digest
+    if digest is not None and digest.data_stamp == data_stamp:
+        return digest
+
+    with _schema_digest_lock:
+        if _schema_digest is None or _schema_digest.data_stamp != data_stamp:
+            digest = _load_cached_digest(data_stamp)
+            if digest is None:
+                try:
+                    conn = connect_readonly()
+                    try:
+                        digest = build_schema_digest(conn, data_stamp)
+                    finally:
+                        conn.close()
+                except sqlite3.Error as e:
+                    print(f"读取财务数据库表结构失败: {str(e)}")
+                    digest = SchemaDigest(data_stamp, {})
+                if not digest.tables:
+                    return digest
+                _save_cached_digest(digest)
+            _schema_digest = digest
+        return _schema_digest
@@ -0,0 +1,418 @@
+"""解析结果 -> SQL 确定性编译模块
+
+QueryParserAgent 的解析结果已经包含生成SQL所需的全部信息：
+- 需要从sql抽取的财务指标: ["营业收入来自:income_table", ...]
+- 报告日区间: "YYYYMMDD-YYYYMMDD"
+- 筛选的股票名称 / 行业名称
+
+本模块把它直接编译为参数化SQL，不经过LLM：
+1、输出 股票代码、股票名称、报告日、申万一级 四个基础列和全部指标列
+2、指标分布在多张表时，以第一个指标所在的表为主表，其余表按 (股票代码, 报告日) LEFT JOIN
+3、报告日区间编译为范围条件，申万行业编译为等值（IN）条件；股票名称解析为股票代码，
+   按股票代码筛选，一家公司改名前的报告期也能查到
+
+无法确定编译结果正确时抛出 SqlCompileError，由调用方回退到 CodeAgent 生成SQL。
+"""
+
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .term_index import FinancialTermIndex, get_term_index
+    from .stock_resolver import get_stock_resolver
+    from .industry_resolver import get_industry_resolver
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from term_index import FinancialTermIndex, get_term_index
+    from stock_resolver import get_stock_resolver
+    from industry_resolver import get_industry_resolver
+
+# 输出的基础列
+BASE_COLUMNS = ("股票代码", "股票名称", "报告日", "申万一级")
+# 多表连接键
+JOIN_KEYS = ("股票代码", "报告日")
+
+_INDICATOR_PATTERN = re.compile(r"^(.+?)来自:(\w+)$")
+_DATE_RANGE_PATTERN = re.compile(r"^(\d{8})-(\d{8})$")
+_NAME_SEPARATORS = re.compile(r"[,，、;；/\s]+")
+
+
+class SqlCompileError(ValueError):
+    """解析结果无法编译为SQL"""
+
+
+class CompiledQuery(NamedTuple):
+    """编译结果
+
+    除SQL外还保留结构化的查询条件，供结果缓存、按表并行抽取等使用。
+    """
+    sql: str
+    params: Tuple
+    base_table: str
+    table_columns: Dict[str, Tuple[str, ...]]
+    date_range: Optional[Tuple[str, str]]
+    stock_names: Tuple[str, ...]
+    industry_filters: Dict[str, Tuple[str, ...]]
+    # stock_names 对应的股票代码；股票索引不可用时为空，按股票名称筛选
+    stock_codes: Tuple[str, ...] = ()
+
+    @property
+    def indicator_columns(self) -> Tuple[str, ...]:
+        """按输出顺序排列的指标列"""
+        return tuple(
+            column
+            for columns in self.table_columns.values()
+            for column in columns
+        )
+
+    @property
+    def output_columns(self) -> Tuple[str, ...]:
+        """结果DataFrame的列"""
+        return BASE_COLUMNS + self.indicator_columns
+
+
+def quote_identifier(name: str) -> str:
+    """用双引号括起SQL标识符（中文列名中可能包含括号、顿号等字符）"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _parse_indicators(
+    indicators: List[str], term_index: FinancialTermIndex
+) -> Dict[str, Tuple[str, ...]]:
+    """把 "指标来自:表名" 列表按表分组，并校验列确实存在于该表"""
+    if not indicators:
+        raise SqlCompileError("没有需要抽取的财务指标")
+
+    table_columns: Dict[str, List[str]] = {}
+    seen = set(BASE_COLUMNS)
+    for indicator in indicators:
+        match = _INDICATOR_PATTERN.match(str(indicator).strip())
+        if not match:
+            raise SqlCompileError(f"无法识别的指标格式: {indicator}")
+        column, table = match.group(1).strip(), match.group(2)
+        if table not in term_index.table_columns:
+            raise SqlCompileError(f"未知的数据表: {table}")
+        if table not in term_index.column_lookup.tables_for(column):
+            raise SqlCompileError(f"{table} 中没有列: {column}")
+        if column in seen:
+            continue
+        seen.add(column)
+        table_columns.setdefault(table, []).append(column)
+
+    return {table: tuple(columns) for table, columns in table_columns.items()}
+
+
+def _parse_date_range(date_range: str) -> Optional[Tuple[str, str]]:
+    """解析 "YYYYMMDD-YYYYMMDD"，为空时表示不限制报告日"""
+    date_range = (date_range or "").strip()
+    if not date_range:
+        return None
+    match = _DATE_RANGE_PATTERN.match(date_range)
+    if not match:
+        raise SqlCompileError(f"无法识别的报告日区间: {date_range}")
+    start, end = match.groups()
+    return (start, end) if start <= end else (end, start)
+
+
+def _parse_stock_names(stock_names: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """拆分股票名称并解析为股票代码，名称不在股票索引中时无法确定正确的筛选条件
+
+    Returns:
+        Tuple[Tuple[str, ...], Tuple[str, ...]]: (股票名称, 去重后的股票代码)
+    """
+    names = tuple(
+        name for name in _NAME_SEPARATORS.split(stock_names or "") if name
+    )
+    resolver = get_stock_resolver()
+    # 股票索引不可用（数据库缺失）时无法校验，按原样筛选股票名称
+    if not len(resolver):
+        return names, ()
+    codes: List[str] = []
+    for name in names:
+        entity = resolver.resolve(name)
+        if entity is None or entity.name != name:
+            raise SqlCompileError(f"股票名称不是数据库中的标准名称: {name}")
+        if entity.code not in codes:
+            codes.append(entity.code)
+    return names, tuple(codes)
+
+
+def _parse_industry_filters(parsed_info: Dict) -> Dict[str, Tuple[str, ...]]:
+    """确定申万行业筛选条件，优先使用 DataFetcherAgent 已给出的 行业筛选条件"""
+    filters = parsed_info.get("行业筛选条件")
+    industry_names = str(parsed_info.get("行业名称") or "")
+    if industry_names:
+        resolver = get_industry_resolver()
+        # 只要有一个行业无法识别，生成的筛选条件就会漏掉数据
+        _, unresolved = resolver.canonicalize_names(industry_names)
+        if unresolved:
+            raise SqlCompileError(f"无法识别的行业名称: {unresolved}")
+        if not filters:
+            filters = resolver.industry_filters(industry_names)
+        if not filters:
+            raise SqlCompileError(f"行业名称没有对应的申万分类: {industry_names}")
+    return {
+        column: tuple(values) for column, values in (filters or {}).items()
+        if values
+    }
+
+
+def compile_parsed_query(
+    parsed_info: Dict, term_index: Optional[FinancialTermIndex] = None
+) -> CompiledQuery:
+    """把解析结果编译为参数化SQL
+
+    Args:
+        parsed_info: QueryParserAgent 输出中 "解析结果" 字段的内容
+        term_index: 术语索引，默认使用进程内共享的索引
+
+    Returns:
+        CompiledQuery: SQL、参数和结构化的查询条件
+
+    Raises:
+        SqlCompileError: 指标、日期、股票或行业无法确定时抛出
+    """
+    term_index = term_index or get_term_index()
+    table_columns = _parse_indicators(
+        parsed_info.get("需要从sql抽取的财务指标") or [], term_index
+    )
+    date_range = _parse_date_range(parsed_info.get("报告日区间", ""))
+    stock_names, stock_codes = _parse_stock_names(parsed_info.get("筛选的股票名称", ""))
+    industry_filters = _parse_industry_filters(parsed_info)
+
+    compiled = CompiledQuery(
+        sql="",
+        params=(),
+        base_table=next(iter(table_columns)),
+        table_columns=table_columns,
+        date_range=date_range,
+        stock_names=stock_names,
+        industry_filters=industry_filters,
+        stock_codes=stock_codes,
+    )
+    sql, params = render_sql(compiled)
+    return compiled._replace(sql=sql, params=params)
+
+
+def render_sql(
+    compiled: CompiledQuery, year_partition_column: Optional[str] = None
+) -> Tuple[str, Tuple]:
+    """根据结构化的查询条件生成SQL和参数
+
+    Args:
+        compiled: 编译结果（只使用其中的结构化条件）
+        year_partition_column: 按报告年份分区存储时的分区列名；给出且有报告日区间时，
+            为每张表增加分区列上的范围条件，列式引擎据此跳过无关的分区
+
+    Returns:
+        Tuple[str, Tuple]: SQL和按出现顺序排列的参数
+    """
+    tables = list(compiled.table_columns)
+    aliases = {table: f"t{index}" for index, table in enumerate(tables)}
+    year_range: Tuple = ()
+    if year_partition_column and compiled.date_range:
+        year_range = tuple(int(date[:4]) for date in compiled.date_range)
+
+    select_items = [
+        f"t0.{quote_identifier(column)}" for column in BASE_COLUMNS
+    ]
+    for table, columns in compiled.table_columns.items():
+        select_items.extend(
+            f"{aliases[table]}.{quote_identifier(column)}" for column in columns
+        )
+
+    # 参数按在SQL中出现的顺序排列：JOIN 的 ON 条件在 WHERE 之前
+    params: List = []
+    from_clause = [f"FROM {quote_identifier(compiled.base_table)} AS t0"]
+    for table in tables[1:]:
+        alias = aliases[table]
+        conditions = [
+            f"{alias}.{quote_identifier(key)} = t0.{quote_identifier(key)}"
+            for key in JOIN_KEYS
+        ]
+        if year_range:
+            conditions.append(
+                f"{alias}.{quote_identifier(year_partition_column)} BETWEEN ? AND ?"
+            )
+            params.extend(year_range)
+        from_clause.append(
+            f"LEFT JOIN {quote_identifier(table)} AS {alias} ON {' AND '.join(conditions)}"
+        )
+
+    where_clause, where_params = _where_conditions(compiled, year_range, year_partition_column)
+    params.extend(where_params)
+
+    return _assemble_sql(select_items, from_clause, where_clause), tuple(params)
+
+
+def render_wide_sql(
+    compiled: CompiledQuery,
+    wide_table: str,
+    column_map: Dict[str, Dict[str, str]],
+    presence_column: str,
+) -> Tuple[str, Tuple]:
+    """在预先按 (股票代码, 报告日) 连接好的宽表上生成单表SQL
+
+    宽表包含各表全部 (股票代码, 报告日) 的并集，presence_column 标记主表中存在的行，
+    按它筛选后结果与 render_sql 的多表 LEFT JOIN 相同。
+
+    Args:
+        compiled: 编译结果（只使用其中的结构化条件）
+        wide_table: 宽表名称
+        column_map: 表名 -> {原列名: 宽表中的列名}，必须覆盖全部指标列
+        presence_column: 主表行存在标记列
+
+    Returns:
+        Tuple[str, Tuple]: SQL和按出现顺序排列的参数
+    """
+    select_items = [f"t0.{quote_identifier(column)}" for column in BASE_COLUMNS]
+    for table, columns in compiled.table_columns.items():
+        for column in columns:
+            wide_column = column_map[table][column]
+            item = f"t0.{quote_identifier(wide_column)}"
+            if wide_column != column:
+                item += f" AS {quote_identifier(column)}"
+            select_items.append(item)
+
+    from_clause = [f"FROM {quote_identifier(wide_table)} AS t0"]
+    where_clause, params = _where_conditions(compiled)
+    where_clause.insert(0, f"t0.{quote_identifier(presence_column)} = 1")
+    return _assemble_sql(select_items, from_clause, where_clause), tuple(params)
+
+
+def render_table_sql(compiled: CompiledQuery, table: str) -> Tuple[str, Tuple]:
+    """只查询一张表的SQL，供按表并行抽取后再按 (股票代码, 报告日) 合并
+
+    主表输出基础列，其余表只输出连接键；各表都使用相同的报告日、股票和行业条件
+    （同一 (股票代码, 报告日) 在四张表中的申万行业相同）。
+
+    Args:
+        compiled: 编译结果（只使用其中的结构化条件）
+        table: compiled.table_columns 中的一张表
+
+    Returns:
+        Tuple[str, Tuple]: 按 (股票代码, 报告日) 排序的SQL和参数
+    """
+    key_columns = BASE_COLUMNS if table == compiled.base_table else JOIN_KEYS
+    select_items = [
+        f"t0.{quote_identifier(column)}"
+        for column in key_columns + compiled.table_columns[table]
+    ]
+    from_clause = [f"FROM {quote_identifier(table)} AS t0"]
+    where_clause, params = _where_conditions(compiled)
+    return _assemble_sql(select_items, from_clause, where_clause), tuple(params)
+
+
+def stock_filter(compiled: CompiledQuery) -> Tuple[str, Tuple[str, ...]]:
+    """股票筛选使用的列和取值：有股票代码时按代码，否则按股票名称"""
+    if compiled.stock_codes:
+        return "股票代码", compiled.stock_codes
+    return "股票名称", compiled.stock_names
+
+
+def _where_conditions(
+    compiled: CompiledQuery,
+    year_range: Tuple = (),
+    year_partition_column: Optional[str] = None,
+) -> Tuple[List[str], List]:
+    """报告日、分区、股票和行业筛选条件及其参数
+
+    股票按代码筛选：解析结果中的股票名称是最新的名称，按名称筛选会漏掉公司改名前的报告期。
+    """
+    params: List = []
+    where_clause = []
+    if compiled.date_range:
+        where_clause.append(f"t0.{quote_identifier('报告日')} BETWEEN ? AND ?")
+        params.extend(compiled.date_range)
+    if year_range:
+        where_clause.append(
+            f"t0.{quote_identifier(year_partition_column)} BETWEEN ? AND ?"
+        )
+        params.extend(year_range)
+    stock_column, stocks = stock_filter(compiled)
+    if stocks:
+        placeholders = ", ".join("?" for _ in stocks)
+        where_clause.append(
+            f"t0.{quote_identifier(stock_column)} IN ({placeholders})"
+        )
+        params.extend(stocks)
+    if compiled.industry_filters:
+        # 一级、二级行业之间是"或"的关系：查询 白酒Ⅱ 和 机械设备 时两者都要
+        industry_conditions = []
+        for column, values in compiled.industry_filters.items():
+            placeholders = ", ".join("?" for _ in values)
+            industry_conditions.append(
+                f"t0.{quote_identifier(column)} IN ({placeholders})"
+            )
+            params.extend(values)
+        where_clause.append("(" + " OR ".join(industry_conditions) + ")")
+    return where_clause, params
+
+
+def _assemble_sql(select_items: List[str], from_clause: List[str], where_clause: List[str]) -> str:
+    sql_lines = ["SELECT " + ", ".join(select_items)] + from_clause
+    if where_clause:
+        sql_lines.append("WHERE " + " AND ".join(where_clause))
+    sql_lines.append(
+        f"ORDER BY t0.{quote_identifier('股票代码')}, t0.{quote_identifier('报告日')}"
+    )
+    return "\n".join(sql_lines)
+
+
+class FetchStats:
+    """进程内的数据获取统计：SQL编译命中率，以及编译执行与 CodeAgent 两条路径的耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compiled_fetches = 0
+        self.compiled_seconds = 0.0
+        self.agent_fetches = 0
+        self.agent_seconds = 0.0
+        self.compile_failures = 0
+
+    def record_compiled(self, seconds: float) -> None:
+        """记录一次通过编译SQL完成的数据获取"""
+        with self._lock:
+            self.compiled_fetches += 1
+            self.compiled_seconds += seconds
+
+    def record_agent(self, seconds: float) -> None:
+        """记录一次回退到 CodeAgent 完成的数据获取（含失败重试的时间）"""
+        with self._lock:
+            self.agent_fetches += 1
+            self.agent_seconds += seconds
+
+    def record_compile_failure(self) -> None:
+        """记录一次编译失败或编译SQL执行失败"""
+        with self._lock:
+            self.compile_failures += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        """返回当前统计值
+
+        Returns:
+            Dict[str, float]: 编译命中率、两条路径的次数和平均耗时（秒）
+        """
+        with self._lock:
+            total = self.compiled_fetches + self.agent_fetches
+            return {
+                "compiled_fetches": self.compiled_fetches,
+                "agent_fetches": self.agent_fetches,
+                "compile_failures": self.compile_failures,
+                "compile_hit_rate": self.compiled_fetches / total if total else 0.0,
+                "avg_compiled_seconds": (
+                    self.compiled_seconds / self.compiled_fetches
+                    if self.compiled_fetches else 0.0
+                ),
+                "avg_agent_seconds": (
+                    self.agent_seconds / self.agent_fetches
+                    if self.agent_fetches else 0.0
+                ),
+            }
+
+
+# 进程内共享的数据获取统计
+fetch_stats = FetchStats()
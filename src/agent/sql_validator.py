@@ -0,0 +1,466 @@
+"""SQL预校验模块
+
+CodeAgent 生成的SQL经常引用不存在的列（别名写法、指标在另一张表中）或写错表名，
+错误要等SQLite执行后才暴露，再多花一次LLM调用修正；更糟的是SQLite会把无法识别的
+双引号标识符当作字符串字面量，"净利润率" 这样的错误列名不会报错，而是返回一列常量。
+
+本模块在执行前对SQL做轻量的词法分析，对照缓存的表结构检查表名和列名：
+- FROM / JOIN 后的表名必须存在
+- 带表别名的列（t0."营业收入"）必须在该别名对应的表中
+- 不带表别名的列必须在语句引用的某张表中（FROM 中有子查询或 WITH 时不检查）；
+  SELECT 中定义的输出列名（AS 别名，或省略 AS 直接写在表达式后面的别名）不算作列
+每个问题都给出修正建议：别名映射到的标准列名、该列实际所在的表、或最相近的列名。
+
+表名错误和不带引号的未知列会让SQLite报错，这类问题拦截SQL不执行；
+无法识别的双引号标识符SQLite会当作字符串执行，校验器可能误判（例如格式字符串），
+这类问题只作为提示附在执行结果后面。函数参数、比较右侧和 IN 列表中的双引号标识符
+按字符串处理，不做检查。
+
+表结构来自 schema_digest 的磁盘缓存（四张财务表）和数据库中其他表（宽表等）的
+PRAGMA table_info，每个数据版本只读取一次。
+"""
+
+import difflib
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import connect_readonly, get_data_stamp
+    from .schema_digest import get_schema_digest
+    from .sql_compiler import quote_identifier
+    from .term_index import get_term_index
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import connect_readonly, get_data_stamp
+    from schema_digest import get_schema_digest
+    from sql_compiler import quote_identifier
+    from term_index import get_term_index
+
+# 建议的最相近列名个数和相似度下限
+MAX_SUGGESTIONS = 3
+SIMILARITY_CUTOFF = 0.5
+
+# 字符串、带引号的标识符、参数、单词、数字和单个符号
+_TOKEN = re.compile(
+    r"""(?P<string>'(?:[^']|'')*')"""
+    r"""|(?P<quoted>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])"""
+    r"""|(?P<param>[?](?:\d+)?|[:@$]\w+)"""
+    r"""|(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)"""
+    r"""|(?P<word>\w+)"""
+    r"""|(?P<comment>--[^\n]*|/\*.*?\*/)"""
+    r"""|(?P<symbol>\S)""",
+    re.DOTALL,
+)
+
+_KEYWORDS = frozenset("""
+    ABORT ALL AND AS ASC BETWEEN BY CASE CAST COLLATE CROSS CURRENT DESC DISTINCT ELSE END
+    ESCAPE EXCEPT EXISTS FALSE FILTER FIRST FOLLOWING FROM FULL GLOB GROUP GROUPS HAVING IN
+    INDEXED INNER INTERSECT IS ISNULL JOIN LAST LEFT LIKE LIMIT MATCH NATURAL NOT NOTNULL NULL
+    NULLS OFFSET ON OR ORDER OUTER OVER PARTITION PRECEDING RANGE RECURSIVE REGEXP RIGHT ROW
+    ROWS SELECT THEN TIES TRUE UNBOUNDED UNION USING VALUES WHEN WHERE WINDOW WITH
+    INTEGER INT REAL TEXT NUMERIC FLOAT DOUBLE VARCHAR CHAR BLOB NOCASE BINARY RTRIM
+    ROWID OID _ROWID_ CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP
+""".split())
+# SELECT 列表中省略 AS 的输出列名后面可以跟的关键字
+_AFTER_OUTPUT_ALIAS = frozenset("FROM UNION EXCEPT INTERSECT".split())
+# 表名后面可以直接跟的关键字（说明没有写表别名）
+_AFTER_TABLE = frozenset(
+    "WHERE GROUP ORDER LIMIT JOIN LEFT RIGHT INNER CROSS FULL NATURAL ON USING UNION "
+    "EXCEPT INTERSECT HAVING WINDOW OUTER".split()
+)
+
+
+class Token(NamedTuple):
+    """词法单元：word 为关键字，bare / identifier 为不带引号 / 带引号的标识符"""
+    kind: str
+    value: str
+
+    @property
+    def upper(self) -> str:
+        return self.value.upper() if self.kind == "word" else ""
+
+
+class SqlIssue(NamedTuple):
+    """SQL中的一个问题"""
+    kind: str  # table / column
+    name: str
+    # 列所在的表别名对应的表，不带别名的列为语句引用的全部表
+    tables: Tuple[str, ...]
+    suggestions: Tuple[str, ...]
+    # 为False时只提示，SQL照常执行
+    blocking: bool = True
+
+    def format(self) -> str:
+        if self.kind == "table":
+            message = f"表 {self.name} 不存在"
+        else:
+            message = f"列 {self.name} 不在 {'/'.join(self.tables)} 中"
+        if self.suggestions:
+            message += f"，可以改为: {'、'.join(self.suggestions)}"
+        return message
+
+
+def _tokenize(sql: str) -> List[Token]:
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        value = match.group()
+        if kind == "quoted":
+            kind, value = "identifier", value[1:-1].replace('""', '"')
+        elif kind == "word" and value.upper() not in _KEYWORDS:
+            kind = "bare"
+        tokens.append(Token(kind, value))
+    return tokens
+
+
+def _is_name(token: Optional[Token]) -> bool:
+    return token is not None and token.kind in ("identifier", "bare")
+
+
+class SqlValidator:
+    """按表结构检查SQL中的表名和列名"""
+
+    def __init__(self, tables: Dict[str, Sequence[str]], aliases: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            tables: 表名 -> 列名列表
+            aliases: 指标别名 -> 标准列名，用于给出修正建议
+        """
+        self.tables = {table: frozenset(columns) for table, columns in tables.items()}
+        self._table_lookup = {table.lower(): table for table in tables}
+        self.aliases = aliases or {}
+        self._lock = threading.Lock()
+        # 统计
+        self.checked = 0
+        self.rejected = 0
+        self.warned = 0
+
+    def _table(self, name: str) -> Optional[str]:
+        """SQLite的表名不区分大小写"""
+        return self._table_lookup.get(name.lower())
+
+    def validate(self, sql: str) -> List[SqlIssue]:
+        """检查SQL中的表名和列名
+
+        Args:
+            sql: 候选SQL
+
+        Returns:
+            List[SqlIssue]: 发现的问题，没有问题时为空列表
+        """
+        tokens = _tokenize(sql)
+        issues = self._check(tokens) if tokens and tokens[0].upper in ("SELECT", "WITH") else []
+        with self._lock:
+            self.checked += 1
+            if any(issue.blocking for issue in issues):
+                self.rejected += 1
+            elif issues:
+                self.warned += 1
+        return issues
+
+    def _check(self, tokens: List[Token]) -> List[SqlIssue]:
+        issues: List[SqlIssue] = []
+        sources: Dict[str, Optional[str]] = {}  # 表别名或表名 -> 表名（子查询、CTE为None）
+        derived = False
+        output_aliases: Set[str] = set()
+        consumed: Set[int] = set()
+
+        # WITH 定义的临时结果名
+        for i, token in enumerate(tokens):
+            if _is_name(token) and i + 2 < len(tokens) and tokens[i + 1].upper == "AS" \
+                    and tokens[i + 2].value == "(" and (i == 1 or tokens[i - 1].value in (",", ")")):
+                sources[token.value.lower()] = None
+                derived = True
+                consumed.add(i)
+
+        # FROM / JOIN 后的表和别名
+        for i, token in enumerate(tokens):
+            if token.upper not in ("FROM", "JOIN") and not (
+                token.value == "," and self._in_from_list(tokens, i)
+            ):
+                continue
+            j = i + 1
+            if j >= len(tokens):
+                continue
+            if tokens[j].value == "(":
+                derived = True
+                alias_index = self._alias_after(tokens, self._matching_paren(tokens, j) + 1)
+                if alias_index is not None:
+                    sources[tokens[alias_index].value.lower()] = None
+                    consumed.add(alias_index)
+                continue
+            if not _is_name(tokens[j]):
+                continue
+            name = tokens[j].value
+            consumed.add(j)
+            if j + 2 < len(tokens) and tokens[j + 1].value == "." and _is_name(tokens[j + 2]):
+                # schema.table
+                name = tokens[j + 2].value
+                consumed.add(j + 2)
+                j += 2
+            table = self._table(name)
+            if name.lower() in sources and sources[name.lower()] is None:
+                table = None
+            elif table is None:
+                if not name.lower().startswith("sqlite_"):
+                    issues.append(SqlIssue("table", name, (), self._suggest_tables(name)))
+                derived = True
+            sources.setdefault(name.lower(), table)
+            alias_index = self._alias_after(tokens, j + 1)
+            if alias_index is not None:
+                sources[tokens[alias_index].value.lower()] = table
+                consumed.add(alias_index)
+
+        # SELECT 中 AS 定义的输出列名，以及省略 AS 的输出列名（SELECT 营业收入 revenue FROM ...）
+        for i, token in enumerate(tokens):
+            if token.upper == "AS" and _is_name(tokens[i + 1] if i + 1 < len(tokens) else None):
+                output_aliases.add(tokens[i + 1].value)
+                consumed.add(i + 1)
+            elif i not in consumed and self._implicit_alias(tokens, i):
+                output_aliases.add(token.value)
+                consumed.add(i)
+
+        referenced = [table for table in sources.values() if table is not None]
+        seen: Set[Tuple[Optional[str], str]] = set()
+        for i, token in enumerate(tokens):
+            if not _is_name(token) or i in consumed:
+                continue
+            following = tokens[i + 1].value if i + 1 < len(tokens) else ""
+            preceding = tokens[i - 1].value if i > 0 else ""
+            if following == "(" or following == ".":
+                # 函数名；或 别名.列 中的别名，和列一起处理
+                if following == "." and i + 2 < len(tokens) and _is_name(tokens[i + 2]):
+                    consumed.add(i + 2)
+                    table = sources.get(token.value.lower(), self._table(token.value))
+                    column = tokens[i + 2].value
+                    if table is not None and column not in self.tables[table] \
+                            and (table, column) not in seen:
+                        seen.add((table, column))
+                        issues.append(SqlIssue(
+                            "column", column, (table,), self._suggest_columns(column, [table])
+                        ))
+                continue
+            if preceding == "." or derived or not referenced:
+                continue
+            column = token.value
+            if column in output_aliases or column.lower() in sources or (None, column) in seen:
+                continue
+            if token.kind == "identifier" and self._literal_position(tokens, i):
+                # SQLite 把无法识别的双引号标识符当作字符串，例如 申万一级 = "银行"、
+                # strftime("%Y", 报告日)
+                continue
+            if not any(column in self.tables[table] for table in referenced):
+                seen.add((None, column))
+                issues.append(SqlIssue(
+                    "column", column, tuple(dict.fromkeys(referenced)),
+                    self._suggest_columns(column, referenced),
+                    blocking=token.kind != "identifier",
+                ))
+        return issues
+
+    @classmethod
+    def _implicit_alias(cls, tokens: List[Token], index: int) -> bool:
+        """标识符是否是 SELECT 列表中紧跟在表达式后、省略了 AS 的输出列名"""
+        if index == 0 or not _is_name(tokens[index]):
+            return False
+        preceding = tokens[index - 1]
+        if not (
+            preceding.kind in ("identifier", "bare", "string", "number")
+            or preceding.value == ")" or preceding.upper == "END"
+        ):
+            return False
+        following = tokens[index + 1] if index + 1 < len(tokens) else None
+        if following is not None and following.value not in (",", ";") \
+                and following.upper not in _AFTER_OUTPUT_ALIAS:
+            return False
+        return cls._in_select_list(tokens, index)
+
+    @staticmethod
+    def _in_select_list(tokens: List[Token], index: int) -> bool:
+        """位置是否处于 SELECT 与 FROM 之间的输出列表中"""
+        depth = 0
+        for i in range(index - 1, -1, -1):
+            value = tokens[i].value
+            if value == ")":
+                depth += 1
+            elif value == "(":
+                if depth == 0:
+                    return False
+                depth -= 1
+            elif depth == 0 and tokens[i].upper == "SELECT":
+                return True
+            elif depth == 0 and tokens[i].upper in (
+                "FROM", "WHERE", "ON", "GROUP", "ORDER", "HAVING", "LIMIT", "JOIN"
+            ):
+                return False
+        return False
+
+    @staticmethod
+    def _literal_position(tokens: List[Token], index: int) -> bool:
+        """标识符是否处于比较运算符右侧、IN (...) 列表或函数参数中"""
+        preceding = tokens[index - 1]
+        if preceding.value in ("=", "<", ">") or preceding.upper in ("LIKE", "GLOB", "IS"):
+            return True
+        depth = 0
+        for i in range(index - 1, 0, -1):
+            value = tokens[i].value
+            if value == ")":
+                depth += 1
+            elif value == "(":
+                if depth == 0:
+                    return tokens[i - 1].upper == "IN" or _is_name(tokens[i - 1])
+                depth -= 1
+            elif depth == 0 and value != "," and tokens[i].kind not in ("identifier", "string", "number"):
+                return False
+        return False
+
+    @staticmethod
+    def _matching_paren(tokens: List[Token], start: int) -> int:
+        depth = 0
+        for i in range(start, len(tokens)):
+            if tokens[i].value == "(":
+                depth += 1
+            elif tokens[i].value == ")":
+                depth -= 1
+                if depth == 0:
+                    return i
+        return len(tokens) - 1
+
+    @staticmethod
+    def _alias_after(tokens: List[Token], index: int) -> Optional[int]:
+        """表名或子查询后面的别名（AS 可以省略）"""
+        if index < len(tokens) and tokens[index].upper == "AS":
+            index += 1
+        if index < len(tokens) and _is_name(tokens[index]) \
+                and tokens[index].value.upper() not in _AFTER_TABLE:
+            return index
+        return None
+
+    @staticmethod
+    def _in_from_list(tokens: List[Token], index: int) -> bool:
+        """逗号是否位于 FROM 子句中（FROM a, b 形式的连接）"""
+        depth = 0
+        for i in range(index - 1, -1, -1):
+            value = tokens[i].value
+            if value == ")":
+                depth += 1
+            elif value == "(":
+                if depth == 0:
+                    return False
+                depth -= 1
+            elif depth == 0 and tokens[i].upper in ("SELECT", "WHERE", "ON", "GROUP", "ORDER", "BY"):
+                return False
+            elif depth == 0 and tokens[i].upper == "FROM":
+                return True
+        return False
+
+    def _suggest_tables(self, name: str) -> Tuple[str, ...]:
+        return tuple(difflib.get_close_matches(
+            name, list(self.tables), n=MAX_SUGGESTIONS, cutoff=SIMILARITY_CUTOFF
+        ))
+
+    def _suggest_columns(self, column: str, tables: Iterable[str]) -> Tuple[str, ...]:
+        """修正建议：别名对应的标准列 > 列实际所在的其他表 > 最相近的列名"""
+        tables = list(dict.fromkeys(tables))
+        standard = self.aliases.get(column, column)
+        suggestions: List[str] = []
+        for table in tables:
+            if standard != column and standard in self.tables[table]:
+                suggestions.append(f"{table}.{standard}")
+        if not suggestions:
+            suggestions.extend(
+                f"{table}.{standard}" for table in self.tables
+                if table not in tables and standard in self.tables[table]
+            )
+        if not suggestions:
+            candidates = {c: table for table in tables for c in self.tables[table]}
+            suggestions.extend(
+                f"{candidates[c]}.{c}" for c in difflib.get_close_matches(
+                    standard, list(candidates), n=MAX_SUGGESTIONS, cutoff=SIMILARITY_CUTOFF
+                )
+            )
+        return tuple(suggestions[:MAX_SUGGESTIONS])
+
+    def format_issues(self, issues: Sequence[SqlIssue]) -> str:
+        """返回给CodeAgent的修正提示"""
+        lines = ["SQL校验未通过，未执行查询:"]
+        lines += [f"- {issue.format()}" for issue in issues]
+        lines.append("请按建议修改表名或列名后重新调用 sql_query")
+        return "\n".join(lines)
+
+    def format_warnings(self, issues: Sequence[SqlIssue]) -> str:
+        """附在执行结果后面的提示（只包含不拦截的问题）"""
+        lines = ["SQL校验提示（查询已执行，以下双引号标识符被SQLite当作字符串）:"]
+        lines += [f"- {issue.format()}" for issue in issues]
+        lines.append("如果它们应当是列名，请按建议修改后重新调用 sql_query")
+        return "\n".join(lines)
+
+    def snapshot(self) -> Dict[str, float]:
+        """返回当前统计值
+
+        Returns:
+            Dict[str, float]: 校验次数、拦截次数、只提示的次数和拦截比例
+        """
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "rejected": self.rejected,
+                "warned": self.warned,
+                "reject_rate": self.rejected / self.checked if self.checked else 0.0,
+            }
+
+
+def load_table_columns(conn: Optional[sqlite3.Connection] = None) -> Dict[str, List[str]]:
+    """表名 -> 列名列表：财务表使用表结构摘要缓存，其他表和视图（宽表等）读取 PRAGMA table_info"""
+    tables = {
+        table: [column[0] for column in info["columns"]]
+        for table, info in get_schema_digest().tables.items()
+    }
+    own_conn = conn is None
+    conn = conn or connect_readonly()
+    try:
+        names = [
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+                "AND name NOT LIKE 'sqlite_%'"
+            )
+        ]
+        for name in names:
+            if name not in tables:
+                tables[name] = [
+                    row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(name)})")
+                ]
+    finally:
+        if own_conn:
+            conn.close()
+    return tables
+
+
+_sql_validator: Optional[SqlValidator] = None
+_sql_validator_stamp: Optional[str] = None
+_sql_validator_lock = threading.Lock()
+
+
+def get_sql_validator() -> Optional[SqlValidator]:
+    """获取当前数据版本的SQL校验器，数据库不可用时返回None"""
+    global _sql_validator, _sql_validator_stamp
+    data_stamp = get_data_stamp()
+    if _sql_validator is not None and _sql_validator_stamp == data_stamp:
+        return _sql_validator
+
+    with _sql_validator_lock:
+        if _sql_validator is None or _sql_validator_stamp != data_stamp:
+            try:
+                tables = load_table_columns()
+            except sqlite3.Error as e:
+                print(f"读取财务数据库表结构失败，跳过SQL校验: {str(e)}")
+                return None
+            _sql_validator = SqlValidator(tables, dict(get_term_index().aliases))
+            _sql_validator_stamp = data_stamp
+        return _sql_validator
@@ -0,0 +1,315 @@
+"""按股票分区的数据缓存模块
+
+追问通常针对同一批公司，只是换了指标或报告日区间，SQL结果缓存按SQL文本命中，
+这些追问仍然要重新执行SQL。本模块以 (表名, 股票代码) 为粒度缓存一家公司在一张表中
+全部报告期的数据：
+- 新的编译查询涉及的全部 (表, 股票) 分区都已缓存、且包含需要的列时（包含命中），
+  直接在内存中按报告日、行业条件筛选并连接，不执行SQL
+- 分区已缓存但缺少新请求的列时，只查询缺少的列，按 rowid 补充到分区中
+- 按分区占用的字节数做LRU淘汰；数据版本变化时整体清空
+
+只缓存按股票筛选（股票名称已解析为股票代码）、且股票数不超过 STOCK_CACHE_MAX_STOCKS 的查询。
+
+环境变量：
+- STOCK_CACHE_MAX_BYTES：缓存容量（字节），默认256MB，0表示关闭
+- STOCK_CACHE_MAX_STOCKS：使用缓存的查询最多涉及的股票数，默认20
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import get_data_stamp, get_readonly_engine
+    from .result_cache import dataframe_nbytes
+    from .sql_compiler import BASE_COLUMNS, JOIN_KEYS, CompiledQuery, quote_identifier
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import get_data_stamp, get_readonly_engine
+    from result_cache import dataframe_nbytes
+    from sql_compiler import BASE_COLUMNS, JOIN_KEYS, CompiledQuery, quote_identifier
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_STOCKS = 20
+# 每个分区都保存的列：rowid 用于补充列，申万二级用于行业筛选
+ROWID_COLUMN = "_rowid"
+PARTITION_KEY_COLUMNS = (ROWID_COLUMN,) + BASE_COLUMNS + ("申万二级",)
+
+PartitionKey = Tuple[str, str]
+
+
+def _date_mask(dates: pd.Series, date_range: Tuple[str, str]) -> pd.Series:
+    """报告日区间条件，报告日存为整数或文本时都按 yyyymmdd 文本比较"""
+    if pd.api.types.is_numeric_dtype(dates.dtype):
+        dates = dates.astype("Int64")
+    text = dates.astype(str)
+    return (text >= date_range[0]) & (text <= date_range[1])
+
+
+class StockPartitionCache:
+    """(表名, 股票代码) 粒度的财务数据缓存"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_stocks: int = DEFAULT_MAX_STOCKS):
+        """
+        Args:
+            max_bytes: 分区总字节数上限，0表示不缓存
+            max_stocks: 使用缓存的查询最多涉及的股票数
+        """
+        self.max_bytes = max_bytes
+        self.max_stocks = max_stocks
+        self.current_bytes = 0
+        self._partitions: "OrderedDict[PartitionKey, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._data_stamp: Optional[str] = None
+        self._lock = threading.Lock()
+        # 统计
+        self.requests = 0
+        self.containment_hits = 0
+        self.extensions = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _resolve_codes(self, compiled: CompiledQuery) -> Optional[List[str]]:
+        """查询涉及的股票代码，不适合使用缓存时返回None"""
+        if not self.max_bytes or not compiled.stock_codes:
+            return None
+        if len(compiled.stock_codes) > self.max_stocks:
+            return None
+        return sorted(set(compiled.stock_codes))
+
+    def _check_stamp(self) -> None:
+        """数据版本变化时清空缓存（调用方持有锁）"""
+        data_stamp = get_data_stamp()
+        if self._data_stamp != data_stamp:
+            if self._partitions:
+                self.invalidations += 1
+            self._partitions.clear()
+            self.current_bytes = 0
+            self._data_stamp = data_stamp
+
+    def _plan(
+        self, compiled: CompiledQuery, codes: List[str]
+    ) -> Tuple[Dict[PartitionKey, pd.DataFrame], Dict[str, Dict[str, List[str]]]]:
+        """取出已缓存的分区，并计算每张表需要从数据库读取的 股票代码 -> 缺少的列"""
+        cached: Dict[PartitionKey, pd.DataFrame] = {}
+        missing: Dict[str, Dict[str, List[str]]] = {}
+        with self._lock:
+            self._check_stamp()
+            for table, columns in compiled.table_columns.items():
+                for code in codes:
+                    key = (table, code)
+                    entry = self._partitions.get(key)
+                    if entry is not None:
+                        self._partitions.move_to_end(key)
+                        cached[key] = entry[0]
+                        absent = [c for c in columns if c not in entry[0].columns]
+                    else:
+                        absent = list(PARTITION_KEY_COLUMNS[1:]) + list(columns)
+                    if absent:
+                        missing.setdefault(table, {})[code] = absent
+        return cached, missing
+
+    @staticmethod
+    def _load(table: str, code_columns: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
+        """从数据库读取一张表中若干只股票的全部报告期，缺少的列按股票分组读取"""
+        groups: Dict[Tuple[str, ...], List[str]] = {}
+        for code, columns in code_columns.items():
+            groups.setdefault(tuple(columns), []).append(code)
+
+        loaded: Dict[str, pd.DataFrame] = {}
+        for columns, codes in groups.items():
+            select_items = [f"rowid AS {quote_identifier(ROWID_COLUMN)}"]
+            select_items += [
+                quote_identifier(c) for c in dict.fromkeys(("股票代码",) + columns)
+            ]
+            placeholders = ", ".join("?" for _ in codes)
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(select_items)} FROM {quote_identifier(table)} "
+                f"WHERE {quote_identifier('股票代码')} IN ({placeholders})",
+                get_readonly_engine(), params=tuple(codes),
+            )
+            for code in codes:
+                loaded[code] = df[df["股票代码"].astype(str) == code].reset_index(drop=True)
+        return loaded
+
+    @staticmethod
+    def _extend(partition: Optional[pd.DataFrame], extra: pd.DataFrame) -> pd.DataFrame:
+        """把新读取的列按 rowid 补充到分区中"""
+        if partition is None:
+            return extra
+        new_columns = [c for c in extra.columns if c not in partition.columns]
+        if not new_columns:
+            return partition
+        return partition.merge(
+            extra[[ROWID_COLUMN] + new_columns], on=ROWID_COLUMN, how="left"
+        )
+
+    def _store(self, key: PartitionKey, partition: pd.DataFrame) -> None:
+        """写入分区并按容量淘汰（调用方持有锁）"""
+        old = self._partitions.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old[1]
+        nbytes = dataframe_nbytes(partition)
+        if nbytes > self.max_bytes:
+            return
+        self._partitions[key] = (partition, nbytes)
+        self.current_bytes += nbytes
+        while self.current_bytes > self.max_bytes and self._partitions:
+            _, (_, evicted_bytes) = self._partitions.popitem(last=False)
+            self.current_bytes -= evicted_bytes
+            self.evictions += 1
+
+    def _table_rows(
+        self, partitions: Dict[PartitionKey, pd.DataFrame], table: str, codes: List[str],
+        columns: Sequence[str], compiled: CompiledQuery, is_base: bool,
+    ) -> pd.DataFrame:
+        """一张表中若干只股票的行，主表按全部条件筛选，其余表只按报告日缩小"""
+        frames = [partitions[(table, code)] for code in codes]
+        rows = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        mask = pd.Series(True, index=rows.index)
+        if compiled.date_range:
+            mask &= _date_mask(rows["报告日"], compiled.date_range)
+        if is_base:
+            # 分区只包含查询的股票（按股票代码，含改名前的行），只需再按行业筛选
+            if compiled.industry_filters:
+                industry_mask = pd.Series(False, index=rows.index)
+                for column, values in compiled.industry_filters.items():
+                    industry_mask |= rows[column].isin(values)
+                mask &= industry_mask
+            return rows.loc[mask, list(BASE_COLUMNS) + list(columns)]
+        return rows.loc[mask, list(JOIN_KEYS) + list(columns)]
+
+    def _fill(
+        self, compiled: CompiledQuery, codes: List[str], record: bool = True
+    ) -> Optional[Dict[PartitionKey, pd.DataFrame]]:
+        """取出查询涉及的分区，缺少的分区或列从数据库读取并写入缓存
+
+        Returns:
+            Optional[Dict[PartitionKey, pd.DataFrame]]: 全部分区；主表中缺少某只股票时返回None
+        """
+        partitions, missing = self._plan(compiled, codes)
+        loaded = {table: self._load(table, code_columns) for table, code_columns in missing.items()}
+        # 主表中没有某只股票的行时（例如股票代码的存储格式不同），改为执行SQL
+        for code, frame in loaded.get(compiled.base_table, {}).items():
+            if (compiled.base_table, code) not in partitions and frame.empty:
+                if record:
+                    self._record("misses")
+                return None
+
+        with self._lock:
+            if record:
+                self.requests += 1
+                if not missing:
+                    self.containment_hits += 1
+                elif partitions:
+                    self.extensions += 1
+                else:
+                    self.misses += 1
+            for table, frames in loaded.items():
+                for code, frame in frames.items():
+                    key = (table, code)
+                    current = self._partitions.get(key)
+                    base = current[0] if current is not None else partitions.get(key)
+                    partition = self._extend(base, frame)
+                    partitions[key] = partition
+                    self._store(key, partition)
+        return partitions
+
+    def prefetch(self, compiled: CompiledQuery) -> bool:
+        """提前读取查询涉及的分区，不计入命中统计
+
+        查询解析尚未结束时用部分解析结果调用，之后的 fetch 直接在缓存中命中。
+
+        Args:
+            compiled: compile_parsed_query 的结果，报告日区间可以为空
+
+        Returns:
+            bool: 查询是否适合使用缓存且分区已就绪
+        """
+        codes = self._resolve_codes(compiled)
+        if codes is None:
+            return False
+        return self._fill(compiled, codes, record=False) is not None
+
+    def fetch(self, compiled: CompiledQuery) -> Optional[pd.DataFrame]:
+        """用缓存的分区回答编译后的查询
+
+        Args:
+            compiled: compile_parsed_query 的结果
+
+        Returns:
+            Optional[pd.DataFrame]: 与执行编译SQL相同的列和行；查询不适合使用缓存时返回None
+        """
+        codes = self._resolve_codes(compiled)
+        if codes is None:
+            return None
+        partitions = self._fill(compiled, codes)
+        if partitions is None:
+            return None
+
+        tables = list(compiled.table_columns)
+        result = self._table_rows(
+            partitions, compiled.base_table, codes,
+            compiled.table_columns[compiled.base_table], compiled, is_base=True,
+        )
+        for table in tables[1:]:
+            right = self._table_rows(
+                partitions, table, codes, compiled.table_columns[table], compiled, is_base=False,
+            )
+            result = result.merge(right, on=list(JOIN_KEYS), how="left")
+        result = result.sort_values(["股票代码", "报告日"], kind="stable")
+        return result.reset_index(drop=True)[list(compiled.output_columns)]
+
+    def _record(self, counter: str) -> None:
+        with self._lock:
+            self.requests += 1
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> Dict[str, float]:
+        """返回当前统计值
+
+        Returns:
+            Dict[str, float]: 包含命中率、补充列次数、淘汰次数和占用的字节数
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "containment_hits": self.containment_hits,
+                "containment_hit_rate": (
+                    self.containment_hits / self.requests if self.requests else 0.0
+                ),
+                "extensions": self.extensions,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "partitions": len(self._partitions),
+                "bytes": self.current_bytes,
+            }
+
+
+_stock_cache: Optional[StockPartitionCache] = None
+_stock_cache_lock = threading.Lock()
+
+
+def get_stock_cache() -> StockPartitionCache:
+    """获取进程内共享的按股票分区的数据缓存
+
+    Returns:
+        StockPartitionCache: 按环境变量配置的缓存
+    """
+    global _stock_cache
+    if _stock_cache is not None:
+        return _stock_cache
+
+    with _stock_cache_lock:
+        if _stock_cache is None:
+            _stock_cache = StockPartitionCache(
+                int(os.getenv("STOCK_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+                int(os.getenv("STOCK_CACHE_MAX_STOCKS", str(DEFAULT_MAX_STOCKS))),
+            )
+        return _stock_cache
@@ -0,0 +1,332 @@
+"""股票名称/代码本地解析模块
+
+从 data/Astock_financial_data.db 中读取全部 (股票代码, 股票名称) 组合，构建进程内的
+实体索引，支持以下写法解析为标准股票名称：
+- 6位股票代码：600519、600519.SH、SH600519
+- 全称及去掉 ST/*ST 前缀的名称：贵州茅台、*ST海润
+- 唯一前缀：宁德 -> 宁德时代
+- 简称（名称中唯一的连续片段或按顺序出现的字）：茅台 -> 贵州茅台、工行 -> 工商银行
+- 拼音首字母（需要安装 pypinyin）：gzmt -> 贵州茅台
+
+索引每个进程只构建一次，数据库文件更新后自动重建。
+"""
+
+import bisect
+import re
+import sqlite3
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .financial_db import FINANCIAL_TABLES, connect_readonly, get_data_version
+    from .term_matcher import AhoCorasickAutomaton, FILLER_WORDS
+    from .term_index import get_term_index
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from financial_db import FINANCIAL_TABLES, connect_readonly, get_data_version
+    from term_matcher import AhoCorasickAutomaton, FILLER_WORDS
+    from term_index import get_term_index
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # 拼音首字母检索为可选功能
+    lazy_pinyin = None
+
+# 股票名称中的特殊处理前缀
+_NAME_PREFIX = re.compile(r"^(?:\*?ST|S\*?ST|N|C|XD|XR|DR)\s*")
+_STOCK_CODE = re.compile(r"(?i)^(?:S[HZ]|BJ)?(\d{6})(?:\.(?:S[HZ]|BJ))?$")
+_CODE_IN_TEXT = re.compile(r"(?<!\d)(\d{6})(?!\d)")
+_PINYIN_INITIALS = re.compile(r"^[A-Za-z]{2,8}$")
+# 多个股票名称之间的分隔符
+_NAME_SEPARATORS = re.compile(r"[,，、;；/\s]+")
+
+# 简称最短长度
+MIN_ABBREVIATION_LENGTH = 2
+
+
+class StockEntity(NamedTuple):
+    """一只股票"""
+    code: str
+    name: str
+
+
+class StockMatch(NamedTuple):
+    """查询文本中识别出的股票"""
+    start: int
+    end: int
+    entity: StockEntity
+
+
+def normalize_stock_code(code) -> Optional[str]:
+    """把各种写法的股票代码规范化为6位数字字符串
+
+    Args:
+        code: 股票代码，如 600519、"600519.SH"、"sh600519"、1（表示000001）
+
+    Returns:
+        Optional[str]: 6位股票代码，无法识别时返回None
+    """
+    text = str(code).strip()
+    if text.isdigit() and len(text) < 6:
+        text = text.zfill(6)
+    match = _STOCK_CODE.match(text)
+    return match.group(1) if match else None
+
+
+def _strip_name_prefix(name: str) -> str:
+    """去掉 ST、*ST、N 等名称前缀"""
+    return _NAME_PREFIX.sub("", name)
+
+
+def _is_subsequence(short: str, long: str) -> bool:
+    """判断short的字是否按顺序出现在long中"""
+    iterator = iter(long)
+    return all(char in iterator for char in short)
+
+
+class StockResolver:
+    """股票实体索引"""
+
+    def __init__(self, pairs: List[Tuple[str, str]], data_version: float = 0.0):
+        """根据 (股票代码, 股票名称) 列表构建索引
+
+        Args:
+            pairs: (股票代码, 股票名称) 列表，按报告日从旧到新排列，
+                同一代码的最新名称作为标准名称
+            data_version: 构建索引时数据库的数据版本
+        """
+        self.data_version = data_version
+
+        by_code: Dict[str, StockEntity] = {}
+        name_to_codes: Dict[str, Set[str]] = {}
+        for raw_code, raw_name in pairs:
+            code = normalize_stock_code(raw_code)
+            name = str(raw_name).strip() if raw_name else ""
+            if not code or not name:
+                continue
+            by_code[code] = StockEntity(code, name)
+            for key in {name, _strip_name_prefix(name)}:
+                name_to_codes.setdefault(key, set()).add(code)
+
+        self._by_code = by_code
+        # 名称（含曾用名、去前缀名称）-> 股票代码，仅保留无歧义的名称
+        self._by_name: Dict[str, str] = {
+            name: next(iter(codes))
+            for name, codes in name_to_codes.items()
+            if len(codes) == 1
+        }
+        self._sorted_names = sorted(self._by_name)
+        self._names_by_first_char: Dict[str, List[str]] = {}
+        for name in self._sorted_names:
+            self._names_by_first_char.setdefault(name[0], []).append(name)
+
+        self._abbreviations = self._build_abbreviations()
+        self._pinyin_initials = self._build_pinyin_initials()
+        self._text_patterns = self._build_text_patterns()
+        self._automaton = AhoCorasickAutomaton(self._text_patterns)
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def _build_abbreviations(self) -> Dict[str, str]:
+        """名称中只属于一只股票的连续片段 -> 股票代码"""
+        fragment_codes: Dict[str, Set[str]] = {}
+        for name, code in self._by_name.items():
+            for length in range(MIN_ABBREVIATION_LENGTH, len(name)):
+                for start in range(len(name) - length + 1):
+                    fragment = name[start:start + length]
+                    fragment_codes.setdefault(fragment, set()).add(code)
+        return {
+            fragment: next(iter(codes))
+            for fragment, codes in fragment_codes.items()
+            if len(codes) == 1 and fragment not in self._by_name
+        }
+
+    def _build_pinyin_initials(self) -> Dict[str, str]:
+        """拼音首字母 -> 股票代码（未安装 pypinyin 时为空）"""
+        if lazy_pinyin is None:
+            return {}
+        initials_codes: Dict[str, Set[str]] = {}
+        for name, code in self._by_name.items():
+            initials = "".join(
+                lazy_pinyin(name, style=Style.FIRST_LETTER)
+            ).lower()
+            initials_codes.setdefault(initials, set()).add(code)
+        return {
+            initials: next(iter(codes))
+            for initials, codes in initials_codes.items()
+            if len(codes) == 1
+        }
+
+    def _build_text_patterns(self) -> Dict[str, str]:
+        """在自由文本中扫描时使用的模式串 -> 股票代码
+
+        包括名称以及唯一的前缀/后缀简称（宁德、茅台）；名称中间的片段很少被
+        用作简称，不参与扫描。与财务术语、常用虚词重合的简称会被排除，
+        避免把"营业收入"之类的词误识别为股票。
+        """
+        term_index = get_term_index()
+        excluded = set(term_index.aliases) | set(term_index.standard_terms)
+        excluded.update(FILLER_WORDS)
+
+        patterns = {}
+        for name in self._by_name:
+            for length in range(MIN_ABBREVIATION_LENGTH, len(name)):
+                for fragment in (name[:length], name[-length:]):
+                    code = self._abbreviations.get(fragment)
+                    if code and fragment not in excluded:
+                        patterns[fragment] = code
+        patterns.update(self._by_name)
+        return patterns
+
+    def get_by_code(self, code) -> Optional[StockEntity]:
+        """按股票代码查找"""
+        normalized = normalize_stock_code(code)
+        return self._by_code.get(normalized) if normalized else None
+
+    def resolve(self, text: str) -> Optional[StockEntity]:
+        """把一个股票名称、简称或代码解析为标准股票
+
+        Args:
+            text: 股票名称、简称、拼音首字母或股票代码
+
+        Returns:
+            Optional[StockEntity]: 唯一匹配的股票，无法确定时返回None
+        """
+        text = text.strip()
+        if not text:
+            return None
+
+        # 1. 股票代码
+        entity = self.get_by_code(text)
+        if entity:
+            return entity
+
+        # 2. 全称或去前缀名称
+        for key in (text, _strip_name_prefix(text)):
+            code = self._by_name.get(key)
+            if code:
+                return self._by_code[code]
+
+        # 3. 唯一前缀
+        start = bisect.bisect_left(self._sorted_names, text)
+        end = bisect.bisect_right(self._sorted_names, text + "\uffff")
+        codes = {self._by_name[name] for name in self._sorted_names[start:end]}
+        if len(codes) == 1:
+            return self._by_code[codes.pop()]
+
+        # 4. 唯一的连续片段
+        code = self._abbreviations.get(text)
+        if code:
+            return self._by_code[code]
+
+        # 5. 按顺序出现的字（如 工行 -> 工商银行），首字必须相同
+        if len(text) >= MIN_ABBREVIATION_LENGTH:
+            codes = {
+                self._by_name[name]
+                for name in self._names_by_first_char.get(text[0], ())
+                if _is_subsequence(text, name)
+            }
+            if len(codes) == 1:
+                return self._by_code[codes.pop()]
+
+        # 6. 拼音首字母
+        if _PINYIN_INITIALS.match(text):
+            code = self._pinyin_initials.get(text.lower())
+            if code:
+                return self._by_code[code]
+
+        return None
+
+    def find_in_text(self, text: str) -> List[StockMatch]:
+        """在自由文本中识别股票名称、唯一简称和6位代码
+
+        Args:
+            text: 用户查询
+
+        Returns:
+            List[StockMatch]: 按出现顺序排列、互不重叠的识别结果
+        """
+        matches = []
+        for start, end in self._automaton.find_longest(text):
+            code = self._text_patterns[text[start:end]]
+            matches.append(StockMatch(start, end, self._by_code[code]))
+
+        for match in _CODE_IN_TEXT.finditer(text):
+            entity = self._by_code.get(match.group(1))
+            if entity:
+                matches.append(StockMatch(match.start(), match.end(), entity))
+        return sorted(matches)
+
+    def canonicalize_names(self, names: str) -> Tuple[str, List[str]]:
+        """把逗号等分隔的股票名称/简称/代码列表规范化为标准股票名称
+
+        Args:
+            names: 如 "茅台, 600036、宁德"
+
+        Returns:
+            Tuple[str, List[str]]: (逗号分隔的标准名称，无法识别的名称原样保留,
+                无法识别的名称列表)
+        """
+        canonical = []
+        unresolved = []
+        for name in _NAME_SEPARATORS.split(names or ""):
+            if not name:
+                continue
+            entity = self.resolve(name)
+            if entity is None:
+                unresolved.append(name)
+                resolved_name = name
+            else:
+                resolved_name = entity.name
+            if resolved_name not in canonical:
+                canonical.append(resolved_name)
+        return ",".join(canonical), unresolved
+
+
+def _load_stock_pairs() -> List[Tuple[str, str]]:
+    """从财务数据库读取 (股票代码, 股票名称) 组合，按最近出现的报告日排序"""
+    union_sql = " UNION ALL ".join(
+        f'SELECT "股票代码", "股票名称", "报告日" FROM {table}'
+        for table in FINANCIAL_TABLES
+    )
+    sql = (
+        f'SELECT "股票代码", "股票名称", MAX("报告日") AS latest '
+        f'FROM ({union_sql}) GROUP BY "股票代码", "股票名称" ORDER BY latest'
+    )
+    connection = connect_readonly()
+    try:
+        return [(code, name) for code, name, _ in connection.execute(sql)]
+    finally:
+        connection.close()
+
+
+_stock_resolver: Optional[StockResolver] = None
+_stock_resolver_lock = threading.Lock()
+
+
+def get_stock_resolver() -> StockResolver:
+    """获取进程内共享的股票实体索引，数据库更新后自动重建
+
+    数据库不可用时返回空索引，调用方的解析结果会全部为None。
+
+    Returns:
+        StockResolver: 当前有效的股票实体索引
+    """
+    global _stock_resolver
+    data_version = get_data_version()
+    resolver = _stock_resolver
+    if resolver is not None and resolver.data_version == data_version:
+        return resolver
+
+    with _stock_resolver_lock:
+        if _stock_resolver is None or _stock_resolver.data_version != data_version:
+            try:
+                pairs = _load_stock_pairs()
+            except sqlite3.Error as e:
+                print(f"加载股票名称索引失败: {str(e)}")
+                pairs = []
+            _stock_resolver = StockResolver(pairs, data_version)
+        return _stock_resolver
@@ -0,0 +1,331 @@
+"""分块取数与结果句柄模块
+
+pd.read_sql_query 会把整个结果一次性读入内存，不加限制的行业查询（例如全部申万一级行业、
+15年、几十个指标）可能让worker的内存暴涨。本模块按块读取查询结果：
+- 已读取的数据超过内存阈值后，改为逐块写入临时 Parquet 文件（每块一个行组）
+- 超过行数上限时停止读取，并记录截断信息，供界面提示用户
+- 返回 FetchedData 句柄，后续阶段按需读取预览、逐块写CSV，或在确实需要时再载入整个DataFrame
+
+环境变量：
+- FETCH_CHUNK_ROWS：每次读取的行数，默认50000
+- FETCH_SPILL_BYTES：内存中保留的结果字节数上限，超过后写入临时文件，默认256MB
+- FETCH_ROW_CAP：结果行数上限，0表示不限制，默认1000000
+- FETCH_SPILL_DIR：临时文件目录，默认系统临时目录
+"""
+
+import os
+import tempfile
+import weakref
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .frame_types import compact_frame
+    from .result_cache import dataframe_nbytes, get_sql_cache
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from frame_types import compact_frame
+    from result_cache import dataframe_nbytes, get_sql_cache
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时不写临时文件，只按行数上限截断
+    pa = None
+
+FETCH_CHUNK_ROWS = int(os.getenv("FETCH_CHUNK_ROWS", "50000"))
+FETCH_SPILL_BYTES = int(os.getenv("FETCH_SPILL_BYTES", str(256 * 1024 * 1024)))
+FETCH_ROW_CAP = int(os.getenv("FETCH_ROW_CAP", "1000000"))
+FETCH_SPILL_DIR = os.getenv("FETCH_SPILL_DIR") or tempfile.gettempdir()
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class FetchedData:
+    """一次数据获取的结果句柄
+
+    结果较小时保存在内存中，较大时保存在临时 Parquet 文件中；句柄被回收或
+    调用 close() 时删除临时文件。
+    """
+
+    def __init__(
+        self,
+        frame: Optional[pd.DataFrame] = None,
+        spill_path: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        dtypes: Optional[Dict[str, str]] = None,
+        row_count: int = 0,
+        truncated: bool = False,
+        row_cap: int = 0,
+        ordered: bool = False,
+    ):
+        """
+        Args:
+            frame: 内存中的结果，与 spill_path 二选一
+            spill_path: 临时 Parquet 文件路径
+            columns: 列名，frame 为None时必须给出
+            dtypes: 列名 -> 数据类型名称
+            row_count: 结果行数
+            truncated: 是否因超过行数上限被截断
+            row_cap: 行数上限
+            ordered: 结果是否按 (股票代码, 报告日) 排序（编译生成的SQL），
+                决定截断提示中如何描述返回的行
+        """
+        self._frame = frame
+        self.spill_path = spill_path
+        self.columns = list(frame.columns) if frame is not None else list(columns or [])
+        self.dtypes = (
+            {column: str(dtype) for column, dtype in frame.dtypes.items()}
+            if frame is not None else dict(dtypes or {})
+        )
+        self.row_count = len(frame) if frame is not None else row_count
+        self.truncated = truncated
+        self.row_cap = row_cap
+        self.ordered = ordered
+        self._finalizer = (
+            weakref.finalize(self, _remove_file, spill_path) if spill_path else None
+        )
+
+    @classmethod
+    def from_frame(
+        cls, frame: pd.DataFrame, row_cap: int = FETCH_ROW_CAP, ordered: bool = False
+    ) -> "FetchedData":
+        """包装内存中的结果，超过行数上限时截断，并转换为紧凑类型"""
+        truncated = bool(row_cap) and len(frame) > row_cap
+        if truncated:
+            frame = frame.iloc[:row_cap].copy()
+        return cls(
+            frame=compact_frame(frame), truncated=truncated, row_cap=row_cap, ordered=ordered
+        )
+
+    @property
+    def is_spilled(self) -> bool:
+        """结果是否保存在临时文件中"""
+        return self.spill_path is not None
+
+    @property
+    def shape(self):
+        return (self.row_count, len(self.columns))
+
+    def head(self, n: int = 10) -> pd.DataFrame:
+        """读取前n行，不载入整个结果"""
+        if self._frame is not None:
+            return self._frame.head(n)
+        for batch in pq.ParquetFile(self.spill_path).iter_batches(batch_size=n):
+            return batch.to_pandas()
+        return pd.DataFrame(columns=self.columns)
+
+    def iter_chunks(self, chunk_rows: int = FETCH_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """逐块读取结果"""
+        if self._frame is not None:
+            for start in range(0, max(len(self._frame), 1), chunk_rows):
+                yield self._frame.iloc[start:start + chunk_rows]
+            return
+        for batch in pq.ParquetFile(self.spill_path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+
+    def to_csv(self, path: str, **kwargs) -> None:
+        """逐块写入CSV文件，只有第一块写表头"""
+        kwargs.setdefault("index", False)
+        header = True
+        mode = "w"
+        for chunk in self.iter_chunks():
+            chunk.to_csv(path, mode=mode, header=header, **kwargs)
+            header = False
+            mode = "a"
+            # 只有第一块可能带BOM
+            if kwargs.get("encoding") == "utf-8-sig":
+                kwargs["encoding"] = "utf-8"
+
+    def to_pandas(self) -> pd.DataFrame:
+        """载入整个结果（紧凑类型）"""
+        if self._frame is not None:
+            return self._frame
+        return compact_frame(pq.read_table(self.spill_path).to_pandas())
+
+    def truncation_info(self) -> Dict:
+        """截断信息，未截断时只包含 truncated=False"""
+        if not self.truncated:
+            return {"truncated": False}
+        order = "按股票代码、报告日排序的" if self.ordered else ""
+        return {
+            "truncated": True,
+            "row_cap": self.row_cap,
+            "returned_rows": self.row_count,
+            "message": (
+                f"查询结果超过 {self.row_cap} 行，只返回了{order}前 "
+                f"{self.row_count} 行。如需完整数据，请缩小报告日区间或增加股票、行业筛选条件。"
+            ),
+        }
+
+    def close(self) -> None:
+        """删除临时文件"""
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+def _spill_schema(frame: pd.DataFrame):
+    """临时文件的schema
+
+    写入临时文件之前的块中全为空的列无法推断类型，按文本列处理：之后的块中
+    无论出现文本还是数值都能写入，不会因为类型不符使整个查询失败。
+
+    Returns:
+        Tuple[pa.Schema, List[str]]: schema 和按文本处理的列
+    """
+    schema = pa.Table.from_pandas(frame, preserve_index=False).schema
+    text_columns = []
+    for index, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(index, pa.field(field.name, pa.string()))
+            text_columns.append(field.name)
+    return schema, text_columns
+
+
+def _spill_table(frame: pd.DataFrame, schema, text_columns: Sequence[str]):
+    """按临时文件的schema转换一块数据，按文本处理的列中的非空值转为字符串"""
+    if text_columns:
+        frame = frame.copy()
+        for column in text_columns:
+            values = frame[column]
+            frame[column] = values.astype(object).where(values.isna(), values.astype(str))
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False, safe=False)
+
+
+def collect_chunks(
+    chunks: Iterable[pd.DataFrame],
+    spill_bytes: int = FETCH_SPILL_BYTES,
+    row_cap: int = FETCH_ROW_CAP,
+    ordered: bool = False,
+) -> FetchedData:
+    """把按块读取的结果收集为 FetchedData
+
+    Args:
+        chunks: DataFrame块的迭代器
+        spill_bytes: 内存中保留的字节数上限，超过后写入临时 Parquet 文件
+        row_cap: 行数上限，0表示不限制
+        ordered: 各块是否按 (股票代码, 报告日) 排序
+
+    Returns:
+        FetchedData: 结果句柄
+    """
+    chunks = iter(chunks)
+    frames: List[pd.DataFrame] = []
+    template: Optional[pd.DataFrame] = None
+    memory_bytes = 0
+    row_count = 0
+    truncated = False
+    writer = None
+    spill_path = None
+    schema = None
+    text_columns: List[str] = []
+    try:
+        for chunk in chunks:
+            if template is None:
+                template = chunk.iloc[0:0].copy()
+            if row_cap and row_count + len(chunk) > row_cap:
+                chunk = chunk.iloc[:row_cap - row_count].copy()
+                truncated = True
+            if len(chunk):
+                row_count += len(chunk)
+                if writer is not None:
+                    writer.write_table(_spill_table(chunk, schema, text_columns))
+                else:
+                    frames.append(chunk)
+                    memory_bytes += dataframe_nbytes(chunk)
+                    if memory_bytes > spill_bytes and pa is not None:
+                        # 超过内存阈值：已读取的块和之后的块都写入临时文件
+                        buffered = pd.concat(frames, ignore_index=True)
+                        schema, text_columns = _spill_schema(buffered)
+                        fd, spill_path = tempfile.mkstemp(
+                            prefix="dfa-", suffix=".parquet", dir=FETCH_SPILL_DIR
+                        )
+                        os.close(fd)
+                        writer = pq.ParquetWriter(spill_path, schema)
+                        writer.write_table(_spill_table(buffered, schema, text_columns))
+                        frames = []
+            if truncated:
+                break
+            if row_cap and row_count >= row_cap:
+                # 正好读满上限时，再看一块确认后面是否还有数据
+                more = next(chunks, None)
+                truncated = more is not None and len(more) > 0
+                break
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            _remove_file(spill_path)
+        raise
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+    if writer is not None:
+        writer.close()
+        return FetchedData(
+            spill_path=spill_path,
+            columns=list(template.columns),
+            dtypes={column: str(dtype) for column, dtype in template.dtypes.items()},
+            row_count=row_count,
+            truncated=truncated,
+            row_cap=row_cap,
+            ordered=ordered,
+        )
+    if frames:
+        frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    else:
+        frame = template if template is not None else pd.DataFrame()
+    return FetchedData(
+        frame=compact_frame(frame), truncated=truncated, row_cap=row_cap, ordered=ordered
+    )
+
+
+def fetch_sql(
+    sql: str,
+    con,
+    params: Optional[Sequence] = None,
+    chunk_rows: int = FETCH_CHUNK_ROWS,
+    spill_bytes: int = FETCH_SPILL_BYTES,
+    row_cap: int = FETCH_ROW_CAP,
+    ordered: bool = False,
+) -> FetchedData:
+    """分块执行SQL查询，优先使用SQL结果缓存
+
+    写入临时文件的大结果和被截断的结果不进入缓存：缓存中的结果总是完整的，
+    之后以更大的行数上限执行同一条SQL时不会拿到截断的数据。
+
+    Args:
+        sql: SQL查询语句
+        con: 数据库连接或SQLAlchemy engine
+        params: 查询参数
+        chunk_rows: 每次读取的行数
+        spill_bytes: 内存中保留的字节数上限
+        row_cap: 行数上限，0表示不限制
+        ordered: SQL是否按 (股票代码, 报告日) 排序（编译生成的SQL）
+
+    Returns:
+        FetchedData: 结果句柄
+    """
+    cache = get_sql_cache()
+    cached = cache.get(sql, params)
+    if cached is not None:
+        return FetchedData.from_frame(cached, row_cap, ordered=ordered)
+
+    data = collect_chunks(
+        pd.read_sql_query(sql, con, params=params, chunksize=chunk_rows),
+        spill_bytes=spill_bytes,
+        row_cap=row_cap,
+        ordered=ordered,
+    )
+    if not data.is_spilled and not data.truncated:
+        cache.put(sql, params, data.to_pandas().copy())
+    return data
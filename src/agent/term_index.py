@@ -0,0 +1,299 @@
+"""财务术语索引模块
+
+进程级共享的财务术语/别名/表结构索引：
+1、db_columns_explained.json（别名 -> 标准名）
+2、db_columns_names.json（表名 -> 列名列表）
+3、prompt/QPA_extract_prompt.yaml（查询解析prompt）
+
+以上文件在每个worker进程内只读取、解析一次，构建成不可变的 FinancialTermIndex，
+所有 QueryParserAgent 实例共享同一个索引对象；文件修改时间（mtime）变化时自动重建。
+"""
+
+import json
+import os
+import threading
+import traceback
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+import yaml
+
+# 索引依赖的源文件路径（相对于当前文件）
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_COLUMNS_EXPLAINED_PATH = os.path.join(CURRENT_DIR, "db_columns_explained.json")
+DB_COLUMNS_NAMES_PATH = os.path.join(CURRENT_DIR, "db_columns_names.json")
+QPA_EXTRACT_PROMPT_PATH = os.path.join(CURRENT_DIR, "prompt/QPA_extract_prompt.yaml")
+
+# 常用财务指标的手动映射表
+MANUAL_MAPPINGS: Mapping[str, str] = MappingProxyType({
+    "归母净利润": "归属于母公司的净利润",
+    "归属于母公司所有者的净利润": "归属于母公司的净利润",
+    "归属于母公司股东的净利润": "归属于母公司的净利润",
+    "归母净利": "归属于母公司的净利润",
+    "归属于母公司净利": "归属于母公司的净利润"
+})
+
+# prompt模板加载失败时使用的默认提示
+DEFAULT_QPA_EXTRACT_PROMPT = "请解析用户查询，提取关键信息，并返回JSON格式。"
+
+
+class ColumnTableLookup:
+    """列名 -> 所属表 的O(1)查找服务
+
+    股票代码、报告日等基础列在四张表中都存在，查找时按优先规则确定归属表：
+    调用方给出的优先表（通常是查询中其他指标已用到的表）优先，
+    否则按 db_columns_names.json 中的表顺序取第一个。
+    """
+
+    __slots__ = ("tables", "_column_tables")
+
+    def __init__(self, table_columns: Mapping[str, Iterable[str]]):
+        """根据表结构构建列名索引
+
+        Args:
+            table_columns: 表名 -> 列名列表 的映射
+        """
+        column_tables: Dict[str, list] = {}
+        for table_name, columns in table_columns.items():
+            for column in columns:
+                tables = column_tables.setdefault(column, [])
+                if table_name not in tables:
+                    tables.append(table_name)
+
+        self.tables: Tuple[str, ...] = tuple(table_columns)
+        self._column_tables: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {column: tuple(tables) for column, tables in column_tables.items()}
+        )
+
+    def __contains__(self, column_name: str) -> bool:
+        return column_name in self._column_tables
+
+    def tables_for(self, column_name: str) -> Tuple[str, ...]:
+        """返回包含该列的全部表，按表顺序排列
+
+        Args:
+            column_name: 标准化后的列名
+
+        Returns:
+            Tuple[str, ...]: 表名元组，列不存在时为空元组
+        """
+        return self._column_tables.get(column_name, ())
+
+    def is_shared(self, column_name: str) -> bool:
+        """判断列是否同时存在于多张表中"""
+        return len(self.tables_for(column_name)) > 1
+
+    def table_for(
+        self, column_name: str, preferred_tables: Optional[Iterable[str]] = None
+    ) -> Optional[str]:
+        """确定列的归属表
+
+        Args:
+            column_name: 标准化后的列名
+            preferred_tables: 可选的优先表，列存在于多张表时优先选用
+
+        Returns:
+            Optional[str]: 表名，列不存在时返回None
+        """
+        candidates = self._column_tables.get(column_name)
+        if not candidates:
+            return None
+        if len(candidates) > 1 and preferred_tables:
+            for table_name in preferred_tables:
+                if table_name in candidates:
+                    return table_name
+        return candidates[0]
+
+
+class FinancialTermIndex:
+    """不可变的财务术语索引，由同一进程内的所有解析代理共享"""
+
+    __slots__ = (
+        "aliases", "standard_terms", "table_columns", "column_lookup",
+        "qpa_extract_prompt", "qpa_extract_prompt_without_dates", "source_mtimes",
+    )
+
+    def __init__(
+        self,
+        aliases: Mapping[str, str],
+        standard_terms: FrozenSet[str],
+        table_columns: Mapping[str, Tuple[str, ...]],
+        qpa_extract_prompt: str,
+        qpa_extract_prompt_without_dates: str,
+        source_mtimes: Tuple[float, ...],
+    ):
+        """初始化索引
+
+        Args:
+            aliases: 别名 -> 标准名 的只读映射
+            standard_terms: 全部标准名（含数据库真实列名）
+            table_columns: 表名 -> 列名元组 的只读映射
+            qpa_extract_prompt: 构建好的查询解析系统prompt
+            qpa_extract_prompt_without_dates: 报告日区间已知时使用的精简prompt
+            source_mtimes: 构建时各源文件的修改时间，用于判断是否需要重建
+        """
+        object.__setattr__(self, "aliases", aliases)
+        object.__setattr__(self, "standard_terms", standard_terms)
+        object.__setattr__(self, "table_columns", table_columns)
+        object.__setattr__(self, "column_lookup", ColumnTableLookup(table_columns))
+        object.__setattr__(self, "qpa_extract_prompt", qpa_extract_prompt)
+        object.__setattr__(
+            self, "qpa_extract_prompt_without_dates", qpa_extract_prompt_without_dates
+        )
+        object.__setattr__(self, "source_mtimes", source_mtimes)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FinancialTermIndex 是只读对象")
+
+
+def _source_mtimes() -> Tuple[float, ...]:
+    """读取索引源文件的修改时间，文件不存在时记为0"""
+    mtimes = []
+    for path in (
+        DB_COLUMNS_EXPLAINED_PATH, DB_COLUMNS_NAMES_PATH, QPA_EXTRACT_PROMPT_PATH
+    ):
+        try:
+            mtimes.append(os.path.getmtime(path))
+        except OSError:
+            mtimes.append(0.0)
+    return tuple(mtimes)
+
+
+def _load_aliases(path: str) -> Dict[str, str]:
+    """加载别名映射（db_columns_explained.json 的 aliases 字段）"""
+    aliases = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            db_columns = json.load(f)
+        # 检查顶层结构并访问 'aliases' 键下的嵌套字典
+        if isinstance(db_columns, dict) and 'aliases' in db_columns:
+            alias_mapping = db_columns['aliases']
+            if isinstance(alias_mapping, dict):
+                for alias, standard_name in alias_mapping.items():
+                    if isinstance(standard_name, str):  # 确保值是字符串
+                        aliases[alias] = standard_name
+            else:
+                print(f"Warning: Expected 'aliases' key in {path} to contain a dictionary, but found {type(alias_mapping)}.")
+        else:
+            print(f"Warning: Expected {path} to be a JSON object with an 'aliases' key.")
+    except FileNotFoundError:
+        print(f"Error: Financial terms file not found at {path}")
+    except json.JSONDecodeError:
+        print(f"Error: Failed to decode JSON from {path}")
+    except Exception as e:
+        print(f"加载金融术语时发生意外错误: {str(e)}")
+        print(traceback.format_exc())
+    return aliases
+
+
+def _load_table_columns(path: str) -> Dict[str, Tuple[str, ...]]:
+    """加载数据库表结构信息（db_columns_names.json）"""
+    table_columns = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for table_name, table_info in data.items():
+            if isinstance(table_info, dict):
+                table_columns[table_name] = tuple(table_info.get("columns", []))
+    except Exception as e:
+        print(f"加载数据库表结构信息失败: {str(e)}")
+    return table_columns
+
+
+def _build_qpa_extract_prompt(yaml_content: Dict, include_dates: bool) -> str:
+    """由prompt模板构建系统prompt
+
+    Args:
+        yaml_content: QPA_extract_prompt.yaml 的内容
+        include_dates: 是否保留报告日区间相关的说明；报告日已在本地解析时
+            去掉这部分说明，缩短prompt
+
+    Returns:
+        str: 系统prompt
+    """
+    system_prompt = yaml_content['system_prompt']
+    return_format = yaml_content['return_format']
+    if not include_dates:
+        system_prompt = "\n".join(
+            line for line in system_prompt.splitlines()
+            if not line.strip().startswith("1. 报告日区间")
+        )
+        return_format = "\n".join(
+            line for line in return_format.splitlines()
+            if not line.strip().startswith("报告日区间")
+        )
+    return (
+        f"{system_prompt}\n\n"
+        f"请返回结果，严格遵守返回格式如下：\n"
+        f"{return_format}"
+    )
+
+
+def _load_qpa_extract_prompts(path: str) -> Tuple[str, str]:
+    """加载查询解析prompt模板
+
+    Returns:
+        Tuple[str, str]: (完整prompt, 不含报告日区间说明的精简prompt)
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            yaml_content = yaml.safe_load(f)
+        return (
+            _build_qpa_extract_prompt(yaml_content, include_dates=True),
+            _build_qpa_extract_prompt(yaml_content, include_dates=False),
+        )
+    except Exception as e:
+        print(f"加载prompt模板失败: {str(e)}")
+        return DEFAULT_QPA_EXTRACT_PROMPT, DEFAULT_QPA_EXTRACT_PROMPT
+
+
+def build_term_index() -> FinancialTermIndex:
+    """从磁盘读取源文件并构建一个新的术语索引
+
+    Returns:
+        FinancialTermIndex: 新构建的只读索引
+    """
+    # 先取mtime再读文件，读取期间若文件被修改，下次访问会再次重建
+    mtimes = _source_mtimes()
+    aliases = _load_aliases(DB_COLUMNS_EXPLAINED_PATH)
+    table_columns = _load_table_columns(DB_COLUMNS_NAMES_PATH)
+
+    # 标准名包括别名映射的目标和数据库中真实存在的列名
+    standard_terms = set(aliases.values())
+    for columns in table_columns.values():
+        standard_terms.update(columns)
+
+    qpa_extract_prompt, qpa_extract_prompt_without_dates = (
+        _load_qpa_extract_prompts(QPA_EXTRACT_PROMPT_PATH)
+    )
+
+    return FinancialTermIndex(
+        aliases=MappingProxyType(aliases),
+        standard_terms=frozenset(standard_terms),
+        table_columns=MappingProxyType(table_columns),
+        qpa_extract_prompt=qpa_extract_prompt,
+        qpa_extract_prompt_without_dates=qpa_extract_prompt_without_dates,
+        source_mtimes=mtimes,
+    )
+
+
+_term_index: Optional[FinancialTermIndex] = None
+_term_index_lock = threading.Lock()
+
+
+def get_term_index() -> FinancialTermIndex:
+    """获取进程内共享的术语索引，源文件mtime变化时重建
+
+    Returns:
+        FinancialTermIndex: 当前有效的只读索引
+    """
+    global _term_index
+    index = _term_index
+    if index is not None and index.source_mtimes == _source_mtimes():
+        return index
+
+    with _term_index_lock:
+        # 双重检查，避免多个线程同时重建
+        if _term_index is None or _term_index.source_mtimes != _source_mtimes():
+            _term_index = build_term_index()
+        return _term_index
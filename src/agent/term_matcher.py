@@ -0,0 +1,252 @@
+"""财务术语多模式匹配模块
+
+基于 Aho-Corasick 自动机，把术语索引中的全部别名、标准名和手动映射编译成一个
+匹配器，对原始查询做一次线性扫描即可抽取出其中出现的所有财务指标。
+
+匹配结果附带置信度：查询中除财务指标、已在本地解析的片段（日期、股票名称等）
+和常见的虚词/语气词外，剩余未被解释的字符越少，置信度越高。解析代理据此决定
+是否可以跳过LLM调用直接返回本地解析结果。
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .term_index import FinancialTermIndex, MANUAL_MAPPINGS, get_term_index
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from term_index import FinancialTermIndex, MANUAL_MAPPINGS, get_term_index
+
+# 查询中常见的、不影响解析结果的虚词和描述性词语（按长度降序匹配）
+FILLER_WORDS = (
+    "上市公司", "是多少", "有多少", "报告期", "每季度", "半年报", "一季报", "三季报",
+    "帮我", "请问", "查询", "查找", "查看", "获取", "提取", "列出", "给出", "给我",
+    "显示", "展示", "看看", "一下", "数据", "情况", "多少", "每年", "期间", "之间",
+    "所有", "全部", "公司", "股票", "年度", "年报", "季度", "季报", "中报", "财务",
+    "指标", "分别", "以及", "A股", "a股",
+    "请", "的", "和", "与", "及", "年", "从", "到", "至", "各", "是", "了", "吗",
+)
+
+_FILLER_PATTERN = re.compile(
+    "|".join(re.escape(w) for w in sorted(FILLER_WORDS, key=len, reverse=True))
+)
+# 数字、字母以外的标点、空白等不计入需要解释的字符
+_NON_CONTENT_PATTERN = re.compile(r"[\s\d\W_]+")
+
+
+class TermMatch(NamedTuple):
+    """一次术语匹配"""
+    start: int
+    end: int
+    text: str
+    standard_name: str
+
+
+class TermExtraction(NamedTuple):
+    """一次查询的术语抽取结果"""
+    indicators: List[str]
+    matches: List[TermMatch]
+    confidence: float
+    unexplained: str
+
+
+class AhoCorasickAutomaton:
+    """Aho-Corasick 多模式字符串匹配自动机"""
+
+    def __init__(self, patterns: Iterable[str]):
+        """编译模式串
+
+        Args:
+            patterns: 需要匹配的模式串
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态上结束的全部模式串长度（包含经由失败链接继承的）
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build_failure_links()
+
+    def _add(self, pattern: str) -> None:
+        """把一个模式串加入trie"""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        if len(pattern) not in self._output[state]:
+            self._output[state] = self._output[state] + (len(pattern),)
+
+    def _build_failure_links(self) -> None:
+        """按BFS顺序计算失败链接并合并输出"""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_target = self._goto[fail].get(char, 0)
+                if fail_target == next_state:
+                    fail_target = 0
+                self._fail[next_state] = fail_target
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[fail_target]
+                )
+
+    @property
+    def state_count(self) -> int:
+        """自动机状态数"""
+        return len(self._goto)
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int]]:
+        """扫描文本，产出所有匹配的 (起始位置, 结束位置)
+
+        Args:
+            text: 待扫描文本
+
+        Yields:
+            Tuple[int, int]: 匹配片段的左闭右开区间
+        """
+        state = 0
+        goto = self._goto
+        fail = self._fail
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length in self._output[state]:
+                yield index + 1 - length, index + 1
+
+    def find_longest(self, text: str) -> List[Tuple[int, int]]:
+        """返回从左到右、互不重叠的最长匹配
+
+        Args:
+            text: 待扫描文本
+
+        Returns:
+            List[Tuple[int, int]]: 匹配片段的左闭右开区间
+        """
+        candidates = sorted(
+            self.iter_matches(text), key=lambda span: (span[0], span[0] - span[1])
+        )
+        selected = []
+        last_end = 0
+        for start, end in candidates:
+            if start >= last_end:
+                selected.append((start, end))
+                last_end = end
+        return selected
+
+
+class FinancialTermMatcher:
+    """由术语索引编译而成的财务指标抽取器"""
+
+    def __init__(self, term_index: FinancialTermIndex):
+        """编译术语索引中的全部名称
+
+        Args:
+            term_index: 进程内共享的术语索引
+        """
+        self.term_index = term_index
+
+        # 与 QueryParserAgent._match_financial_term 的优先级保持一致：
+        # 手动映射 > 标准名 > 别名
+        term_to_standard: Dict[str, str] = {}
+        for alias, standard_name in term_index.aliases.items():
+            term_to_standard[alias] = standard_name
+        for standard_name in term_index.standard_terms:
+            term_to_standard[standard_name] = standard_name
+        for term, standard_name in MANUAL_MAPPINGS.items():
+            # 映射目标本身是别名时继续映射到数据库列名
+            if standard_name not in term_index.column_lookup:
+                standard_name = term_index.aliases.get(standard_name, standard_name)
+            term_to_standard[term] = standard_name
+        self._term_to_standard = term_to_standard
+
+        # 四张表都有的基础列（股票代码、报告日等）总会被抽取，不作为财务指标
+        all_tables = set(term_index.column_lookup.tables)
+        self._base_columns = frozenset(
+            column for column in term_index.standard_terms
+            if set(term_index.column_lookup.tables_for(column)) == all_tables
+        )
+
+        self._automaton = AhoCorasickAutomaton(term_to_standard)
+
+    def extract(
+        self, query: str, resolved_spans: Sequence[Tuple[int, int]] = ()
+    ) -> TermExtraction:
+        """抽取查询中的财务指标并计算置信度
+
+        Args:
+            query: 用户原始查询
+            resolved_spans: 已由其他本地解析器（日期、股票名称等）解释的片段
+
+        Returns:
+            TermExtraction: 标准化后的指标（去重、保序）、匹配明细和置信度
+        """
+        # 已解释的片段不参与术语匹配，避免把股票名称中的字误识别为指标
+        masked = list(query)
+        for start, end in resolved_spans:
+            for index in range(start, end):
+                masked[index] = " "
+        masked_query = "".join(masked)
+
+        matches = []
+        indicators = []
+        for start, end in self._automaton.find_longest(masked_query):
+            text = masked_query[start:end]
+            standard_name = self._term_to_standard[text]
+            matches.append(TermMatch(start, end, text, standard_name))
+            if (
+                standard_name not in self._base_columns
+                and standard_name not in indicators
+            ):
+                indicators.append(standard_name)
+            for index in range(start, end):
+                masked[index] = " "
+
+        unexplained = _FILLER_PATTERN.sub("", "".join(masked))
+        unexplained = _NON_CONTENT_PATTERN.sub("", unexplained)
+        content_length = len(_NON_CONTENT_PATTERN.sub("", query))
+
+        if not indicators or not content_length:
+            confidence = 0.0
+        else:
+            confidence = 1.0 - len(unexplained) / content_length
+        return TermExtraction(indicators, matches, confidence, unexplained)
+
+
+_term_matcher: Optional[FinancialTermMatcher] = None
+_term_matcher_lock = threading.Lock()
+
+
+def get_term_matcher() -> FinancialTermMatcher:
+    """获取进程内共享的术语匹配器，术语索引重建后随之重新编译
+
+    Returns:
+        FinancialTermMatcher: 与当前术语索引对应的匹配器
+    """
+    global _term_matcher
+    term_index = get_term_index()
+    matcher = _term_matcher
+    if matcher is not None and matcher.term_index is term_index:
+        return matcher
+
+    with _term_matcher_lock:
+        if _term_matcher is None or _term_matcher.term_index is not term_index:
+            _term_matcher = FinancialTermMatcher(term_index)
+        return _term_matcher
@@ -0,0 +1,393 @@
+"""财务数据宽表模块
+
+很多问题同时需要利润表、资产负债表、现金流量表和比率表的指标，编译SQL和 CodeAgent
+都要在几百列的表之间按 (股票代码, 报告日) 做多表 LEFT JOIN。本模块在财务数据库中
+物化两张预先连接好的宽表：
+- financial_wide：四张表的全部列
+- financial_wide_hot：只包含最常用的约50个指标（HOT_METRICS），行更窄，扫描更快
+
+宽表的行是四张表 (股票代码, 报告日) 的并集；股票名称、申万一级、申万二级取各表中
+第一个非空值；has_<表名> 列标记该表中是否有这一行。多张表中重名的列（如 未分配利润、
+基本每股收益）第一次出现时保留原名，之后加 _<表名> 后缀，对应关系记录在清单文件中。
+
+宽表与构建时的数据版本绑定：数据库更新后、重新构建前，编译SQL自动回退到多表JOIN。
+宽表在数据库文件的副本上构建，完成后整体替换原文件（见 financial_db.rebuild_copy），
+运行中的 worker 不受影响；宽表包含四张表的全部列，数据库文件大小约翻倍，构建期间
+还需要再预留一份数据库大小的磁盘空间。
+数据更新后执行（在 src 目录下）：
+    python -m agent.wide_table refresh   # 数据版本变化时才重建
+    python -m agent.wide_table build     # 强制重建
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 修改导入方式为条件导入
+try:
+    # 当作为模块导入时使用相对导入
+    from .db_indexes import ensure_indexes, table_columns
+    from .financial_db import (
+        FINANCIAL_DB_PATH, FINANCIAL_TABLES, ROOT_DIR, get_data_stamp, rebuild_copy
+    )
+    from .sql_compiler import JOIN_KEYS, CompiledQuery, quote_identifier, render_wide_sql
+except ImportError:
+    # 当直接运行脚本时使用绝对导入
+    from db_indexes import ensure_indexes, table_columns
+    from financial_db import (
+        FINANCIAL_DB_PATH, FINANCIAL_TABLES, ROOT_DIR, get_data_stamp, rebuild_copy
+    )
+    from sql_compiler import JOIN_KEYS, CompiledQuery, quote_identifier, render_wide_sql
+
+WIDE_TABLE = "financial_wide"
+WIDE_HOT_TABLE = "financial_wide_hot"
+WIDE_TABLE_MANIFEST = os.getenv(
+    "WIDE_TABLE_MANIFEST", os.path.join(ROOT_DIR, "data/wide_table.json")
+)
+# 取各表第一个非空值的列
+COALESCED_COLUMNS = ("股票名称", "申万一级", "申万二级")
+
+# 最常用的指标：(表名, 列名)
+HOT_METRICS: Tuple[Tuple[str, str], ...] = (
+    ("income_table", "营业总收入"),
+    ("income_table", "营业收入"),
+    ("income_table", "营业总成本"),
+    ("income_table", "营业成本"),
+    ("income_table", "销售费用"),
+    ("income_table", "管理费用"),
+    ("income_table", "研发费用"),
+    ("income_table", "财务费用"),
+    ("income_table", "投资收益"),
+    ("income_table", "营业利润"),
+    ("income_table", "利润总额"),
+    ("income_table", "所得税费用"),
+    ("income_table", "净利润"),
+    ("income_table", "归属于母公司所有者的净利润"),
+    ("income_table", "少数股东损益"),
+    ("balance_table", "货币资金"),
+    ("balance_table", "应收账款"),
+    ("balance_table", "存货"),
+    ("balance_table", "流动资产合计"),
+    ("balance_table", "固定资产净额"),
+    ("balance_table", "在建工程"),
+    ("balance_table", "无形资产"),
+    ("balance_table", "商誉"),
+    ("balance_table", "资产总计"),
+    ("balance_table", "短期借款"),
+    ("balance_table", "应付账款"),
+    ("balance_table", "流动负债合计"),
+    ("balance_table", "长期借款"),
+    ("balance_table", "负债合计"),
+    ("balance_table", "未分配利润"),
+    ("balance_table", "归属于母公司股东权益合计"),
+    ("balance_table", "所有者权益(或股东权益)合计"),
+    ("cashflow_table", "销售商品、提供劳务收到的现金"),
+    ("cashflow_table", "经营活动产生的现金流量净额"),
+    ("cashflow_table", "购建固定资产、无形资产和其他长期资产所支付的现金"),
+    ("cashflow_table", "投资活动产生的现金流量净额"),
+    ("cashflow_table", "筹资活动产生的现金流量净额"),
+    ("cashflow_table", "现金及现金等价物净增加额"),
+    ("ratio_table", "基本每股收益"),
+    ("ratio_table", "每股净资产"),
+    ("ratio_table", "每股经营现金流"),
+    ("ratio_table", "净资产收益率(ROE)"),
+    ("ratio_table", "总资产报酬率(ROA)"),
+    ("ratio_table", "毛利率"),
+    ("ratio_table", "销售净利率"),
+    ("ratio_table", "期间费用率"),
+    ("ratio_table", "资产负债率"),
+    ("ratio_table", "营业总收入增长率"),
+    ("ratio_table", "归属母公司净利润增长率"),
+    ("ratio_table", "流动比率"),
+    ("ratio_table", "速动比率"),
+    ("ratio_table", "存货周转率"),
+    ("ratio_table", "应收账款周转率"),
+    ("ratio_table", "总资产周转率"),
+)
+
+
+def presence_column(table: str) -> str:
+    """标记某张表中存在该行的列名"""
+    return f"has_{table}"
+
+
+def wide_column_map(source_columns: Dict[str, Sequence[str]]) -> Dict[str, Dict[str, str]]:
+    """计算各表的列在宽表中的列名
+
+    连接键和 COALESCED_COLUMNS 不属于任何一张表；其余列第一次出现时保留原名，
+    在之后的表中重复出现时加 _<表名> 后缀。
+
+    Args:
+        source_columns: 表名 -> 列名列表（按 FINANCIAL_TABLES 的顺序）
+
+    Returns:
+        Dict[str, Dict[str, str]]: 表名 -> {原列名: 宽表列名}
+    """
+    used = set(JOIN_KEYS) | set(COALESCED_COLUMNS)
+    used.update(presence_column(table) for table in source_columns)
+    column_map: Dict[str, Dict[str, str]] = {}
+    for table, columns in source_columns.items():
+        mapping = {}
+        for column in columns:
+            if column in JOIN_KEYS or column in COALESCED_COLUMNS:
+                continue
+            wide_column = column if column not in used else f"{column}_{table}"
+            used.add(wide_column)
+            mapping[column] = wide_column
+        column_map[table] = mapping
+    return column_map
+
+
+def hot_column_map(
+    column_map: Dict[str, Dict[str, str]], hot_metrics: Iterable[Tuple[str, str]] = HOT_METRICS
+) -> Dict[str, Dict[str, str]]:
+    """宽表列映射中属于常用指标的部分（数据库中不存在的指标跳过）"""
+    hot: Dict[str, Dict[str, str]] = {table: {} for table in column_map}
+    for table, column in hot_metrics:
+        if column in column_map.get(table, {}):
+            hot[table][column] = column_map[table][column]
+    return hot
+
+
+def _wide_select_sql(column_map: Dict[str, Dict[str, str]]) -> str:
+    """以四张表 (股票代码, 报告日) 的并集为主，LEFT JOIN 每张表"""
+    tables = list(column_map)
+    aliases = {table: f"t{index}" for index, table in enumerate(tables)}
+    key_list = ", ".join(quote_identifier(key) for key in JOIN_KEYS)
+    keys = " UNION ".join(
+        f"SELECT {key_list} FROM {quote_identifier(table)}" for table in tables
+    )
+
+    select_items = [f"k.{quote_identifier(key)}" for key in JOIN_KEYS]
+    for column in COALESCED_COLUMNS:
+        values = ", ".join(f"{aliases[table]}.{quote_identifier(column)}" for table in tables)
+        select_items.append(f"COALESCE({values}) AS {quote_identifier(column)}")
+    for table in tables:
+        select_items.append(
+            f"({aliases[table]}.{quote_identifier(JOIN_KEYS[0])} IS NOT NULL) "
+            f"AS {quote_identifier(presence_column(table))}"
+        )
+        select_items.extend(
+            f"{aliases[table]}.{quote_identifier(column)} AS {quote_identifier(wide_column)}"
+            for column, wide_column in column_map[table].items()
+        )
+
+    joins = []
+    for table in tables:
+        alias = aliases[table]
+        conditions = " AND ".join(
+            f"{alias}.{quote_identifier(key)} = k.{quote_identifier(key)}" for key in JOIN_KEYS
+        )
+        joins.append(f"LEFT JOIN {quote_identifier(table)} AS {alias} ON {conditions}")
+    return (
+        "SELECT " + ",\n  ".join(select_items)
+        + f"\nFROM ({keys}) AS k\n" + "\n".join(joins)
+    )
+
+
+def _hot_select_sql(hot_map: Dict[str, Dict[str, str]]) -> str:
+    """从全量宽表中选出常用指标列"""
+    columns = list(JOIN_KEYS) + list(COALESCED_COLUMNS)
+    columns.extend(presence_column(table) for table in hot_map)
+    columns.extend(
+        wide_column for mapping in hot_map.values() for wide_column in mapping.values()
+    )
+    return (
+        "SELECT " + ", ".join(quote_identifier(column) for column in columns)
+        + f" FROM {quote_identifier(WIDE_TABLE)}"
+    )
+
+
+def _replace_table(conn: sqlite3.Connection, table: str, select_sql: str) -> None:
+    """先写入临时表，再在同一事务中替换旧表"""
+    tmp_table = f"{table}__new"
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(tmp_table)}")
+    conn.execute(f"CREATE TABLE {quote_identifier(tmp_table)} AS {select_sql}")
+    conn.commit()
+    conn.execute("BEGIN")
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+    conn.execute(
+        f"ALTER TABLE {quote_identifier(tmp_table)} RENAME TO {quote_identifier(table)}"
+    )
+    conn.commit()
+
+
+def build_wide_tables(db_path: str = FINANCIAL_DB_PATH, manifest_path: str = WIDE_TABLE_MANIFEST) -> Dict:
+    """在数据库副本上物化宽表、建索引，替换原文件后写入清单文件
+
+    Args:
+        db_path: 数据库文件路径
+        manifest_path: 清单文件路径
+
+    Returns:
+        Dict: 清单内容
+    """
+    with rebuild_copy(db_path) as conn:
+        source_columns = {}
+        for table in FINANCIAL_TABLES:
+            columns = table_columns(conn, table)
+            if columns:
+                source_columns[table] = columns
+        column_map = wide_column_map(source_columns)
+        hot_map = hot_column_map(column_map)
+        _replace_table(conn, WIDE_TABLE, _wide_select_sql(column_map))
+        _replace_table(conn, WIDE_HOT_TABLE, _hot_select_sql(hot_map))
+        ensure_indexes(conn, (WIDE_TABLE, WIDE_HOT_TABLE))
+        row_count = conn.execute(
+            f"SELECT COUNT(*) FROM {quote_identifier(WIDE_TABLE)}"
+        ).fetchone()[0]
+
+    # 替换数据库文件会改变数据版本，数据版本在替换完成后读取
+    manifest = {
+        "data_stamp": get_data_stamp(),
+        "row_count": row_count,
+        "columns": column_map,
+        "hot_columns": hot_map,
+    }
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+class WideTables:
+    """已构建的宽表，把多表编译结果改写为单表查询"""
+
+    def __init__(self, manifest_path: str = WIDE_TABLE_MANIFEST):
+        """
+        Args:
+            manifest_path: build_wide_tables 写入的清单文件
+
+        Raises:
+            FileNotFoundError: 尚未构建宽表时抛出
+        """
+        self.manifest_path = manifest_path
+        self.manifest_mtime = os.path.getmtime(manifest_path)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.data_stamp = manifest["data_stamp"]
+        self.column_map: Dict[str, Dict[str, str]] = manifest["columns"]
+        self.hot_map: Dict[str, Dict[str, str]] = manifest["hot_columns"]
+
+    def is_current(self) -> bool:
+        """宽表是否与当前数据库版本一致"""
+        return self.data_stamp == get_data_stamp()
+
+    def is_rebuilt(self) -> bool:
+        """宽表是否在加载之后被重新构建"""
+        try:
+            return os.path.getmtime(self.manifest_path) != self.manifest_mtime
+        except OSError:
+            return False
+
+    @staticmethod
+    def _covers(column_map: Dict[str, Dict[str, str]], compiled: CompiledQuery) -> bool:
+        return all(
+            column in column_map.get(table, {})
+            for table, columns in compiled.table_columns.items()
+            for column in columns
+        )
+
+    def table_for(self, compiled: CompiledQuery) -> Optional[Tuple[str, Dict[str, Dict[str, str]]]]:
+        """能覆盖全部指标的最窄的宽表及其列映射，都不能覆盖时返回None"""
+        if self._covers(self.hot_map, compiled):
+            return WIDE_HOT_TABLE, self.hot_map
+        if self._covers(self.column_map, compiled):
+            return WIDE_TABLE, self.column_map
+        return None
+
+    def rewrite(self, compiled: CompiledQuery) -> CompiledQuery:
+        """把需要多表连接的编译结果改写为宽表上的单表查询
+
+        只涉及一张表的查询本来就不需要连接，保持不变；宽表过期时也保持不变。
+        """
+        if len(compiled.table_columns) < 2 or not self.is_current():
+            return compiled
+        target = self.table_for(compiled)
+        if target is None:
+            return compiled
+        table, column_map = target
+        sql, params = render_wide_sql(
+            compiled, table, column_map, presence_column(compiled.base_table)
+        )
+        return compiled._replace(sql=sql, params=params)
+
+    def format(self, indicators: Dict[str, List[str]]) -> str:
+        """输出给LLM的宽表说明
+
+        Args:
+            indicators: 表名 -> 相关的原列名（来自表结构摘要）
+
+        Returns:
+            str: 宽表说明，宽表过期时为空字符串
+        """
+        if not self.is_current():
+            return ""
+        lines = [
+            f"\n宽表: {WIDE_HOT_TABLE}（常用指标）、{WIDE_TABLE}（全部指标）",
+            "已按 (股票代码, 报告日) 连接四张表，跨表指标可以直接从宽表查询，不需要JOIN。",
+            "各表中重名的列在宽表中加了 _表名 后缀。",
+        ]
+        relevant = [
+            (table, column) for table, columns in indicators.items() for column in columns
+            if column in self.column_map.get(table, {})
+        ]
+        if relevant:
+            lines.append("相关列在宽表中的列名:")
+            for table, column in relevant:
+                hot = "，在常用指标宽表中" if column in self.hot_map.get(table, {}) else ""
+                lines.append(f"  - {table}.{column} -> {self.column_map[table][column]}{hot}")
+        return "\n".join(lines)
+
+
+_wide_tables: Optional[WideTables] = None
+_wide_tables_lock = threading.Lock()
+
+
+def get_wide_tables() -> Optional[WideTables]:
+    """获取进程内共享的宽表信息，尚未构建时返回None；重新构建后自动重新加载"""
+    global _wide_tables
+    wide_tables = _wide_tables
+    if wide_tables is not None and not wide_tables.is_rebuilt():
+        return wide_tables
+    with _wide_tables_lock:
+        if _wide_tables is None or _wide_tables.is_rebuilt():
+            try:
+                _wide_tables = WideTables()
+            except (OSError, ValueError, KeyError):
+                _wide_tables = None
+        return _wide_tables
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="构建财务数据宽表")
+    parser.add_argument("command", choices=("build", "refresh"))
+    parser.add_argument("--db", default=FINANCIAL_DB_PATH, help="数据库文件路径")
+    args = parser.parse_args(argv)
+
+    if args.command == "refresh":
+        wide_tables = get_wide_tables()
+        if wide_tables is not None and wide_tables.is_current():
+            print("宽表与当前数据版本一致，无需重建")
+            return 0
+
+    start = time.perf_counter()
+    manifest = build_wide_tables(args.db)
+    hot_count = sum(len(columns) for columns in manifest["hot_columns"].values())
+    print(
+        f"{WIDE_TABLE}: {manifest['row_count']} 行，"
+        f"{WIDE_HOT_TABLE}: {hot_count} 个常用指标，"
+        f"耗时 {time.perf_counter() - start:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -36,6 +36,8 @@ async def create_or_update_job(
             "result_path": job_data.result_path,
             "result_content": job_data.result_content,
             "error_message": job_data.error_message,
+            "route": job_data.route,
+            "latency_saved_ms": job_data.latency_saved_ms,
         }
         # Filter out None values to rely on database defaults where applicable
         creation_data = {k: v for k, v in creation_data.items() if v is not None}
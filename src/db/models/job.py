@@ -26,6 +26,9 @@ class Job(Base):
     result_content = Column(Text, nullable=True) # Store text result or maybe JSON
     error_message = Column(Text, nullable=True)
 
+    route = Column(String(50), nullable=True) # 'direct_table' or 'pandasai'
+    latency_saved_ms = Column(Integer, nullable=True) # Estimated time saved by skipping PandasAI
+
     # Optional: Define relationships if needed later
     # user = relationship("User")
     # conversation = relationship("Conversation") 
\ No newline at end of file
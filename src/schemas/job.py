@@ -23,6 +23,8 @@ class JobBase(BaseModel):
     result_path: Optional[str] = None
     result_content: Optional[str] = None # Consider Text or Any for flexibility
     error_message: Optional[str] = None
+    route: Optional[str] = None # 'direct_table' or 'pandasai'
+    latency_saved_ms: Optional[int] = None
 
 
 # Schema for creating/updating a job record in the DB (often done internally by the task)
@@ -37,6 +39,8 @@ class JobUpdate(BaseModel):
     result_path: Optional[str] = None
     result_content: Optional[str] = None # Consider Text or Any
     error_message: Optional[str] = None
+    route: Optional[str] = None
+    latency_saved_ms: Optional[int] = None
     # Added query_text as it might be set during creation via update mechanism
     query_text: Optional[str] = None
 
@@ -3,6 +3,7 @@ Celery应用模块，用于配置和创建Celery实例
 """
 
 from celery import Celery
+from celery.signals import worker_process_init
 import sys
 import os
 
@@ -40,6 +41,25 @@ celery_app.conf.update(
 # 自动发现任务
 celery_app.autodiscover_tasks(['tasks'])
 
+
+@worker_process_init.connect
+def preload_agent_indexes(**kwargs):
+    """worker子进程启动时预加载查询解析所需的共享索引"""
+    from agent.term_matcher import get_term_matcher
+    from agent.stock_resolver import get_stock_resolver
+    from agent.industry_resolver import get_industry_resolver
+    get_term_matcher()
+    get_stock_resolver()
+    get_industry_resolver()
+
+
+@worker_process_init.connect
+def preload_data_fetcher(**kwargs):
+    """worker子进程启动时创建共享的DataFetcherAgent（LLM模型、prompt模板），任务之间复用"""
+    from agent.DataFetcherAgent import get_data_fetcher
+    get_data_fetcher()
+
+
 # 显式导入任务模块以确保任务被注册 - 不再需要，autodiscover会处理
 # import tasks.financial_query
 
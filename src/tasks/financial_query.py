@@ -5,10 +5,12 @@
 import os
 import sys
 import json
+import time
 import pandas as pd
 from datetime import datetime
 from typing import Dict, Any, Optional
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from celery import Task
 import asyncio
 from sqlalchemy import text
@@ -30,8 +32,29 @@ from schemas.message import MessageCreate
 
 # 导入工作流组件
 from agent.QueryParserAgent import query_parser_agent
-from agent.DataFetcherAgent import DataFetcherAgent
+from agent.DataFetcherAgent import DataFetcherAgent, get_data_fetcher
 from agent.PandasAIAgent import PandasAIAgent
+from agent.query_router import (
+    ROUTE_DIRECT_TABLE, ROUTE_PANDASAI, format_direct_table, route_stats
+)
+from agent.sql_compiler import fetch_stats
+from agent.result_cache import get_sql_cache
+from agent.stock_cache import get_stock_cache
+from agent.query_log import bind_job
+
+
+def _create_prepared_data_fetcher(partial_info: Dict) -> DataFetcherAgent:
+    """获取进程内共享的DataFetcherAgent并用部分解析结果预热
+    
+    Args:
+        partial_info: 股票名称和财务指标已就绪的部分解析结果
+        
+    Returns:
+        DataFetcherAgent: 已准备好的数据获取代理
+    """
+    data_fetcher = get_data_fetcher()
+    data_fetcher.prepare(partial_info)
+    return data_fetcher
 
 
 def get_timestamp() -> str:
@@ -184,7 +207,9 @@ def process_financial_query(
     async def _save_success_result_to_db(
         content: Optional[str],
         content_type: str,  # 直接使用传入的类型
-        file_path: Optional[str]  # 直接使用传入的路径
+        file_path: Optional[str],  # 直接使用传入的路径
+        route: Optional[str] = None,
+        latency_saved_ms: Optional[int] = None
     ):
         """保存成功的结果到数据库
         
@@ -192,6 +217,8 @@ def process_financial_query(
             content: AI分析的文本结果
             content_type: 最终确定的内容类型
             file_path: 关联的文件路径 (CSV 或 Plot)
+            route: 分析阶段的路由（直接返回表格或PandasAI）
+            latency_saved_ms: 跳过PandasAI估算节省的毫秒数
         """
         async with AsyncSessionLocal() as db:
             # 更新任务状态
@@ -206,7 +233,9 @@ def process_financial_query(
                     completed_at=datetime.now(),
                     result_type=content_type,  # 使用传入的类型
                     result_content=content,   # 保存文本内容
-                    result_path=file_path     # 保存文件路径 (CSV或Plot)
+                    result_path=file_path,    # 保存文件路径 (CSV或Plot)
+                    route=route,
+                    latency_saved_ms=latency_saved_ms
                 )
             )
             
@@ -278,6 +307,10 @@ def process_financial_query(
                 )
                 await db.commit()
             
+        # 解析阶段提前准备的DataFetcherAgent
+        prepare_executor = ThreadPoolExecutor(max_workers=1)
+        prepared_fetcher = {}
+        
         # 第1步：查询解析
         try:
             # 更新状态为处理中
@@ -286,9 +319,19 @@ def process_financial_query(
                 ProgressStages.QUERY_PARSE_START
             )
             
+            # 股票名称和财务指标一解析出来就在后台创建并预热DataFetcherAgent，
+            # 与LLM输出的剩余部分并行
+            def prepare_data_fetcher(partial_info):
+                if "future" not in prepared_fetcher:
+                    prepared_fetcher["future"] = prepare_executor.submit(
+                        _create_prepared_data_fetcher, partial_info
+                    )
+            
             # 进行查询解析
             query_result = query_parser_agent(
-                query, progress_callback=update_progress
+                query, 
+                progress_callback=update_progress, 
+                early_callback=prepare_data_fetcher
             )
             
             # 保存查询解析结果
@@ -311,6 +354,7 @@ def process_financial_query(
             )
             
         except Exception as e:
+            prepare_executor.shutdown(wait=False)
             error_msg = f"查询解析失败: {str(e)}"
             result['error'] = error_msg
             raise Exception(error_msg)
@@ -322,14 +366,27 @@ def process_financial_query(
                 ProgressStages.DATA_FETCH_START
             )
             
-            # 创建DataFetcherAgent并处理查询
-            data_fetcher = DataFetcherAgent()
+            # 优先使用解析阶段提前创建的DataFetcherAgent
+            data_fetcher = None
+            if "future" in prepared_fetcher:
+                try:
+                    data_fetcher = prepared_fetcher["future"].result()
+                except Exception as prepare_err:
+                    print(f"提前准备数据获取失败，重新创建: {prepare_err}")
+            prepare_executor.shutdown(wait=False)
+            if data_fetcher is None:
+                data_fetcher = get_data_fetcher()
             query_json_str = json.dumps(query_result, ensure_ascii=False)
             
-            # 获取数据
-            dataframe = data_fetcher.process_query(
-                query_json_str, progress_callback=update_progress
-            )
+            # 获取数据：大结果保存在临时文件中，按需读取
+            with bind_job(job_id):
+                fetched = data_fetcher.process_query_lazy(
+                    query_json_str, progress_callback=update_progress
+                )
+            truncation = fetched.truncation_info()
+            print(f"数据获取统计: {fetch_stats.snapshot()}")
+            print(f"SQL结果缓存统计: {get_sql_cache().snapshot()}")
+            print(f"股票分区缓存统计: {get_stock_cache().snapshot()}")
             
             # 保存数据结果
             timestamp = get_timestamp()
@@ -337,20 +394,18 @@ def process_financial_query(
                 output_dir,
                 f"{timestamp}_DFA_result.csv"
             )
-            dataframe.to_csv(dfa_output_path, index=False, encoding="utf-8")
+            fetched.to_csv(dfa_output_path, encoding="utf-8")
             
             # 更新文件和结果
             result['files']['dfa'] = [dfa_output_path]
             
             # 保存dataframe的预览信息
             preview = {
-                "columns": dataframe.columns.tolist(),
-                "shape": dataframe.shape,
-                "dtypes": {
-                    col: str(dataframe[col].dtype)
-                    for col in dataframe.columns
-                },
-                "head": dataframe.head(10).to_dict(orient="records")
+                "columns": fetched.columns,
+                "shape": fetched.shape,
+                "dtypes": fetched.dtypes,
+                "head": fetched.head(10).to_dict(orient="records"),
+                "truncation": truncation
             }
             result['results']['dfa_preview'] = preview
             
@@ -365,6 +420,62 @@ def process_financial_query(
             result['error'] = error_msg
             raise Exception(error_msg)
         
+        # 难度1的查询：取数结果直接整理成表格返回，跳过PandasAI
+        if query_result.get("路由") == ROUTE_DIRECT_TABLE:
+            try:
+                direct_start = time.perf_counter()
+                update_progress(
+                    ProgressPercentage.ANALYSIS_FORMATTING,
+                    ProgressStages.ANALYSIS_FORMATTING
+                )
+                
+                timestamp = get_timestamp()
+                table_path = os.path.join(
+                    output_dir,
+                    f"{timestamp}_PDA_dataframe.csv"
+                )
+                if fetched.is_spilled:
+                    # 结果太大时不载入内存，逐块写出
+                    fetched.to_csv(table_path, encoding='utf-8-sig')
+                    table_head = fetched.head(5)
+                else:
+                    table = format_direct_table(fetched.to_pandas())
+                    table.to_csv(table_path, index=False, encoding='utf-8-sig')
+                    table_head = table.head()
+                result['files']['dataframe'] = [table_path]
+                result['results']['pda'] = table_head.to_dict(orient='records')
+                
+                latency_saved_ms = route_stats.latency_saved_ms(
+                    time.perf_counter() - direct_start
+                )
+                route_stats.record_direct()
+                result['results']['route'] = {
+                    "route": ROUTE_DIRECT_TABLE,
+                    "latency_saved_ms": latency_saved_ms
+                }
+                
+                update_progress(
+                    ProgressPercentage.ANALYSIS_COMPLETE,
+                    ProgressStages.ANALYSIS_COMPLETE
+                )
+                direct_content = "数据已生成表格，请查看或下载文件。"
+                if truncation["truncated"]:
+                    direct_content = f"{direct_content}\n\n{truncation['message']}"
+                loop.run_until_complete(_save_success_result_to_db(
+                    direct_content,
+                    "dataframe_csv_path",
+                    table_path,
+                    route=ROUTE_DIRECT_TABLE,
+                    latency_saved_ms=latency_saved_ms
+                ))
+                
+            except Exception as e:
+                error_msg = f"整理查询结果失败: {str(e)}"
+                result['error'] = error_msg
+                raise Exception(error_msg)
+            
+            return result
+        
         # 第3步：数据分析
         try:
             update_progress(
@@ -373,11 +484,17 @@ def process_financial_query(
             )
             
             # 创建PandasAIAgent并处理数据
+            pandas_start = time.perf_counter()
             pandas_ai = PandasAIAgent()
-            pandas_ai.initialize_agent(dataframe, output_dir=output_dir)
+            pandas_ai.initialize_agent(fetched.to_pandas(), output_dir=output_dir)
             ai_result = pandas_ai.analyze(
                 query, progress_callback=update_progress
             )
+            route_stats.record_pandasai(time.perf_counter() - pandas_start)
+            result['results']['route'] = {
+                "route": ROUTE_PANDASAI,
+                "latency_saved_ms": 0
+            }
             
             # 初始化结果变量
             ai_response_content = None
@@ -485,6 +602,12 @@ def process_financial_query(
             # 注意：现在 ai_plot_path 可能在 str 分支中被赋值
             final_file_path = ai_dataframe_path or ai_plot_path
             
+            # 取数结果被截断时提示用户
+            if truncation["truncated"]:
+                ai_response_content = (
+                    f"{ai_response_content or ''}\n\n{truncation['message']}".strip()
+                )
+            
             # 更新进度为完成
             update_progress(
                 ProgressPercentage.ANALYSIS_COMPLETE,
@@ -493,7 +616,8 @@ def process_financial_query(
             
             # 将成功结果保存到数据库 using the managed loop
             loop.run_until_complete(_save_success_result_to_db(
-                ai_response_content, final_content_type, final_file_path
+                ai_response_content, final_content_type, final_file_path,
+                route=ROUTE_PANDASAI, latency_saved_ms=0
             ))
             
         except Exception as e:
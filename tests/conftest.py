@@ -0,0 +1,63 @@
+"""测试公共配置
+
+- 把 src 加入导入路径，与在 src 目录下运行各模块的方式一致
+- 在临时目录中生成一个小型财务数据库，并把数据库、缓存、日志路径指向临时目录；
+  必须在导入 agent 模块之前设置，各模块在导入时读取这些环境变量
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="fin_agent_tests_")
+TEST_DB_PATH = os.path.join(TEST_DATA_DIR, "Astock_financial_data.db")
+
+# 每张表的指标列
+TABLE_METRICS = {
+    "income_table": ("营业总收入", "营业收入", "营业成本"),
+    "balance_table": ("资产总计", "货币资金"),
+    "cashflow_table": ("经营活动产生的现金流量",),
+    "ratio_table": ("毛利率",),
+}
+# (股票代码, 股票名称, 申万一级, 申万二级, 报告年份)：000001 在2012年更名
+STOCK_ROWS = (
+    [("000001", "深发展A", "银行", "股份制银行", year) for year in (2010, 2011)]
+    + [("000001", "平安银行", "银行", "股份制银行", year) for year in range(2012, 2024)]
+    + [("600519", "贵州茅台", "食品饮料", "白酒Ⅱ", year) for year in range(2010, 2024)]
+)
+
+
+def _build_test_db(path: str) -> None:
+    conn = sqlite3.connect(path)
+    for table, metrics in TABLE_METRICS.items():
+        columns = ["股票代码", "股票名称", "申万一级", "申万二级", "报告日"] + list(metrics)
+        definitions = [f'"{c}" TEXT' for c in columns[:5]] + [f'"{c}" REAL' for c in metrics]
+        conn.execute(f"CREATE TABLE {table} ({', '.join(definitions)})")
+        rows = []
+        for code, name, sw1, sw2, year in STOCK_ROWS:
+            for quarter, month_day in enumerate(("0331", "0630", "0930", "1231"), 1):
+                seed = int(code) % 97 + year * 4 + quarter
+                rows.append(
+                    (code, name, sw1, sw2, f"{year}{month_day}")
+                    + tuple(float(seed * (i + 1)) for i in range(len(metrics)))
+                )
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+    conn.commit()
+    conn.close()
+
+
+_build_test_db(TEST_DB_PATH)
+os.environ["FINANCIAL_DB_PATH"] = TEST_DB_PATH
+os.environ.setdefault("SCHEMA_DIGEST_PATH", os.path.join(TEST_DATA_DIR, "schema_digest.json"))
+os.environ.setdefault("SQL_CACHE_DIR", os.path.join(TEST_DATA_DIR, "sql_cache"))
+os.environ.setdefault("QUERY_LOG_DIR", os.path.join(TEST_DATA_DIR, "logs"))
+os.environ.setdefault("PARQUET_DIR", os.path.join(TEST_DATA_DIR, "parquet"))
+os.environ.setdefault("FETCH_SPILL_DIR", TEST_DATA_DIR)
+# 测试环境不联网，litellm 直接使用本地的模型价格表
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
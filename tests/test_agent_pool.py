@@ -0,0 +1,38 @@
+"""代理池复用 CodeAgent 时清空状态的测试"""
+
+import pytest
+
+pytest.importorskip("smolagents")
+
+from smolagents import LiteLLMModel  # noqa: E402
+
+from agent.DataFetcherAgent import DataFetcherAgent  # noqa: E402
+
+
+def _fetcher():
+    # 只构造模型，不发送请求
+    return DataFetcherAgent(model=LiteLLMModel(model_id="deepseek/deepseek-chat", api_key="test"))
+
+
+def test_pooled_agent_does_not_leak_variables():
+    fetcher = _fetcher()
+
+    with fetcher._code_agents.lease() as (agent, _):
+        agent.state["user_df"] = "第一个任务的附加参数"
+        agent.python_executor.send_tools({**agent.tools})
+        agent.python_executor("secret = '第一个任务的结果'")
+        assert agent.python_executor.state["secret"] == "第一个任务的结果"
+        first = agent
+
+    with fetcher._code_agents.lease() as (agent, result_slot):
+        assert agent is first
+        assert agent.state == {}
+        assert "secret" not in agent.python_executor.state
+        assert result_slot.take() is None
+        # 工具在下一次 run() 时重新发送给新的执行器
+        agent.python_executor.send_tools({**agent.tools})
+        with pytest.raises(Exception):
+            agent.python_executor("print(secret)")
+        assert agent.python_executor("x = 1 + 1\nx").output == 2
+
+    assert fetcher._code_agents.snapshot()["reused"] == 1
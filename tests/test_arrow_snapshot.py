@@ -0,0 +1,39 @@
+"""Arrow 快照后端的测试"""
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from agent.arrow_snapshot import ArrowSnapshotBackend, build_snapshot  # noqa: E402
+from agent.financial_db import get_readonly_engine  # noqa: E402
+from agent.sql_compiler import compile_parsed_query  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def backend(tmp_path_factory):
+    snapshot_dir = str(tmp_path_factory.mktemp("arrow"))
+    build_snapshot(snapshot_dir)
+    return ArrowSnapshotBackend(snapshot_dir)
+
+
+@pytest.mark.parametrize("parsed", [
+    {
+        "需要从sql抽取的财务指标": ["营业收入来自:income_table", "毛利率来自:ratio_table"],
+        "筛选的股票名称": "平安银行",
+        "报告日区间": "20100101-20131231",
+    },
+    {
+        "需要从sql抽取的财务指标": ["资产总计来自:balance_table", "营业成本来自:income_table"],
+        "行业名称": "白酒",
+        "报告日区间": "20230101-20231231",
+    },
+])
+def test_fetch_matches_sql(backend, parsed):
+    compiled = compile_parsed_query(parsed)
+    expected = pd.read_sql_query(compiled.sql, get_readonly_engine(), params=compiled.params)
+
+    result = backend.fetch(compiled)
+
+    assert len(result) == len(expected) > 0
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
@@ -0,0 +1,72 @@
+"""DataFetcherAgent 并发取数测试
+
+用桩 CodeAgent 代替LLM：它从prompt中取出请求编号，随机延迟后通过绑定的 sql_query
+工具执行一条只返回该编号的SQL；一部分尝试故意不调用工具，模拟失败后重试。
+在线程池模式下并发处理一批请求，检查每个请求拿到的结果都属于它自己，
+并且失败的尝试不会让上一次的结果被当作本次结果返回。
+"""
+
+import random
+import re
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("smolagents")
+
+from agent.DataFetcherAgent import DataFetcherAgent  # noqa: E402
+
+REQUEST_COUNT = 200
+# 桩 CodeAgent 不调用工具（模拟一次失败的尝试）的概率
+FAILURE_RATE = 0.2
+
+_REQUEST_ID = re.compile(r"REQ-(\d+)")
+
+
+class StubCodeAgent:
+    """从prompt中读取请求编号并通过 sql_query 工具取回它的桩 CodeAgent"""
+
+    def __init__(self, sql_query_tool):
+        self.sql_query_tool = sql_query_tool
+
+    def run(self, prompt: str) -> str:
+        request_id = _REQUEST_ID.search(prompt).group(1)
+        time.sleep(random.uniform(0, 0.005))
+        if random.random() < FAILURE_RATE:
+            return "没有生成可执行的SQL"
+        self.sql_query_tool(
+            f"SELECT '{request_id}' AS request_id, {threading.get_ident()} AS thread_id"
+        )
+        time.sleep(random.uniform(0, 0.005))
+        return "完成"
+
+
+class StubDataFetcherAgent(DataFetcherAgent):
+    """使用桩 CodeAgent 的数据获取代理"""
+
+    def datafetcher_create_agent(self, sql_query_tool) -> StubCodeAgent:
+        return StubCodeAgent(sql_query_tool)
+
+    def _log_query(self, query, result, retry_count=0, **fields):
+        pass
+
+    def _log_error(self, query, error, retry_count=0, **fields):
+        pass
+
+
+def test_each_request_gets_its_own_result():
+    # 失败的尝试都会重试，重试次数足够大时每个请求最终都能成功
+    fetcher = StubDataFetcherAgent(model=object(), max_retries=20)
+    queries = [f"请取回请求 REQ-{i:05d} 的数据" for i in range(REQUEST_COUNT)]
+
+    results = fetcher.process_queries(queries)
+
+    crossed = [
+        (i, df["request_id"].iloc[0])
+        for i, df in enumerate(results)
+        if str(df["request_id"].iloc[0]) != f"{i:05d}"
+    ]
+    assert not crossed, f"结果串号 {len(crossed)} 个，例如: {crossed[:5]}"
+    threads = {int(df["thread_id"].iloc[0]) for df in results}
+    assert len(threads) > 1
@@ -0,0 +1,60 @@
+"""报告日区间抽取与术语匹配配合的测试"""
+
+from datetime import date
+
+from agent.date_range_extractor import extract_date_range
+from agent.term_matcher import get_term_matcher
+
+REFERENCE = date(2024, 6, 1)
+
+
+def test_growth_extension_moves_start_back_one_year():
+    extraction = extract_date_range("2023年营业收入同比", reference=REFERENCE)
+
+    assert extraction.date_range == "20220101-20231231"
+    assert extraction.extended
+
+
+def test_growth_keywords_not_masked():
+    """同比/增长率等关键词不计入已解释的位置，保留给术语匹配器"""
+    query = "2023年营业收入增长率"
+    extraction = extract_date_range(query, reference=REFERENCE)
+
+    assert extraction.spans == [(0, 5)]
+    matched = get_term_matcher().extract(query, extraction.spans)
+    assert matched.indicators == ["营业总收入增长率"]
+
+
+def test_growth_word_not_treated_as_filler():
+    query = "2023年营业收入增长"
+    extraction = extract_date_range(query, reference=REFERENCE)
+
+    matched = get_term_matcher().extract(query, extraction.spans)
+    assert matched.confidence < 1.0
+
+
+def test_year_range_annual_reports():
+    for query in ("2019-2023年年报营业收入", "2019年至2023年年报的净利润"):
+        extraction = extract_date_range(query, reference=REFERENCE)
+
+        assert extraction.date_range == "20191231-20231231", query
+        assert extraction.complete
+
+
+def test_open_ended_ranges_run_to_latest_report():
+    for query in ("2020年以来营业收入", "2018年到现在的毛利率", "2021Q1至今营业收入"):
+        extraction = extract_date_range(query, reference=REFERENCE)
+
+        assert extraction.date_range.endswith("-20240331"), query
+        assert extraction.complete
+    assert extract_date_range("2020年以来营业收入", reference=REFERENCE).date_range == (
+        "20200101-20240331"
+    )
+    assert extract_date_range(
+        "2018年到现在的毛利率", latest_date="20231231"
+    ).date_range == "20180101-20231231"
+
+
+def test_partial_date_expression_not_complete():
+    for query in ("2020年开始的营业收入", "2020年和2023年的营业收入"):
+        assert not extract_date_range(query, reference=REFERENCE).complete, query
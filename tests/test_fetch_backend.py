@@ -0,0 +1,32 @@
+"""数据获取后端选择的测试"""
+
+import os
+
+from agent import fetch_backend
+
+
+def test_failed_columnar_load_is_not_retried_until_reexport(monkeypatch, tmp_path):
+    calls = []
+
+    def failing_loader():
+        calls.append(1)
+        return None
+
+    monkeypatch.setattr(fetch_backend, "FETCH_BACKEND", "arrow")
+    monkeypatch.setattr(
+        fetch_backend, "_COLUMNAR_BACKEND_LOADERS", {"arrow": (failing_loader, str(tmp_path))}
+    )
+    monkeypatch.setattr(fetch_backend, "_columnar_backend", None)
+    monkeypatch.setattr(fetch_backend, "_columnar_failed_mtime", None)
+
+    for _ in range(3):
+        assert fetch_backend.get_fetch_backend().name == "sqlite"
+    assert len(calls) == 1
+
+    # 重新导出（清单出现或修改时间变化）后再尝试一次
+    manifest = tmp_path / fetch_backend.MANIFEST_FILE
+    manifest.write_text("{}")
+    os.utime(manifest, (1_000_000, 1_000_000))
+    assert fetch_backend.get_fetch_backend().name == "sqlite"
+    assert fetch_backend.get_fetch_backend().name == "sqlite"
+    assert len(calls) == 2
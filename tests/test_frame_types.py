@@ -0,0 +1,29 @@
+"""取数结果紧凑类型转换的测试"""
+
+import pandas as pd
+
+from agent.frame_types import compact_frame
+
+
+def test_text_that_looks_numeric_is_kept():
+    df = compact_frame(pd.DataFrame({"request_id": ["00000", "00017"], "备注": ["1", "2"]}))
+
+    assert df["request_id"].tolist() == ["00000", "00017"]
+    assert df["备注"].tolist() == ["1", "2"]
+
+
+def test_every_code_column_is_zero_padded():
+    df = compact_frame(pd.DataFrame({
+        "股票代码": [1, 600519], "t1_股票代码": ["1", "600519"], "代码": [2.0, 300750.0],
+    }))
+
+    assert df["股票代码"].tolist() == ["000001", "600519"]
+    assert df["t1_股票代码"].tolist() == ["000001", "600519"]
+    assert df["代码"].tolist() == ["000002", "300750"]
+
+
+def test_numeric_objects_become_numbers():
+    df = compact_frame(pd.DataFrame({"营业收入": pd.Series([1.5, None, 3], dtype=object)}))
+
+    assert pd.api.types.is_float_dtype(df["营业收入"].dtype)
+    assert df["营业收入"].iloc[2] == 3.0
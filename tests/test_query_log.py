@@ -0,0 +1,56 @@
+"""数据获取日志按进程分文件写入的测试"""
+
+import os
+
+from agent import query_log
+from agent.query_log import QueryLogger, log_files, read_records
+
+
+def _logger(log_dir, pid, monkeypatch, **kwargs):
+    monkeypatch.setattr(query_log.os, "getpid", lambda: pid)
+    return QueryLogger(str(log_dir), **kwargs)
+
+
+def test_each_process_writes_own_file(tmp_path, monkeypatch):
+    first = _logger(tmp_path, 101, monkeypatch, max_bytes=2000)
+    second = _logger(tmp_path, 202, monkeypatch, max_bytes=2000)
+    for i in range(40):
+        # 两个记录器交替写入并各自轮转，模拟 prefork 的多个 worker
+        for logger in (first, second):
+            monkeypatch.setattr(query_log.os, "getpid", lambda pid=logger._pid: pid)
+            logger._write([{"event": "query", "path": "compiled", "seq": i, "pid": logger._pid}])
+    first.close()
+    second.close()
+
+    assert first.rotations > 0 and second.rotations > 0
+    files = [os.path.basename(path) for path in log_files(str(tmp_path))]
+    assert files[-2:] == ["dfa_queries.101.jsonl", "dfa_queries.202.jsonl"]
+    records = list(read_records(log_files(str(tmp_path))))
+    for pid in (101, 202):
+        assert sorted(r["seq"] for r in records if r["pid"] == pid) == list(range(40))
+
+
+def test_backups_limit_counts_all_processes(tmp_path, monkeypatch):
+    loggers = [_logger(tmp_path, pid, monkeypatch, max_bytes=1, backups=3) for pid in (1, 2)]
+    for logger in loggers * 3:
+        monkeypatch.setattr(query_log.os, "getpid", lambda pid=logger._pid: pid)
+        logger._write([{"event": "query", "pid": logger._pid}])
+
+    assert len(log_files(str(tmp_path))) == 3
+
+
+def test_child_process_switches_file(tmp_path, monkeypatch):
+    logger = _logger(tmp_path, 300, monkeypatch)
+    logger.log("query", "q", path="compiled")
+    # fork 出的子进程中没有父进程的写线程
+    logger.close()
+
+    monkeypatch.setattr(query_log.os, "getpid", lambda: 301)
+    logger.log("query", "q", path="compiled")
+    logger.flush()
+    logger.close()
+
+    assert logger.path.endswith("dfa_queries.301.jsonl")
+    names = sorted(os.path.basename(path) for path in log_files(str(tmp_path)))
+    assert names == ["dfa_queries.300.jsonl", "dfa_queries.301.jsonl"]
+    assert logger.snapshot()["written"] == 1
@@ -0,0 +1,79 @@
+"""QueryParserAgent 解析结果整理的测试"""
+
+import pytest
+
+pytest.importorskip("litellm")
+
+from agent.QueryParserAgent import QueryParserAgent  # noqa: E402
+from agent.term_index import ColumnTableLookup  # noqa: E402
+
+
+def test_table_tags_kept_when_column_names_unavailable():
+    """db_columns_names.json 加载失败时，带 "来自:" 的指标仍按四张财务表校验"""
+    agent = QueryParserAgent()
+    agent.column_lookup = ColumnTableLookup({})
+
+    cleaned = agent._format_validation_and_cleaning({
+        "需要从sql抽取的财务指标": "营业收入来自:income_table,毛利率来自:ratio_table",
+    })
+
+    assert cleaned["需要从sql抽取的财务指标"] == [
+        "营业收入来自:income_table", "毛利率来自:ratio_table"
+    ]
+
+
+def test_retry_delay_is_bounded_and_grows():
+    agent = QueryParserAgent()
+
+    for retry_count in range(1, 10):
+        ceiling = min(
+            agent.RETRY_BACKOFF_MAX, agent.RETRY_BACKOFF_BASE * 2 ** (retry_count - 1)
+        )
+        assert 0 <= agent._retry_delay(retry_count) <= ceiling
+
+
+def test_async_retries_back_off_between_attempts(monkeypatch):
+    import asyncio
+
+    from agent import QueryParserAgent as qpa_module
+
+    agent = QueryParserAgent()
+    agent.FAST_PATH_ENABLED = False
+    sleeps = []
+
+    async def failing_completion(**kwargs):
+        raise RuntimeError("rate limited")
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(qpa_module, "acompletion", failing_completion)
+    monkeypatch.setattr(qpa_module.asyncio, "sleep", fake_sleep)
+
+    result = asyncio.run(agent.parse_query_async("2023年贵州茅台的营业收入"))
+
+    assert result["解析结果"]["需要从sql抽取的财务指标"] == []
+    # 最后一次失败后不再等待
+    assert len(sleeps) == agent.MAX_RETRIES - 1
+
+
+def test_partial_local_date_range_left_to_llm():
+    """本地规则只解析出部分日期描述时，LLM 使用完整的日期说明且结果不被覆盖"""
+    agent = QueryParserAgent()
+
+    local_info, local_date_range, system_prompt = agent._try_fast_path(
+        "2020年开始贵州茅台的营业收入"
+    )
+
+    assert local_info is None
+    assert local_date_range is None
+    assert system_prompt == agent.QPA_extract_prompt
+
+
+def test_complete_local_date_range_used():
+    agent = QueryParserAgent()
+
+    _, local_date_range, system_prompt = agent._try_fast_path("2019-2023年年报贵州茅台的营业收入")
+
+    assert local_date_range == "20191231-20231231"
+    assert system_prompt == agent.term_index.qpa_extract_prompt_without_dates
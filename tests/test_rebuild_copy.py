@@ -0,0 +1,70 @@
+"""在数据库副本上建索引、建宽表的测试"""
+
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from agent.db_indexes import ensure_indexes
+from agent.financial_db import FINANCIAL_DB_PATH, rebuild_copy
+from agent.wide_table import WIDE_TABLE, build_wide_tables
+
+
+@pytest.fixture
+def db_copy(tmp_path):
+    path = str(tmp_path / "financial.db")
+    shutil.copyfile(FINANCIAL_DB_PATH, path)
+    return path
+
+
+def _open_immutable(path):
+    return sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro&immutable=1", uri=True)
+
+
+def _table_names(conn, kind):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+def test_indexes_built_into_a_replacement_file(db_copy):
+    reader = _open_immutable(db_copy)
+    inode = os.stat(db_copy).st_ino
+
+    with rebuild_copy(db_copy) as conn:
+        created = ensure_indexes(conn)
+
+    assert created
+    assert os.stat(db_copy).st_ino != inode
+    # 已打开的 immutable 连接继续读取旧文件
+    assert reader.execute("SELECT COUNT(*) FROM income_table").fetchone()[0] > 0
+    assert not _table_names(reader, "index")
+    reader.close()
+    with sqlite3.connect(db_copy) as conn:
+        assert set(created) <= _table_names(conn, "index")
+    assert os.listdir(os.path.dirname(db_copy)) == ["financial.db"]
+
+
+def test_failed_rebuild_leaves_original_untouched(db_copy):
+    inode = os.stat(db_copy).st_ino
+
+    with pytest.raises(RuntimeError):
+        with rebuild_copy(db_copy) as conn:
+            ensure_indexes(conn)
+            raise RuntimeError("中途失败")
+
+    assert os.stat(db_copy).st_ino == inode
+    assert os.listdir(os.path.dirname(db_copy)) == ["financial.db"]
+    with sqlite3.connect(db_copy) as conn:
+        assert not _table_names(conn, "index")
+
+
+def test_wide_tables_built_into_a_replacement_file(db_copy, tmp_path):
+    inode = os.stat(db_copy).st_ino
+
+    manifest = build_wide_tables(db_copy, str(tmp_path / "manifest" / "wide_table.json"))
+
+    assert os.stat(db_copy).st_ino != inode
+    with sqlite3.connect(db_copy) as conn:
+        rows = conn.execute(f"SELECT COUNT(*) FROM {WIDE_TABLE}").fetchone()[0]
+    assert rows == manifest["row_count"] > 0
@@ -0,0 +1,24 @@
+"""SQL结果缓存的测试"""
+
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from agent.financial_db import get_data_stamp  # noqa: E402
+from agent.result_cache import DiskArrowStore, LocalResultCache, SqlResultCache  # noqa: E402
+
+
+def test_disk_tier_drops_stale_versions_on_first_use(tmp_path):
+    store = DiskArrowStore(str(tmp_path))
+    store.put("old", "mtime:1.000000", pd.DataFrame({"a": [1]}))
+    current_dir = os.path.basename(store._version_dir(get_data_stamp()))
+
+    cache = SqlResultCache(LocalResultCache(1024 * 1024), store)
+    cache.put("SELECT 1", (), pd.DataFrame({"a": [1]}))
+
+    assert os.listdir(tmp_path) == [current_dir]
+    assert cache.snapshot()["invalidations"] == 0
+    assert cache.get("SELECT 1", ()) is not None
@@ -0,0 +1,28 @@
+"""表结构摘要缓存的测试"""
+
+import os
+import sqlite3
+
+from agent import schema_digest
+from conftest import TEST_DB_PATH
+
+
+def test_empty_digest_not_cached(tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "schema_digest.json")
+    empty_db = str(tmp_path / "empty.db")
+    sqlite3.connect(empty_db).close()
+    db_path = {"path": empty_db}
+    monkeypatch.setattr(schema_digest, "SCHEMA_DIGEST_PATH", cache_path)
+    monkeypatch.setattr(schema_digest, "_schema_digest", None)
+    monkeypatch.setattr(schema_digest, "get_data_stamp", lambda: "stamp-1")
+    monkeypatch.setattr(
+        schema_digest, "connect_readonly", lambda: sqlite3.connect(db_path["path"])
+    )
+
+    assert schema_digest.get_schema_digest().tables == {}
+    assert not os.path.exists(cache_path)
+
+    # 同一数据版本下数据库就绪后重新读取
+    db_path["path"] = TEST_DB_PATH
+    assert "income_table" in schema_digest.get_schema_digest().tables
+    assert os.path.exists(cache_path)
@@ -0,0 +1,44 @@
+"""解析结果编译为SQL的测试"""
+
+import pandas as pd
+
+from agent.financial_db import get_readonly_engine
+from agent.parallel_fetch import fetch_tables_parallel
+from agent.sql_compiler import compile_parsed_query
+from agent.stock_cache import StockPartitionCache
+
+RENAMED_STOCK = {
+    "需要从sql抽取的财务指标": ["营业收入来自:income_table", "毛利率来自:ratio_table"],
+    "筛选的股票名称": "平安银行",
+    "报告日区间": "20100101-20131231",
+}
+
+
+def test_stock_filter_uses_code():
+    compiled = compile_parsed_query(RENAMED_STOCK)
+
+    assert compiled.stock_codes == ("000001",)
+    assert '"股票代码" IN (?)' in compiled.sql
+    assert "000001" in compiled.params
+
+
+def test_rows_filed_under_earlier_name_are_returned():
+    """000001 在2012年由 深发展A 更名为 平安银行，更名前的报告期也要返回"""
+    compiled = compile_parsed_query(RENAMED_STOCK)
+    df = pd.read_sql_query(compiled.sql, get_readonly_engine(), params=compiled.params)
+
+    assert len(df) == 16
+    assert set(df["股票名称"]) == {"深发展A", "平安银行"}
+
+
+def test_stock_cache_and_parallel_fetch_match_sql():
+    compiled = compile_parsed_query(RENAMED_STOCK)
+    expected = pd.read_sql_query(compiled.sql, get_readonly_engine(), params=compiled.params)
+
+    cached = StockPartitionCache().fetch(compiled)
+    parallel = fetch_tables_parallel(compiled)
+
+    pd.testing.assert_frame_equal(cached, expected, check_dtype=False)
+    pd.testing.assert_frame_equal(
+        parallel.reset_index(drop=True), expected, check_dtype=False
+    )
@@ -0,0 +1,69 @@
+"""SQL预校验的测试"""
+
+from agent.sql_validator import SqlValidator
+
+TABLES = {
+    "income_table": ["股票代码", "股票名称", "报告日", "营业收入", "营业成本"],
+    "balance_table": ["股票代码", "报告日", "资产总计"],
+}
+
+
+def _validator():
+    return SqlValidator(TABLES, {"收入": "营业收入"})
+
+
+def test_implicit_output_alias_accepted():
+    validator = _validator()
+
+    for sql in (
+        "SELECT 营业收入 revenue FROM income_table ORDER BY revenue",
+        'SELECT "营业收入" revenue, 营业成本 cost FROM income_table ORDER BY revenue, cost',
+        "SELECT t0.营业收入 revenue FROM income_table t0 ORDER BY revenue DESC",
+        "SELECT SUM(营业收入) total FROM income_table GROUP BY 股票代码 HAVING total > 0",
+        "SELECT CASE WHEN 营业收入 > 0 THEN 1 ELSE 0 END positive FROM income_table "
+        "ORDER BY positive",
+    ):
+        assert validator.validate(sql) == [], sql
+
+
+def test_unknown_column_still_rejected():
+    validator = _validator()
+
+    issues = validator.validate("SELECT 收入 FROM income_table ORDER BY 报告日")
+    assert [(issue.kind, issue.name) for issue in issues] == [("column", "收入")]
+    assert issues[0].suggestions == ("income_table.营业收入",)
+
+    # 别名后面不是逗号或 FROM 时仍按列检查
+    issues = validator.validate("SELECT 营业收入 FROM income_table WHERE 收入 > 0")
+    assert [issue.name for issue in issues] == ["收入"]
+
+
+def test_column_in_other_table_suggested():
+    issues = _validator().validate("SELECT 资产总计 FROM income_table")
+
+    assert issues[0].suggestions == ("balance_table.资产总计",)
+    assert _validator().validate("SELECT 总额 FROM incme_table")[0].kind == "table"
+
+
+def test_sqlite_literals_and_functions_not_rejected():
+    validator = _validator()
+
+    assert validator.validate('SELECT strftime("%Y", 报告日) FROM income_table') == []
+    assert validator.validate(
+        "SELECT 营业收入 FROM income_table WHERE 报告日 <= CURRENT_DATE"
+    ) == []
+    assert validator.validate(
+        "SELECT 营业收入 FROM income_table WHERE 报告日 <= CURRENT_TIMESTAMP"
+    ) == []
+
+
+def test_unknown_quoted_column_only_warns():
+    """SQLite 会把无法识别的双引号标识符当作字符串执行，只提示不拦截"""
+    validator = _validator()
+
+    issues = validator.validate('SELECT "收入" FROM income_table')
+
+    assert [(issue.name, issue.blocking) for issue in issues] == [("收入", False)]
+    assert "income_table.营业收入" in validator.format_warnings(issues)
+    assert validator.snapshot()["rejected"] == 0
+    assert validator.snapshot()["warned"] == 1
@@ -0,0 +1,28 @@
+"""按股票分区的数据缓存测试"""
+
+from agent.sql_compiler import compile_parsed_query
+from agent.stock_cache import StockPartitionCache
+
+
+def _compile(**fields):
+    parsed = {"需要从sql抽取的财务指标": ["营业收入来自:income_table"], "筛选的股票名称": "贵州茅台"}
+    parsed.update(fields)
+    return compile_parsed_query(parsed)
+
+
+def test_prefetch_without_date_range_makes_fetch_a_containment_hit():
+    cache = StockPartitionCache()
+
+    assert cache.prefetch(_compile())
+    assert cache.snapshot()["requests"] == 0
+
+    df = cache.fetch(_compile(报告日区间="20220101-20231231"))
+    assert len(df) == 8
+    assert set(df["股票名称"]) == {"贵州茅台"}
+    assert cache.snapshot()["containment_hits"] == 1
+
+
+def test_prefetch_skips_queries_without_stocks():
+    cache = StockPartitionCache()
+
+    assert not cache.prefetch(_compile(筛选的股票名称=""))
@@ -0,0 +1,46 @@
+"""分块取数与结果句柄的测试"""
+
+import pandas as pd
+import pytest
+
+from agent.financial_db import get_readonly_engine
+from agent.streaming_fetch import FetchedData, collect_chunks, fetch_sql
+
+SQL = 'SELECT "股票代码", "报告日", "营业收入" FROM income_table WHERE "股票代码" = ?'
+
+
+def test_truncated_result_is_not_cached():
+    truncated = fetch_sql(SQL, get_readonly_engine(), ("600519",), chunk_rows=10, row_cap=20)
+    assert truncated.truncated and truncated.row_count == 20
+
+    full = fetch_sql(SQL, get_readonly_engine(), ("600519",), chunk_rows=10, row_cap=0)
+    assert not full.truncated
+    assert full.row_count == 56
+
+
+def test_sort_order_only_mentioned_for_ordered_results():
+    frame = pd.DataFrame({"a": range(10)})
+
+    ordered = FetchedData.from_frame(frame, row_cap=5, ordered=True)
+    agent_sql = FetchedData.from_frame(frame, row_cap=5)
+
+    assert "按股票代码、报告日排序" in ordered.truncation_info()["message"]
+    assert "排序" not in agent_sql.truncation_info()["message"]
+
+
+def test_spill_accepts_text_in_column_that_started_all_null():
+    pytest.importorskip("pyarrow")
+    chunks = [
+        pd.DataFrame({"股票代码": ["000001", "000002"], "备注": [None, None]}),
+        pd.DataFrame({"股票代码": ["000003", "000004"], "备注": ["更名", None]}),
+        pd.DataFrame({"股票代码": ["000005"], "备注": [1.5]}),
+    ]
+
+    data = collect_chunks(iter(chunks), spill_bytes=1, row_cap=0)
+    try:
+        assert data.is_spilled
+        df = data.to_pandas()
+        assert df["备注"].tolist()[2:] == ["更名", None, "1.5"]
+        assert df["股票代码"].tolist() == ["000001", "000002", "000003", "000004", "000005"]
+    finally:
+        data.close()